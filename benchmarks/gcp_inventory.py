@@ -0,0 +1,93 @@
+# Benchmark of the GCP instance summary against a local fake `gcloud` script
+import os
+import sys
+import time
+import tempfile
+import subprocess as sp
+import pandas as pd
+from mle_monitor.resource.gcp import GCPResource
+
+# Lists `num_instances` VMs - 1% change their status on every call
+FAKE_GCLOUD = """#!{python}
+import json, random, sys
+machine_types = ["n1-standard-%d" % (2 ** i) for i in range(6)] + ["e2-medium"]
+statuses = ["RUNNING", "STAGING", "STOPPING", "TERMINATED"]
+random.seed()
+instances = [
+    {{
+        "id": str(i),
+        "name": "vm-%d" % i,
+        "zone": "us-central1-a",
+        "machineType": machine_types[i % len(machine_types)],
+        "status": random.choice(statuses) if random.random() < 0.01 else "RUNNING",
+    }}
+    for i in range({num_instances})
+]
+if any(arg.startswith("--format=json") for arg in sys.argv):
+    print(json.dumps(instances))
+else:
+    print("NAME ZONE MACHINE_TYPE PREEMPTIBLE INTERNAL_IP EXTERNAL_IP STATUS")
+    for inst in instances:
+        print(inst["name"], inst["zone"], inst["machineType"], "", "10.0.0.1",
+              "34.0.0.1", inst["status"])
+"""
+
+
+def legacy_get_data(gcloud: str):
+    """Previous summary - text listing & dataframe masks per machine type."""
+    out = sp.check_output(
+        [gcloud, "compute", "instances", "list", "--verbosity", "error"]
+    )
+    job_info = out.split(b"\n")[1:-1]
+    df_gcp = {"experiment_type": [], "status": []}
+    for i in range(len(job_info)):
+        decoded_job_info = job_info[i].decode("utf-8").split()
+        df_gcp["experiment_type"].append(decoded_job_info[2])
+        df_gcp["status"].append(decoded_job_info[-1])
+    df_gcp = pd.DataFrame(df_gcp)
+    gcp_data = {"experiment_type": [], "run": [], "stop": [], "stage": []}
+    for jt in df_gcp.experiment_type.unique():
+        sub_df = df_gcp[df_gcp.experiment_type == jt]
+        gcp_data["experiment_type"].append(jt)
+        gcp_data["run"].append((sub_df["status"] == "RUNNING").sum())
+        gcp_data["stop"].append((sub_df["status"] == "STOPPING").sum())
+        gcp_data["stage"].append((sub_df["status"] == "STAGING").sum())
+    return gcp_data
+
+
+def run_benchmark(num_instances: int, repeats: int = 5):
+    """Time legacy vs. inventory-based summary - best of `repeats`."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        gcloud = os.path.join(tmp_dir, "gcloud")
+        with open(gcloud, "w") as f:
+            f.write(
+                FAKE_GCLOUD.format(python=sys.executable, num_instances=num_instances)
+            )
+        os.chmod(gcloud, 0o755)
+        gcp = GCPResource({"gcloud": gcloud})
+        instances = gcp.list_instances()
+        gcp.update_inventory(instances)
+        # Listing & parsing vs. diffing an unchanged listing with the inventory
+        for name, collect in [
+            ("legacy", lambda: legacy_get_data(gcloud)),
+            ("gcloud", gcp.get_data),
+            ("update", lambda: gcp.update_inventory(instances)),
+        ]:
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                collect()
+                timings.append(time.perf_counter() - start)
+            print(
+                f"{name:>8} - {num_instances} instances:"
+                f" {min(timings) * 1000:.1f}ms"
+            )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark GCP instance summary.")
+    parser.add_argument("-n", "--num_instances", type=int, default=5000)
+    args = vars(parser.parse_args())
+    run_benchmark(args["num_instances"])
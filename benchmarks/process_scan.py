@@ -0,0 +1,59 @@
+# Benchmark of the local process scan with many (sleeping) processes
+import sys
+import time
+import subprocess
+from mle_monitor.resource.processes import ProcessScanner
+
+
+def legacy_scan(psutil, top_k: int = 6):
+    """Previous scan - separate calls per process & two full sorts."""
+    procs = []
+    for proc in psutil.process_iter():
+        try:
+            pinfo = proc.as_dict(attrs=["pid", "name", "username", "cmdline"])
+            pinfo["vms"] = proc.memory_info().vms / (1024 * 1024 * 1000)
+            pinfo["cpu_percent"] = proc.cpu_percent()
+            procs.append(pinfo)
+        except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+            pass
+    by_memory = sorted(procs, key=lambda p: p["vms"], reverse=True)
+    by_cpu = sorted(procs, key=lambda p: p["cpu_percent"], reverse=True)
+    return by_memory[:top_k], by_cpu[:top_k]
+
+
+def run_benchmark(num_processes: int, repeats: int = 5):
+    """Time legacy vs. persistent scanner - best of `repeats`."""
+    import psutil
+
+    children = [
+        subprocess.Popen([sys.executable, "-c", "import time; time.sleep(600)"])
+        for _ in range(num_processes)
+    ]
+    try:
+        scanner = ProcessScanner()
+        for name, scan in [
+            ("legacy", lambda: legacy_scan(psutil)),
+            ("scanner", lambda: scanner.top_k(6)),
+        ]:
+            timings = []
+            for _ in range(repeats):
+                start = time.perf_counter()
+                scan()
+                timings.append(time.perf_counter() - start)
+            print(
+                f"{name:>8} - {len(psutil.pids())} processes:"
+                f" {min(timings) * 1000:.1f}ms"
+            )
+    finally:
+        for child in children:
+            child.kill()
+            child.wait()
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark process scanning.")
+    parser.add_argument("-n", "--num_processes", type=int, default=500)
+    args = vars(parser.parse_args())
+    run_benchmark(args["num_processes"])
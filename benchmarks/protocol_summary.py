@@ -0,0 +1,62 @@
+# Benchmark of `MLEProtocol.summary` on a large synthetic protocol database
+import os
+import json
+import time
+import tempfile
+from mle_monitor import MLEProtocol
+
+
+def make_protocol_file(protocol_fname: str, num_experiments: int):
+    """Write a pickledb protocol with `num_experiments` synthetic entries."""
+    db = {}
+    for e_id in range(1, num_experiments + 1):
+        db[str(e_id)] = {
+            "purpose": f"Benchmark experiment {e_id}",
+            "project_name": "benchmark",
+            "exec_resource": ["local", "slurm-cluster", "sge-cluster"][e_id % 3],
+            "experiment_dir": f"experiments/{e_id}",
+            "experiment_type": "hyperparameter-search",
+            "base_fname": "main.py",
+            "config_fname": "base_config.json",
+            "num_seeds": 2,
+            "num_total_jobs": 10,
+            "num_job_batches": 2,
+            "num_jobs_per_batch": 5,
+            "time_per_job": "00:05:00",
+            "num_cpus": 2,
+            "num_gpus": 0,
+            "job_status": ["running", "completed", "aborted"][e_id % 3],
+            "completed_jobs": e_id % 10,
+            "start_time": "01/01/22 12:00",
+            "loaded_config": [{"lrate": 0.1, "num_epochs": 10}],
+        }
+    with open(protocol_fname, "w") as f:
+        json.dump(db, f)
+
+
+def run_benchmark(num_experiments: int, storage: str, repeats: int = 5):
+    """Time summary of all experiments (tail=None) - best of `repeats`."""
+    with tempfile.TemporaryDirectory() as tmp_dir:
+        protocol_fname = os.path.join(tmp_dir, "mle_protocol.db")
+        make_protocol_file(protocol_fname, num_experiments)
+        protocol = MLEProtocol(protocol_fname, storage=storage)
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            df = protocol.summary(tail=None, verbose=False)
+            timings.append(time.perf_counter() - start)
+        assert df.shape[0] == num_experiments
+    print(
+        f"summary(tail=None) - {storage:>8} - {num_experiments} experiments:"
+        f" {min(timings):.3f}s"
+    )
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark protocol summary.")
+    parser.add_argument("-n", "--num_experiments", type=int, default=100000)
+    args = vars(parser.parse_args())
+    for storage in ["pickledb", "sqlite"]:
+        run_benchmark(args["num_experiments"], storage)
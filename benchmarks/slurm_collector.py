@@ -0,0 +1,86 @@
+# Benchmark of the Slurm job aggregation on the recorded `squeue` fixtures
+import json
+import time
+import pandas as pd
+from mle_monitor.resource.slurm import SlurmResource, JOB_STATES
+from mle_monitor.utils import natural_keys
+
+FIXTURE_DIR = "tests/fixtures/slurm"
+
+
+def synthetic_outputs(num_jobs: int, num_users: int = 200, num_nodes: int = 500):
+    """Replicate the recorded jobs - JSON & legacy text `squeue` output."""
+    with open(f"{FIXTURE_DIR}/squeue.json") as f:
+        recorded = json.load(f)
+    jobs, lines = [], ["PARTITION USER ST TIME NODES CPUS MIN_MEMORY NODELIST"]
+    for i in range(num_jobs):
+        job = dict(recorded["jobs"][i % len(recorded["jobs"])])
+        job["user_name"] = f"user{i % num_users}"
+        if job["nodes"]:
+            job["nodes"] = f"node{i % num_nodes:03d}"
+        jobs.append(job)
+        state = job["job_state"]
+        state = JOB_STATES[state[0] if isinstance(state, list) else state]
+        lines.append(
+            f'"  {job["partition"]:>18} {job["user_name"]:>20} {state:>2}'
+            f' 1:00:00      1 4 4G {job["nodes"]}"'
+        )
+    return json.dumps({**recorded, "jobs": jobs}), "\n".join(lines) + "\n"
+
+
+def legacy_aggregation(output: str):
+    """Previous aggregation - text parsing & boolean masks per user/node."""
+    job_df = {"user": [], "partition": [], "status": [], "node": []}
+    for job in output.split("\n")[1:-1]:
+        job_clean = job.split()[1:]
+        job_df["user"].append(job_clean[1])
+        job_df["partition"].append(job_clean[0])
+        job_df["status"].append(job_clean[2])
+        job_df["node"].append(job_clean[7][:-1])
+    job_df = pd.DataFrame(job_df)
+    tables = []
+    for column in ["user", "partition", "node"]:
+        table = {"id": [], "total": [], "run": [], "wait": []}
+        unique = job_df[column].unique().tolist()
+        unique.sort(key=natural_keys)
+        for value in unique:
+            sub_df = job_df.loc[job_df[column] == value]
+            table["id"].append(value)
+            table["total"].append(sub_df.shape[0])
+            table["run"].append(sub_df.loc[sub_df["status"] == "R"].shape[0])
+            table["wait"].append(sub_df.loc[sub_df["status"] == "PD"].shape[0])
+        tables.append(table)
+    return tables
+
+
+def run_benchmark(num_jobs: int, repeats: int = 3):
+    """Time legacy vs. JSON collector aggregation - best of `repeats`."""
+    json_output, text_output = synthetic_outputs(num_jobs)
+    slurm = SlurmResource({"partitions": ["cpu", "gpu"]})
+    slurm.query = lambda command: json_output
+
+    def aggregate():
+        job_df = slurm.get_jobs()
+        slurm.get_user_data(job_df)
+        slurm.get_partition_data(job_df)
+        slurm.get_node_data(job_df)
+
+    for name, collect in [
+        ("legacy", lambda: legacy_aggregation(text_output)),
+        ("json", aggregate),
+    ]:
+        timings = []
+        for _ in range(repeats):
+            start = time.perf_counter()
+            collect()
+            timings.append(time.perf_counter() - start)
+        print(f"{name:>8} - {num_jobs} jobs: {min(timings) * 1000:.1f}ms")
+
+
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Benchmark Slurm aggregation.")
+    parser.add_argument("-n", "--num_jobs", type=int, default=50000)
+    args = vars(parser.parse_args())
+    run_benchmark(args["num_jobs"])
@@ -1,5 +1,7 @@
 from .layout import layout_dashboard
 from .update import update_dashboard
+from .collector import Collector
+from .components import PLOT_WIDTH
 
 
-__all__ = ["layout_dashboard", "update_dashboard"]
+__all__ = ["layout_dashboard", "update_dashboard", "Collector", "PLOT_WIDTH"]
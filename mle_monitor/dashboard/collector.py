@@ -0,0 +1,110 @@
+import time
+import threading
+from typing import Any, Callable, Union
+from ..utils import fingerprint
+
+
+class Collector(object):
+    def __init__(
+        self,
+        name: str,
+        collect: Callable[[], Any],
+        interval: float,
+        notify: Union[threading.Event, None] = None,
+        max_interval: Union[float, None] = None,
+        backoff: float = 2.0,
+        signature: Callable[[Any], str] = fingerprint,
+        max_duty_cycle: Union[float, None] = None,
+    ):
+        """Collect data on a background thread every `interval` seconds.
+
+        The latest completed result is available via `latest`. `collect` may
+        return None to signal that nothing new was collected. `notify` is set
+        whenever a new snapshot is published (e.g. to wake up the renderer).
+        Exceptions are stored in `error` - collection continues.
+
+        Snapshots with an unchanged `signature` are not published and the
+        interval is multiplied by `backoff` (up to `max_interval`) until the
+        data changes again. `max_duty_cycle` caps the share of CPU time the
+        collector thread may use by waiting longer after expensive calls.
+        """
+        self.name = name
+        self.collect = collect
+        self.interval = interval
+        self.notify = notify
+        self.max_interval = max_interval
+        self.backoff = backoff
+        self.signature = signature
+        self.max_duty_cycle = max_duty_cycle
+        self.data, self.version, self.error = None, 0, None
+        self.key, self.wait_time = None, interval
+        self.start_time, self.cpu_time = None, 0.0
+        self.lock = threading.Lock()
+        self.stopped = threading.Event()
+        self.ready = threading.Event()
+        self.thread = threading.Thread(
+            target=self.run, name=f"mle-{name}-collector", daemon=True
+        )
+
+    def start(self):
+        self.start_time = time.time()
+        self.thread.start()
+        return self
+
+    def stop(self, timeout: Union[float, None] = None):
+        """Stop collecting - waits for a running collection to finish."""
+        self.stopped.set()
+        if self.thread.is_alive():
+            self.thread.join(timeout)
+
+    def run(self):
+        while not self.stopped.is_set():
+            start_t, start_cpu = time.time(), time.thread_time()
+            try:
+                data = self.collect()
+                self.error = None
+            except Exception as e:
+                data, self.error = None, e
+            changed = False
+            if data is not None:
+                key = self.signature(data)
+                changed = self.version == 0 or key != self.key
+                if changed:
+                    self.key = key
+                    self.publish(data)
+            # Back off while the data is unchanged - reset on change
+            if changed or self.max_interval is None:
+                self.wait_time = self.interval
+            else:
+                self.wait_time = min(self.wait_time * self.backoff, self.max_interval)
+            busy = time.thread_time() - start_cpu
+            self.cpu_time += busy
+            wait = self.wait_time
+            if self.max_duty_cycle is not None:
+                wait = max(wait, busy / self.max_duty_cycle)
+            self.stopped.wait(max(0, wait - (time.time() - start_t)))
+
+    @property
+    def duty_cycle(self) -> float:
+        """Share of wall time the collector thread spent on the CPU."""
+        if self.start_time is None:
+            return 0.0
+        return self.cpu_time / max(time.time() - self.start_time, 1e-6)
+
+    def publish(self, data):
+        """Store a new snapshot and notify the renderer."""
+        with self.lock:
+            self.data = data
+            self.version += 1
+        self.ready.set()
+        if self.notify is not None:
+            self.notify.set()
+
+    def latest(self):
+        """Version counter & data of the latest completed collection."""
+        with self.lock:
+            return self.version, self.data
+
+    def wait_ready(self, timeout: Union[float, None] = None) -> bool:
+        """Block until the first snapshot was published."""
+        return self.ready.wait(timeout)
@@ -1,4 +1,5 @@
 from .plots import (
+    PLOT_WIDTH,
     make_util_plot,
     make_protocol_total_plot,
     make_protocol_daily_plot,
@@ -17,6 +18,7 @@ from .usage import (
 )
 
 __all__ = [
+    "PLOT_WIDTH",
     "make_util_plot",
     "make_protocol_total_plot",
     "make_protocol_daily_plot",
@@ -1,46 +1,69 @@
+import functools
 import numpy as np
+from collections import OrderedDict
+from datetime import datetime
 import plotext as plt
 from rich.ansi import AnsiDecoder
 from rich.align import Align
 from rich.table import Table
+from ...utils import fingerprint
 
 
+# Size of all plotext plots in terminal columns/rows
+PLOT_WIDTH, PLOT_HEIGHT = 42, 9
+
+# Rendered charts keyed on plot function, plotted series & plot size
+CHART_CACHE = OrderedDict()
+CHART_CACHE_SIZE = 32
+
+
+def cached_chart(make_chart):
+    """Reuse the rendered chart if the series & plot size did not change."""
+
+    @functools.wraps(make_chart)
+    def wrapper(data) -> Align:
+        key = fingerprint([make_chart.__name__, data, PLOT_WIDTH, PLOT_HEIGHT])
+        if key in CHART_CACHE:
+            CHART_CACHE.move_to_end(key)
+            return CHART_CACHE[key]
+        chart = make_chart(data)
+        CHART_CACHE[key] = chart
+        if len(CHART_CACHE) > CHART_CACHE_SIZE:
+            CHART_CACHE.popitem(last=False)
+        return chart
+
+    return wrapper
+
+
+@cached_chart
 def make_util_plot(util_hist) -> Align:
     """Plot curve displaying a CPU usage times series for the cluster."""
     x = np.arange(len(util_hist["rel_cpu_util"])).tolist()
-    y = np.array(util_hist["rel_cpu_util"]).tolist()
+    y = util_hist["rel_cpu_util"].tolist()
 
     x_mem = np.arange(len(util_hist["rel_mem_util"])).tolist()
-    y_mem = np.array(util_hist["rel_mem_util"]).tolist()
+    y_mem = util_hist["rel_mem_util"].tolist()
     # Clear the plot and draw the utilisation lines
     plt.clear_plot()
     plt.plot(x, y, marker="dot", color="red", label="% CPU Util.")
     plt.plot(x_mem, y_mem, marker="dot", color="yellow", label="% Mem Util.")
-    plt.figure.plot_size(42, 9)
+    plt.figure.plot_size(PLOT_WIDTH, PLOT_HEIGHT)
     plt.canvas_color("black")
     plt.axes_color("black")
     plt.ticks_color("white")
     plt.ylim(0, 1)
 
     # Get time points start and end of monitored period
-    xticks = [0, len(util_hist["times_hour"]) - 1]
+    xticks = [0, len(util_hist["time"]) - 1]
     xlabels = [
-        util_hist["times_date"][i][:5] + "-" + util_hist["times_hour"][i]
+        datetime.fromtimestamp(util_hist["time"][i]).strftime("%m/%d-%H:%M:%S")
         for i in xticks
     ]
     plt.xticks(xticks, xlabels)
-    plot_str = plotext_helper()
-    decoder = AnsiDecoder()
-    lines = list(decoder.decode(plot_str))
-
-    # Build the rich table graph
-    message = Table.grid()
-    message.add_column()
-    for line in lines:
-        message.add_row(line)
-    return Align.center(message)
+    return chart_grid(plotext_helper())
 
 
+@cached_chart
 def make_protocol_total_plot(experiment_hist) -> Align:
     """Plot curve displaying a memory usage times series for the cluster."""
     plt.clear_plot()
@@ -56,20 +79,12 @@ def make_protocol_total_plot(experiment_hist) -> Align:
         color="yellow",
         label="Total",
     )
-    plt.figure.plot_size(42, 9)
+    plt.figure.plot_size(PLOT_WIDTH, PLOT_HEIGHT)
 
-    plot_str = plotext_helper()
-    decoder = AnsiDecoder()
-    lines = list(decoder.decode(plot_str))
-
-    # Build the rich table graph
-    message = Table.grid()
-    message.add_column()
-    for line in lines:
-        message.add_row(line)
-    return Align.center(message)
+    return chart_grid(plotext_helper())
 
 
+@cached_chart
 def make_protocol_daily_plot(experiment_hist) -> Align:
     """Plot curve displaying a memory usage times series for the cluster."""
     plt.clear_plot()
@@ -89,19 +104,19 @@ def make_protocol_daily_plot(experiment_hist) -> Align:
         )
     except Exception:
         pass
-    plt.figure.plot_size(42, 9)
+    plt.figure.plot_size(PLOT_WIDTH, PLOT_HEIGHT)
     plt.canvas_color("black")
     plt.axes_color("black")
     plt.ticks_color("white")
 
-    plot_str = plotext_helper()
-    decoder = AnsiDecoder()
-    lines = list(decoder.decode(plot_str))
+    return chart_grid(plotext_helper())
+
 
-    # Build the rich table graph
+def chart_grid(plot_str: str) -> Align:
+    """Decode plotext ANSI string once into a centered rich table grid."""
     message = Table.grid()
     message.add_column()
-    for line in lines:
+    for line in AnsiDecoder().decode(plot_str):
         message.add_row(line)
     return Align.center(message)
 
@@ -172,6 +172,17 @@ def make_process_panel_local(proc_data) -> Align:
             str(round(proc_data["cpu_util"][i], 1)),
             str(round(proc_data["mem_util"][i], 1)),
         )
+
+    # Add row for each running protocol experiment with matched processes
+    experiments = proc_data.get("experiment_attribution", {})
+    for e_id in sorted(experiments, key=str):
+        t1.add_row(
+            f"E{e_id}",
+            f"{experiments[e_id]['num_procs']} proc",
+            str(round(experiments[e_id]["cpu_percent"], 1)),
+            str(round(experiments[e_id]["rss"], 1)),
+            style="bold",
+        )
     return t1
 
 
@@ -62,6 +62,8 @@ class Header:
         self.resource = resource
         self.use_gcs_sync = use_gcs_sync
         self.protocol_fname = protocol_fname
+        # CPU share used by the live dashboard process (set while running)
+        self.duty_cycle = None
 
     def __rich__(self) -> Panel:
         grid = Table.grid(expand=True)
@@ -94,7 +96,9 @@ class Header:
             f"Resource: {self.resource.resource_name} :computer:",
         )
         grid.add_row(
-            "[bold]Carpe Diem[/bold] :city_sunrise:",
+            "[bold]Carpe Diem[/bold] :city_sunrise:"
+            if self.duty_cycle is None
+            else f"\u2022 Monitor CPU Load: {self.duty_cycle:.1%}",
             Header.welcome_ascii[4],
             "[bold]Hi there - You rock!  [not italic]:hugging_face:[/]",
         )
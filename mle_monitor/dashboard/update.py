@@ -1,6 +1,9 @@
 from rich.panel import Panel
 from rich.align import Align
 from rich.table import Table
+from rich.markup import escape
+from typing import Union
+from ..utils import fingerprint
 from .components import (
     make_user_jobs_cluster,
     make_node_jobs_cluster,
@@ -16,105 +19,210 @@ from .components import (
 )
 
 
-def update_dashboard(layout, resource_data, protocol_data, usage_data):
-    """Helper function that fills dashboard with life!"""
+def update_dashboard(
+    layout,
+    resource_data,
+    protocol_data,
+    usage_data,
+    fingerprints: Union[dict, None] = None,
+    plots: bool = True,
+):
+    """Helper function that fills dashboard with life!
+
+    If a `fingerprints` dict is provided (kept across calls for the same
+    layout), panels are only regenerated if the content of their input data
+    changed since the last update. `plots=False` skips the plot panels.
+    """
     # Fill the left-main with life!
     if resource_data["resource_name"] in ["sge-cluster", "slurm-cluster"]:
-        table_user = make_user_jobs_cluster(resource_data["user_data"])
-        queue_var = (
-            "PARTITION"
-            if resource_data["resource_name"] == "slurm-cluster"
-            else "QUEUE"
-        )
-        table_host = make_node_jobs_cluster(resource_data["host_data"], queue_var)
-        table_node = make_node_jobs_cluster(resource_data["node_data"], "NODE")
-        grid = Table.grid(expand=True)
-        grid.add_column()
-        grid.add_row(table_user)
-        grid.add_row(table_host)
-        grid.add_row(table_node)
-        layout["left"].update(
-            Panel(
-                Align.center(grid),
-                border_style="red",
-                title="Jobs by User/Queue/Node",
-            )
+        update_panel(
+            layout,
+            "left",
+            fingerprints,
+            [
+                resource_data["resource_name"],
+                resource_data["user_data"],
+                resource_data["host_data"],
+                resource_data["node_data"],
+                resource_data.get("stale"),
+            ],
+            lambda: make_cluster_panel(resource_data),
         )
     else:
-        table_device = make_device_panel_local(resource_data["host_data"])
-        table_process = make_process_panel_local(resource_data["user_data"])
-        grid = Table.grid()
-        grid.add_column()
-        grid.add_row(table_device)
-        grid.add_row(table_process)
-
-        layout["left"].update(
-            Panel(
-                Align.center(grid),
-                border_style="red",
-                title="Local - Util by Device/Process",
-            )
+        update_panel(
+            layout,
+            "left",
+            fingerprints,
+            [resource_data["user_data"], resource_data["host_data"]],
+            lambda: make_local_panel(resource_data),
         )
 
-    # Fill the center-main with life!
-    layout["top-right-left"].update(
-        Panel(
+    # Fill the center-main with life! - table rows identify its content
+    update_panel(
+        layout,
+        "top-right-left",
+        fingerprints,
+        protocol_data.get("protocol_rows", protocol_data["protocol_table"]),
+        lambda: Panel(
             make_protocol(protocol_data["protocol_table"]),
             border_style="bright_blue",
             title="Experiment Protocol Summary",
-        )
+        ),
     )
 
     # Fill the right-main with life!
-    layout["top-right-right-1"].update(
-        Panel(
+    update_panel(
+        layout,
+        "top-right-right-1",
+        fingerprints,
+        protocol_data["total_data"],
+        lambda: Panel(
             make_total_experiments(protocol_data["total_data"]),
             border_style="yellow",
             title="Total Number of Experiment Runs",
-        )
+        ),
     )
-    layout["top-right-right-2"].update(
-        Panel(
+    update_panel(
+        layout,
+        "top-right-right-2",
+        fingerprints,
+        protocol_data["last_data"],
+        lambda: Panel(
             make_last_experiment(protocol_data["last_data"]),
             border_style="yellow",
             title="Last Experiment Configuration",
-        )
+        ),
     )
-    layout["top-right-right-3"].update(
-        Panel(
+    update_panel(
+        layout,
+        "top-right-right-3",
+        fingerprints,
+        protocol_data["time_data"],
+        lambda: Panel(
             make_est_completion(protocol_data["time_data"]),
             border_style="yellow",
             title="Experiment Completion Time",
-        )
+        ),
     )
 
-    # Fill the footer with life!
-    layout["bottom-right-1"].update(
-        Panel(
+    # Fill the footer with life! - plots may be refreshed less frequently
+    if not plots:
+        return layout
+    util_data = resource_data["util_data"]
+    update_panel(
+        layout,
+        "bottom-right-1",
+        fingerprints,
+        [
+            usage_data,
+            [util_data[k] for k in ["cores_util", "cores", "mem_util", "mem"]],
+        ],
+        lambda: Panel(
             make_util_plot(usage_data),
             title=(
-                f"CPU: {int(resource_data['util_data']['cores_util'])}/"
-                f"{int(resource_data['util_data']['cores'])}T"
-                f" - Memory: {int(resource_data['util_data']['mem_util'])}/"
-                f"{int(resource_data['util_data']['mem'])}G"
+                f"CPU: {int(util_data['cores_util'])}/"
+                f"{int(util_data['cores'])}T"
+                f" - Memory: {int(util_data['mem_util'])}/"
+                f"{int(util_data['mem'])}G"
             ),
             border_style="yellow",
         ),
     )
-
-    layout["bottom-right-2"].update(
-        Panel(
-            make_protocol_total_plot(protocol_data["summary_data"]),
+    summary_data = protocol_data["summary_data"]
+    update_panel(
+        layout,
+        "bottom-right-2",
+        fingerprints,
+        [summary_data["time"], summary_data["total_exp"]],
+        lambda: Panel(
+            make_protocol_total_plot(summary_data),
             title=("Protocol Timeline: Total Experiments"),
             border_style="yellow",
         ),
     )
-
-    layout["bottom-right-3"].update(
-        Panel(
-            make_protocol_daily_plot(protocol_data["summary_data"]),
+    update_panel(
+        layout,
+        "bottom-right-3",
+        fingerprints,
+        [summary_data["day"], summary_data["day_exp"]],
+        lambda: Panel(
+            make_protocol_daily_plot(summary_data),
             title=("Protocol Timeline: Experiments/Day"),
             border_style="yellow",
-        )
+        ),
     )
     return layout
+
+
+def update_panel(layout, name: str, fingerprints, inputs, make_panel) -> bool:
+    """Regenerate a layout panel if the fingerprint of its inputs changed."""
+    if fingerprints is not None:
+        key = fingerprint(inputs)
+        if fingerprints.get(name) == key:
+            return False
+        fingerprints[name] = key
+    layout[name].update(make_panel())
+    return True
+
+
+def make_status_panel(collectors: dict) -> Panel:
+    """Placeholder shown until every collector published its first data."""
+    table = Table.grid(padding=(0, 2))
+    table.add_column()
+    table.add_column()
+    for name, collector in collectors.items():
+        if collector.ready.is_set():
+            status = "[green]:heavy_check_mark: ready"
+        elif collector.error is not None:
+            error = f"{type(collector.error).__name__}: {collector.error}"
+            status = "[red]:heavy_multiplication_x: " + escape(error)
+        else:
+            status = "[yellow]:hourglass_flowing_sand: waiting for first data"
+        table.add_row(f"[b]{name}", status)
+    return Panel(
+        Align.center(table, vertical="middle"),
+        border_style="red",
+        title="Collecting Dashboard Data",
+    )
+
+
+def make_cluster_panel(resource_data) -> Panel:
+    """Jobs by user/queue/node tables of a cluster resource."""
+    table_user = make_user_jobs_cluster(resource_data["user_data"])
+    queue_var = (
+        "PARTITION" if resource_data["resource_name"] == "slurm-cluster" else "QUEUE"
+    )
+    table_host = make_node_jobs_cluster(resource_data["host_data"], queue_var)
+    table_node = make_node_jobs_cluster(resource_data["node_data"], "NODE")
+    grid = Table.grid(expand=True)
+    grid.add_column()
+    grid.add_row(table_user)
+    grid.add_row(table_host)
+    grid.add_row(table_node)
+    # Mark data of slow scheduler queries with its age
+    title = "Jobs by User/Queue/Node"
+    stale = resource_data.get("stale")
+    if stale:
+        title += " - [b]Stale: " + ", ".join(
+            f"{name} {int(age)}s" for name, age in stale.items()
+        )
+    return Panel(
+        Align.center(grid),
+        border_style="red",
+        title=title,
+    )
+
+
+def make_local_panel(resource_data) -> Panel:
+    """Device & process utilisation tables of the local machine."""
+    table_device = make_device_panel_local(resource_data["host_data"])
+    table_process = make_process_panel_local(resource_data["user_data"])
+    grid = Table.grid()
+    grid.add_column()
+    grid.add_row(table_device)
+    grid.add_row(table_process)
+    return Panel(
+        Align.center(grid),
+        border_style="red",
+        title="Local - Util by Device/Process",
+    )
@@ -1,9 +1,27 @@
 import time
+import logging
+import threading
+from typing import Union
 from rich.live import Live
 from rich.console import Console
 from . import MLEProtocol, MLEResource
-from .utils import Tracker
-from .dashboard import layout_dashboard, update_dashboard
+from .utils import Tracker, fingerprint
+from .dashboard import layout_dashboard, update_dashboard, Collector, PLOT_WIDTH
+from .dashboard.update import make_status_panel
+
+
+# Default seconds between two data collections per source & dashboard redraws
+COLLECT_INTERVALS = {
+    "resource": 5,
+    "protocol": 2,
+    "tracker": 5,
+    "plots": 30,
+    "render": 1,
+}
+# Collection interval of unchanged sources grows up to this factor
+MAX_BACKOFF = 4
+# Seconds to wait for the first data of all sources before showing the screen
+STARTUP_TIMEOUT = 10
 
 
 class MLEDashboard(object):
@@ -12,6 +30,12 @@ class MLEDashboard(object):
         self.protocol = protocol
         self.resource = resource
         self.tracker = Tracker()
+        # Last resource snapshot added to tracker & time of last GCS pull
+        self.tracked_version = 0
+        self.timer_gcs = time.time()
+        self.collectors = {}
+        # Running protocol experiments - their processes are attributed
+        self.running_experiments = {}
 
     def snapshot(self):
         """Get single console output snapshot."""
@@ -22,59 +46,174 @@ class MLEDashboard(object):
             self.protocol.protocol_fname,
         )
         # Retrieve the data
-        resource_data = self.resource.monitor()
+        resource_data = self.resource.monitor(self.attributed_experiments())
         protocol_data = self.protocol.monitor()
-        usage_data = self.tracker.update(resource_data["util_data"])
+        self.tracker.update(resource_data["util_data"])
+        usage_data = self.tracker.view(num_points=PLOT_WIDTH)
         # Update the layout and print it
         layout = update_dashboard(
             layout, resource_data, protocol_data, usage_data
         )
         Console().print(layout)
 
-    def live(self, pull_gcs: bool = False):
-        """Run constant monitoring in while loop."""
-        # Generate the dashboard layout and display first data
+    def live(
+        self,
+        pull_gcs: bool = False,
+        intervals: Union[dict, None] = None,
+        cpu_budget: float = 0.05,
+    ):
+        """Run constant monitoring in while loop.
+
+        Resource, protocol & tracker data are collected on background threads
+        every `intervals[<source>]` seconds, backing off (up to `MAX_BACKOFF`
+        x the interval) while their data is unchanged. The dashboard is
+        redrawn every `intervals["render"]` seconds from the latest snapshots
+        (plots at most every `intervals["plots"]` seconds). Each thread waits
+        longer if it uses more than `cpu_budget` of a core. Until every source
+        delivered data, a placeholder lists the pending sources & their errors.
+        """
+        intervals = {**COLLECT_INTERVALS, **(intervals or {})}
+        # Generate the dashboard layout
         layout = layout_dashboard(
             self.resource,
             self.protocol.use_gcs_protocol_sync,
             self.protocol.protocol_fname,
         )
+        header = layout["header"].renderable
 
-        resource_data = self.resource.monitor()
-        protocol_data = self.protocol.monitor()
-        usage_data = self.tracker.update(resource_data["util_data"])
-        layout = update_dashboard(
-            layout, resource_data, protocol_data, usage_data
-        )
+        # Content fingerprints of the panels' inputs - only redraw changes
+        fingerprints = {}
 
-        # Start timers for GCS pulling and reloading of local protocol db
-        timer_gcs = time.time()
-        timer_db = time.time()
-
-        # Run the live updating of the dashboard
-        with Live(console=Console(), screen=True, auto_refresh=True) as live:
-            live.update(layout)
-            while True:
-                try:
-                    resource_data = self.resource.monitor()
-                    protocol_data = self.protocol.monitor()
-                    usage_data = self.tracker.update(
-                        resource_data["util_data"],
-                        protocol_data["summary_data"],
-                    )
-                    layout = update_dashboard(
-                        layout, resource_data, protocol_data, usage_data
+        # Start collectors - signal new data to the renderer
+        new_data = threading.Event()
+        sources = {
+            "resource": (
+                lambda: self.resource.monitor(self.running_experiments),
+                resource_signature,
+            ),
+            "protocol": (
+                lambda: self.collect_protocol(pull_gcs),
+                protocol_signature,
+            ),
+            "tracker": (
+                lambda: self.collect_usage(self.collectors["resource"]),
+                fingerprint,
+            ),
+        }
+        self.collectors = {
+            name: Collector(
+                name,
+                collect,
+                intervals[name],
+                new_data,
+                max_interval=MAX_BACKOFF * intervals[name],
+                signature=signature,
+                max_duty_cycle=cpu_budget,
+            )
+            for name, (collect, signature) in sources.items()
+        }
+        for collector in self.collectors.values():
+            collector.start()
+
+        # Errors of dashboard updates - each is only logged once
+        logger, render_errors = logging.getLogger(__name__), set()
+        try:
+            # Display first data once every collector completed once
+            deadline = time.time() + STARTUP_TIMEOUT
+            for collector in self.collectors.values():
+                collector.wait_ready(max(0, deadline - time.time()))
+
+            # Run the live updating of the dashboard - refreshed manually
+            start_t, start_cpu = time.time(), time.process_time()
+            last_plots = 0
+            shown = None
+            with Live(console=Console(), screen=True, auto_refresh=False) as live:
+                while True:
+                    frame_t, frame_cpu = time.time(), time.thread_time()
+                    if not all(c.ready.is_set() for c in self.collectors.values()):
+                        # Slow or failing sources - show what is missing & why
+                        shown = make_status_panel(self.collectors)
+                        live.update(shown)
+                    elif new_data.is_set() or shown is not layout:
+                        new_data.clear()
+                        plots = frame_t - last_plots >= intervals["plots"]
+                        try:
+                            layout = update_dashboard(
+                                layout,
+                                self.collectors["resource"].latest()[1],
+                                self.collectors["protocol"].latest()[1],
+                                self.collectors["tracker"].latest()[1],
+                                fingerprints,
+                                plots,
+                            )
+                            if plots:
+                                last_plots = frame_t
+                        except Exception as e:
+                            # Keep showing the last frame
+                            if repr(e) not in render_errors:
+                                render_errors.add(repr(e))
+                                logger.exception("Dashboard update failed")
+                        shown = layout
+                        live.update(layout)
+                    # Report CPU share of the whole monitoring process
+                    header.duty_cycle = (time.process_time() - start_cpu) / max(
+                        time.time() - start_t, 1e-6
                     )
+                    live.refresh()
+                    # Limit frame rate & CPU share of the renderer
+                    busy = time.thread_time() - frame_cpu
+                    wait = max(intervals["render"], busy / cpu_budget)
+                    time.sleep(max(0, wait - (time.time() - frame_t)))
+        finally:
+            for collector in self.collectors.values():
+                collector.stop()
+
+    def duty_cycles(self) -> dict:
+        """CPU share of each (running) collector thread."""
+        return {name: c.duty_cycle for name, c in self.collectors.items()}
+
+    def collect_protocol(self, pull_gcs: bool = False):
+        """Reload local protocol db (if changed) and get its monitoring data."""
+        # Every 5 minutes pull the newest DB from GCS
+        if pull_gcs and time.time() - self.timer_gcs > 300:
+            self.protocol.load()
+            self.timer_gcs = time.time()
+        else:
+            self.protocol.load(pull_gcs=False)
+        self.running_experiments = self.attributed_experiments()
+        return self.protocol.monitor()
+
+    def attributed_experiments(self) -> dict:
+        """Running experiments whose processes are attributed (local only)."""
+        if self.resource.resource_name != "local":
+            return {}
+        return self.protocol.running_experiments()
+
+    def collect_usage(self, resource: Collector):
+        """Add latest resource utilisation to tracker (if not yet tracked)."""
+        version, resource_data = resource.latest()
+        if version == self.tracked_version:
+            return None
+        self.tracked_version = version
+        # Utilisation of a slow cluster query was already tracked before
+        if "nodes" in resource_data.get("stale", {}):
+            return None
+        self.tracker.update(resource_data["util_data"])
+        return self.tracker.view(num_points=PLOT_WIDTH)
+
+
+def resource_signature(resource_data: dict) -> str:
+    """Fingerprint of resource data ignoring the time of collection."""
+    util_data = {
+        k: v
+        for k, v in resource_data.get("util_data", {}).items()
+        if k not in ["time", "time_date", "time_hour"]
+    }
+    return fingerprint({**resource_data, "util_data": util_data})
+
 
-                    # Every 10 seconds reload local database file
-                    if time.time() - timer_db > 2:
-                        self.protocol.load(pull_gcs=False)
-                        timer_db = time.time()
-
-                    # Every 5 minutes pull the newest DB from GCS
-                    if pull_gcs:
-                        if time.time() - timer_gcs > 300:
-                            self.protocol.load()
-                            timer_gcs = time.time()
-                except Exception:
-                    pass
+def protocol_signature(protocol_data: dict) -> str:
+    """Fingerprint of protocol data - the table by the content of its rows."""
+    return fingerprint(
+        {k: v for k, v in protocol_data.items() if k != "protocol_table"}
+    )
@@ -1,16 +1,24 @@
 from typing import Union, List
 from datetime import datetime
+from contextlib import contextmanager
 import sys
 import select
 import logging
 from .protocol import (
+    STORAGE_BACKENDS,
+    FileLock,
     load_protocol_db,
+    get_experiment_ids,
     protocol_summary,
     protocol_experiment,
     protocol_table,
     get_monitor_db_data,
+    count_experiment_totals,
+    get_totals,
+    totals_key,
+    TOTALS_VARS,
 )
-from .utils import setup_logger
+from .utils import setup_logger, natural_keys
 
 
 class MLEProtocol(object):
@@ -19,11 +27,33 @@ class MLEProtocol(object):
         protocol_fname: str,
         cloud_settings: Union[dict, None] = None,
         verbose: bool = False,
+        storage: str = "pickledb",
+        multi_writer: bool = False,
     ):
-        """MLE Protocol DB Instance."""
+        """MLE Protocol DB Instance.
+
+        Set `multi_writer` if many processes (e.g. search workers) update the
+        same protocol. Saves are then applied as read-modify-write transactions
+        under an advisory file lock, merging the local changes into the
+        current on-disk state instead of overwriting it.
+        """
+        assert storage in STORAGE_BACKENDS.keys()
         self.protocol_fname = protocol_fname
         self.cloud_settings = cloud_settings
         self.verbose = verbose
+        self.storage = storage
+        self.multi_writer = multi_writer
+        # SQLite serializes concurrent writers via its own database lock
+        self.file_lock = FileLock(
+            self.protocol_fname + ".lock", multi_writer and storage != "sqlite"
+        )
+        # Nesting depth of `transaction` blocks & deferred save requests
+        self.transaction_depth = 0
+        self.deferred_save, self.deferred_send_gcs = False, False
+        # Rendered protocol table rows reused across dashboard refreshes
+        self.table_row_cache = {}
+        # Ids of running experiments - rebuilt lazily after reloads
+        self.running_ids = None
         if self.verbose:
             self.logger = setup_logger(logging.INFO)
         else:
@@ -60,18 +90,85 @@ class MLEProtocol(object):
 
     def load(self, pull_gcs: bool = True):
         """Load the protocol data from a local pickle file."""
+        # Reloading within a transaction would discard its pending changes
+        if self.transaction_depth > 0:
+            return
         if self.use_gcs_protocol_sync:
             if pull_gcs:
                 self.accessed_gcs = self.gcs_pull()
+                # Pulled protocol is up-to-date - drop stale local changes
+                if self.accessed_gcs:
+                    STORAGE_BACKENDS[self.storage].discard_local_changes(
+                        self.protocol_fname
+                    )
             else:
                 self.accessed_gcs = False
         else:
             self.accessed_gcs = False
+        # Only re-parse the protocol file (& re-sort ids) if it has changed
+        if hasattr(self, "db") and not self.accessed_gcs:
+            if self.db.refresh():
+                self.experiment_ids, self.last_experiment_id = get_experiment_ids(
+                    self.db
+                )
+                self.running_ids = None
+            return
+        self.running_ids = None
         (
             self.db,
             self.experiment_ids,
             self.last_experiment_id,
-        ) = load_protocol_db(self.protocol_fname)
+        ) = load_protocol_db(self.protocol_fname, self.storage, self.multi_writer)
+
+    @property
+    def lock(self):
+        """Lock held while writing - for SQLite the database write transaction,
+        which is otherwise committed after every single change."""
+        if self.storage == "sqlite":
+            return self.db
+        return self.file_lock
+
+    def merge(self):
+        """Merge unsaved local changes into the current on-disk protocol."""
+        with self.lock:
+            self.db.merge()
+            self.experiment_ids, self.last_experiment_id = get_experiment_ids(
+                self.db
+            )
+            self.running_ids = None
+
+    @contextmanager
+    def transaction(self, pull_gcs: bool = False):
+        """Batch protocol updates - defer all saves & GCS uploads until exit.
+
+        Within the block `save()` only marks the protocol as modified and
+        `load()` is skipped. On exit a single save (and GCS upload if any of
+        the batched calls requested one) is performed. If an exception is
+        raised, all changes made within the block are discarded.
+        """
+        with self.lock:
+            if self.transaction_depth == 0:
+                if pull_gcs:
+                    self.load(pull_gcs)
+                self.deferred_save, self.deferred_send_gcs = False, False
+            self.transaction_depth += 1
+            try:
+                yield self
+            except Exception:
+                self.transaction_depth -= 1
+                if self.transaction_depth == 0:
+                    self.db.rollback()
+                    (
+                        self.experiment_ids,
+                        self.last_experiment_id,
+                    ) = get_experiment_ids(self.db)
+                    self.running_ids = None
+                raise
+            self.transaction_depth -= 1
+            if self.transaction_depth == 0 and self.deferred_save:
+                self.save(self.deferred_send_gcs)
+
+    batch = transaction
 
     def get(
         self,
@@ -91,7 +188,12 @@ class MLEProtocol(object):
 
     def save(self, send_gcs: bool = True):
         """Dump the protocol db to its pickle file."""
-        self.db.dump()
+        if self.transaction_depth > 0:
+            self.deferred_save = True
+            self.deferred_send_gcs = self.deferred_send_gcs or send_gcs
+            return
+        with self.lock:
+            self.db.dump()
         if self.verbose:
             self.logger = setup_logger(logging.INFO)
         else:
@@ -101,6 +203,9 @@ class MLEProtocol(object):
         # Send recent/up-to-date experiment DB to Google Cloud Storage
         if send_gcs and self.use_gcs_protocol_sync:
             if self.accessed_gcs:
+                # Make sure the uploaded protocol file holds the full state
+                with self.lock:
+                    self.db.compact()
                 self.gcs_send()
                 self.logger.info(f"GCS synced protocol: {self.protocol_fname}")
 
@@ -160,16 +265,29 @@ class MLEProtocol(object):
             "multiple-configs",
             "single-config",
         ]
-        self.db, new_experiment_id = protocol_experiment(
-            self.db, self.last_experiment_id, standard, extra
-        )
-        self.experiment_ids.append(new_experiment_id)
-        self.last_experiment_id = new_experiment_id
-        self.added_experiment_id = new_experiment_id
-        self.completed_jobs_counter = 0
-        self.logger.info(f"Added experiment {new_experiment_id} to protocol.")
-        if save:
-            self.save(send_gcs)
+        # Hold lock so that no other writer can claim the same experiment id
+        with self.lock:
+            if self.multi_writer:
+                self.merge()
+            self.db, new_experiment_id = protocol_experiment(
+                self.db, self.last_experiment_id, standard, extra
+            )
+            if get_totals(self.db):
+                experiment_data = self.db.get(str(new_experiment_id))
+                self.update_totals("total", None, 1)
+                for var_name in TOTALS_VARS:
+                    self.update_totals(var_name, experiment_data.get(var_name), 1)
+            self.experiment_ids.append(new_experiment_id)
+            self.track_running(new_experiment_id, "running")
+            self.last_experiment_id = new_experiment_id
+            self.added_experiment_id = new_experiment_id
+            self.completed_jobs_counter = 0
+            # Start maintaining totals (e.g. new or legacy protocol db)
+            if not get_totals(self.db):
+                self.rebuild_totals(save=False)
+            self.logger.info(f"Added experiment {new_experiment_id} to protocol.")
+            if save:
+                self.save(send_gcs)
         return new_experiment_id
 
     def abort(
@@ -179,9 +297,9 @@ class MLEProtocol(object):
         send_gcs: bool = True,
     ):
         """Abort an experiment - change status in db."""
-        self.db.dadd(str(experiment_id), ("job_status", "aborted"))
-        if save:
-            self.save(send_gcs)
+        self.update(
+            experiment_id, "job_status", "aborted", save=save, send_gcs=send_gcs
+        )
 
     def delete(
         self,
@@ -190,18 +308,22 @@ class MLEProtocol(object):
         send_gcs: bool = True,
     ):
         """Delete an experiment - change status in db."""
-        self.db.drem(str(experiment_id))
-        self.all_experiment_ids = list(self.db.getall())
-        try:
-            self.all_experiment_ids.remove("summary")
-        except Exception:
-            pass
-        if len(self.all_experiment_ids) > 0:
-            self.last_experiment_id = int(self.all_experiment_ids[-1])
-        else:
-            self.last_experiment_id = 0
-        if save:
-            self.save(send_gcs)
+        # Totals are adjusted by the values of the latest on-disk state
+        with self.lock:
+            if self.multi_writer:
+                self.merge()
+            experiment_data = self.db.get(str(experiment_id))
+            if experiment_data and get_totals(self.db):
+                self.update_totals("total", None, -1)
+                for var_name in TOTALS_VARS:
+                    self.update_totals(var_name, experiment_data.get(var_name), -1)
+            self.db.drem(str(experiment_id))
+            self.track_running(experiment_id, None)
+            self.experiment_ids, self.last_experiment_id = get_experiment_ids(
+                self.db
+            )
+            if save:
+                self.save(send_gcs)
 
     def update_progress_bar(
         self,
@@ -211,22 +333,46 @@ class MLEProtocol(object):
         save: bool = True,
         send_gcs: bool = False,
     ):
-        """Update progress bar of completed jobs using an integer increment."""
+        """Update progress bar of completed jobs using an integer increment.
+
+        The increment is applied to the stored count of any `experiment_id`
+        (default: last added). `completed_jobs_counter` counts the completed
+        jobs of the last added experiment reported by this instance.
+        """
         if experiment_id is None:
             experiment_id = self.added_experiment_id
             self.completed_jobs_counter += completed_increment
         try:
-            self.load(pull_gcs)
-            self.update(
+            if pull_gcs:
+                self.load(pull_gcs)
+            self.increment(
                 experiment_id,
                 "completed_jobs",
-                self.completed_jobs_counter,
+                completed_increment,
                 save=save,
                 send_gcs=send_gcs,
             )
         except Exception:
             pass
 
+    def increment(
+        self,
+        experiment_id: Union[int, str],
+        var_name: str = "completed_jobs",
+        increment: int = 1,
+        save: bool = True,
+        send_gcs: bool = False,
+    ):
+        """Increment a numeric variable of an experiment by a delta.
+
+        The delta is applied to the current on-disk value when saving, so it
+        works from any process without reloading the protocol beforehand.
+        Increments with `save=False` are coalesced into a single write.
+        """
+        self.db.dincr(str(experiment_id), var_name, increment)
+        if save:
+            self.save(send_gcs)
+
     def complete(
         self,
         experiment_id: Union[int, str],
@@ -280,6 +426,37 @@ class MLEProtocol(object):
         """Get the status of an experiment."""
         return self.db.dget(str(experiment_id), "job_status")
 
+    def running_experiments(self) -> dict:
+        """Script & directory of all running experiments (for attribution).
+
+        SQLite queries the `job_status` index. For other backends the running
+        ids are kept up to date on changes and only re-scanned after reloads.
+        """
+        variables = ["base_fname", "experiment_dir"]
+        if self.storage == "sqlite":
+            return self.db.find("job_status", "running", variables)
+        if self.running_ids is None:
+            self.running_ids = {
+                str(e_id)
+                for e_id in self.experiment_ids
+                if self.db.dget(str(e_id), "job_status") == "running"
+            }
+        running = {}
+        for e_id in sorted(self.running_ids, key=natural_keys):
+            experiment_data = self.db.get(e_id)
+            if experiment_data:
+                running[e_id] = {v: experiment_data.get(v) for v in variables}
+        return running
+
+    def track_running(self, experiment_id: Union[int, str], job_status):
+        """Add/remove an experiment from the running ids (if maintained)."""
+        if self.running_ids is None:
+            return
+        if job_status == "running":
+            self.running_ids.add(str(experiment_id))
+        else:
+            self.running_ids.discard(str(experiment_id))
+
     def update(
         self,
         experiment_id: Union[int, str],
@@ -289,16 +466,51 @@ class MLEProtocol(object):
         send_gcs: bool = True,
     ):
         """Update the data of an experiment."""
-        # Update the variable(s) of the experiment
-        if type(var_name) == list:
+        if type(var_name) != list:
+            var_name, var_value = [var_name], [var_value]
+        # Replaced values of totals variables are read from the latest
+        # on-disk state (under lock) - other updates are appended as is
+        with self.lock:
+            totals = get_totals(self.db) if set(var_name) & set(TOTALS_VARS) else None
+            if totals and self.multi_writer:
+                self.merge()
+                totals = get_totals(self.db)
+            # Update the variable(s) of the experiment & the maintained totals
             for db_v_id in range(len(var_name)):
+                old_value = None
+                if totals and var_name[db_v_id] in TOTALS_VARS:
+                    experiment_data = self.db.get(str(experiment_id))
+                    if experiment_data:
+                        old_value = experiment_data.get(var_name[db_v_id])
                 self.db.dadd(
                     str(experiment_id), (var_name[db_v_id], var_value[db_v_id])
                 )
-        else:
-            self.db.dadd(str(experiment_id), (var_name, var_value))
+                if totals and var_name[db_v_id] in TOTALS_VARS:
+                    self.update_totals(var_name[db_v_id], old_value, -1)
+                    self.update_totals(var_name[db_v_id], var_value[db_v_id], 1)
+                if var_name[db_v_id] == "job_status":
+                    self.track_running(experiment_id, var_value[db_v_id])
+            if save:
+                self.save(send_gcs)
+
+    def update_totals(self, var_name: str, value, increment: int):
+        """Adjust maintained counter to which an experiment variable counts."""
+        key = "total" if var_name == "total" else totals_key(var_name, value)
+        if key is not None:
+            self.db.dincr("summary", ["totals", key], increment)
+
+    def rebuild_totals(self, save: bool = True, send_gcs: bool = True):
+        """(Re-)count the dashboard totals, e.g. for legacy protocol dbs.
+
+        Totals are stored in the `summary` entry (created by the first `add`),
+        so that older versions don't mistake them for an experiment.
+        """
+        totals = count_experiment_totals(self, self.experiment_ids)
+        if self.db.get("summary"):
+            self.db.dadd("summary", ("totals", totals))
         if save:
             self.save(send_gcs)
+        return totals
 
     def summary(
         self,
@@ -306,13 +518,14 @@ class MLEProtocol(object):
         verbose: bool = True,
         return_table: bool = False,
         full: bool = False,
+        columns: Union[List[str], None] = None,
     ):
         """Print a rich summary table of all experiments in db."""
         summary = protocol_summary(
-            self.db, self.experiment_ids, tail, verbose, full
+            self.db, self.experiment_ids, tail, verbose, full, columns
         )
         if return_table:
-            return protocol_table(summary, full)
+            return protocol_table(summary, full, self.table_row_cache)
         return summary
 
     def monitor(self):
@@ -345,6 +558,8 @@ class MLEProtocol(object):
             "time_data": time_data,
             "summary_data": summary_data,
             "protocol_table": protocol_table,
+            # Content of the rendered table rows - used for change detection
+            "protocol_rows": list(self.table_row_cache.keys()),
         }
 
     def retrieve(
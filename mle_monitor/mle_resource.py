@@ -1,12 +1,25 @@
 from typing import Union
 from .resource import SGEResource, SlurmResource, LocalResource, GCPResource
+from .resource.cache import SnapshotCache
 
 
 class MLEResource(object):
     def __init__(
-        self, resource_name: str = "local", monitor_config: Union[dict, None] = None
+        self,
+        resource_name: str = "local",
+        monitor_config: Union[dict, None] = None,
+        cache_ttl: Union[float, None] = None,
+        cache_fname: Union[str, None] = None,
+        cache_mode: int = 0o660,
     ):
-        """MLE Resource Instance - Get Monitoring Data."""
+        """MLE Resource Instance - Get Monitoring Data.
+
+        Cluster & cloud snapshots can be reused for `cache_ttl` seconds. Older
+        ones are returned while they are refreshed in the background. With a
+        `cache_fname` several processes share a single scheduler poll. Its
+        `cache_mode` permissions share the file with the users of a group -
+        0o666 opts into sharing it with all users of the machine.
+        """
         assert resource_name in ["local", "sge-cluster", "slurm-cluster", "gcp-cloud"]
         self.resource_name = resource_name
         self.monitor_config = monitor_config
@@ -20,11 +33,27 @@ class MLEResource(object):
         else:
             self.resource = LocalResource(self.monitor_config)
 
-    def monitor(self):
-        """Get utilization data."""
+        # Local data is cheap to collect & specific to the monitoring process
+        self.cache = None
+        if cache_ttl is not None and self.resource_name != "local":
+            self.cache = SnapshotCache(cache_ttl, cache_fname, cache_mode)
+
+    def monitor(self, experiments: Union[dict, None] = None):
+        """Get utilization data.
+
+        For local resources the usage of the running protocol `experiments`
+        (id -> protocol data, see `MLEProtocol.running_experiments`) is
+        attributed to them.
+        """
+        if self.cache is not None:
+            return self.cache.get(self.collect)
+        return self.collect(experiments)
+
+    def collect(self, experiments: Union[dict, None] = None):
+        """Query the resource for new utilization data."""
         # Get resource dependent data
         if self.resource_name == "local":
-            user_data, host_data, util_data = self.resource.monitor()
+            user_data, host_data, util_data = self.resource.monitor(experiments)
             return {
                 "resource_name": self.resource_name,
                 "user_data": user_data,
@@ -39,6 +68,8 @@ class MLEResource(object):
                 "host_data": host_data,
                 "util_data": util_data,
                 "node_data": node_data,
+                # Scheduler queries that were too slow & returned old data
+                "stale": dict(self.resource.stale),
             }
         else:
             gcp_data = self.resource.monitor()
@@ -1,16 +1,36 @@
-from .load import load_protocol_db
+from .load import load_protocol_db, get_experiment_ids, STORAGE_BACKENDS
+from .storage import PickleStorage, JournalStorage
+from ..utils.file_lock import FileLock
+from .sqlite_storage import SQLiteStorage, migrate_pickledb_to_sqlite
 from .tables import protocol_summary, protocol_table
 from .add import protocol_experiment
-from .summary import get_monitor_db_data
+from .summary import (
+    get_monitor_db_data,
+    count_experiment_totals,
+    get_totals,
+    totals_key,
+    TOTALS_VARS,
+)
 from .gcs_sync import set_gcp_credentials, send_gcloud_db, get_gcloud_db
 
 
 __all__ = [
     "load_protocol_db",
+    "get_experiment_ids",
+    "STORAGE_BACKENDS",
+    "FileLock",
+    "PickleStorage",
+    "JournalStorage",
+    "SQLiteStorage",
+    "migrate_pickledb_to_sqlite",
     "protocol_summary",
     "protocol_table",
     "protocol_experiment",
     "get_monitor_db_data",
+    "count_experiment_totals",
+    "get_totals",
+    "totals_key",
+    "TOTALS_VARS",
     "set_gcp_credentials",
     "send_gcloud_db",
     "get_gcloud_db",
@@ -1,17 +1,29 @@
 import re
-import pickledb
+from .storage import PickleStorage, JournalStorage
+from .sqlite_storage import SQLiteStorage
 
 
-def load_protocol_db(protocol_fname):
+STORAGE_BACKENDS = {
+    "pickledb": PickleStorage,
+    "journal": JournalStorage,
+    "sqlite": SQLiteStorage,
+}
+
+
+def load_protocol_db(
+    protocol_fname: str, storage: str = "pickledb", multi_writer: bool = False
+):
     """Load local database from config name & reconstruct experiment id."""
     # Attempt loading local protocol database - otherwise return clean one
-    db = pickledb.load(protocol_fname, False, sig=False)
+    db = STORAGE_BACKENDS[storage](protocol_fname, multi_writer)
+    all_experiment_ids, last_experiment_id = get_experiment_ids(db)
+    return db, all_experiment_ids, last_experiment_id
+
+
+def get_experiment_ids(db):
+    """Reconstruct sorted experiment ids & most recent id from the db keys."""
     # Get the most recent experiment id
-    all_experiment_ids = list(db.getall())
-    try:
-        all_experiment_ids.remove("summary")
-    except:
-        pass
+    all_experiment_ids = [k for k in db.getall() if k != "summary"]
 
     def natural_keys(text: str):
         """Helper function for sorting alpha-numeric strings."""
@@ -27,4 +39,4 @@ def load_protocol_db(protocol_fname):
         last_experiment_id = int(all_experiment_ids[-1])
     else:
         last_experiment_id = 0
-    return db, all_experiment_ids, last_experiment_id
+    return all_experiment_ids, last_experiment_id
@@ -0,0 +1,321 @@
+import os
+import json
+import sqlite3
+from datetime import datetime
+from typing import List, Union
+from .storage import JournalStorage
+
+
+# Experiment variables promoted to their own (indexed) table columns
+INDEXED_COLUMNS = ["job_status", "exec_resource", "project_name", "start_time"]
+# Further summary variables stored as plain columns - read without JSON parsing
+VALUE_COLUMNS = [
+    "purpose",
+    "experiment_dir",
+    "experiment_type",
+    "num_seeds",
+    "num_cpus",
+    "num_gpus",
+    "num_total_jobs",
+    "completed_jobs",
+]
+
+
+class SQLiteStorage(object):
+    def __init__(self, location: str, multi_writer: bool = False):
+        """Protocol storage backed by SQLite with indexed experiment columns.
+
+        Provides the pickledb subset used by `MLEProtocol` (`get`, `getall`,
+        `dcreate`, `dadd`, `dget`, `drem`, `dump`). Each change is committed
+        right away - concurrent writers are serialized by SQLite itself. Within
+        a `with storage:` block (e.g. `MLEProtocol.transaction`) the write
+        lock is held and changes are only committed on `dump` or block exit.
+        Existing pickledb files at `location` are migrated in place (original
+        kept as backup).
+        """
+        self.multi_writer = multi_writer
+        # Nesting depth of `with` blocks holding the write transaction
+        self.hold_depth = 0
+        self.loco = os.path.expanduser(location)
+        # Empty file: SQLite database just created by another process
+        if os.path.exists(self.loco) and os.path.getsize(self.loco) > 0:
+            if not is_sqlite_file(self.loco):
+                migrate_pickledb_to_sqlite(self.loco, self.loco)
+        self.conn = sqlite3.connect(self.loco, timeout=30, check_same_thread=False)
+        # Large JSON data last - reading the other columns doesn't skip it
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS protocol ("
+            " key TEXT PRIMARY KEY,"
+            " e_id INTEGER,"
+            " job_status TEXT,"
+            " exec_resource TEXT,"
+            " project_name TEXT,"
+            " start_time TEXT,"
+            + "".join(f" {col}," for col in VALUE_COLUMNS)
+            + " data TEXT NOT NULL)"
+        )
+        # Add & fill value columns missing in older protocol files
+        existing = [r[1] for r in self.conn.execute("PRAGMA table_info(protocol)")]
+        for col in VALUE_COLUMNS:
+            if col not in existing:
+                self.conn.execute(f"ALTER TABLE protocol ADD COLUMN {col}")
+                self.conn.execute(
+                    f"UPDATE protocol SET {col} = json_extract(data, ?)",
+                    (f'$."{col}"',),
+                )
+        for col in ["e_id"] + INDEXED_COLUMNS:
+            self.conn.execute(
+                f"CREATE INDEX IF NOT EXISTS idx_{col} ON protocol ({col})"
+            )
+        self.conn.commit()
+        self.data_version = self.get_data_version()
+
+    def get_data_version(self) -> int:
+        return self.conn.execute("PRAGMA data_version").fetchone()[0]
+
+    def refresh(self) -> bool:
+        """Check whether another connection committed changes since the last
+        refresh - reads are always live, uncommitted changes are discarded."""
+        if self.conn.in_transaction:
+            self.conn.rollback()
+            self.data_version = self.get_data_version()
+            return True
+        data_version = self.get_data_version()
+        changed = data_version != self.data_version
+        self.data_version = data_version
+        return changed
+
+    def get(self, key: str):
+        """Get the value of a key - False if it does not exist."""
+        row = self.conn.execute(
+            "SELECT data FROM protocol WHERE key = ?", (key,)
+        ).fetchone()
+        if row is None:
+            return False
+        return json.loads(row[0])
+
+    def getall(self) -> List[str]:
+        """Return a list of all keys in db - experiments in id order."""
+        rows = self.conn.execute(
+            "SELECT key FROM protocol ORDER BY e_id IS NULL, e_id, key"
+        )
+        return [r[0] for r in rows]
+
+    def exists(self, key: str) -> bool:
+        return self.get(key) is not False
+
+    def dcreate(self, name: str):
+        """Create (or reset) an empty entry."""
+        if not isinstance(name, str):
+            raise TypeError("Key/name must be a string!")
+        self.begin()
+        e_id = int(name) if name.isdigit() else None
+        self.conn.execute(
+            "INSERT OR REPLACE INTO protocol (key, e_id, data)"
+            " VALUES (?, ?, '{}')",
+            (name, e_id),
+        )
+        self.release()
+        return True
+
+    def dadd(self, name: str, pair: tuple):
+        """Add a key-value pair to an entry."""
+        # Read-modify-write has to happen within the write transaction
+        self.begin()
+        data = self.dgetall(name)
+        data[pair[0]] = pair[1]
+        return self.dput(name, data)
+
+    def dput(self, name: str, data: dict):
+        """Overwrite full data of an entry - keeps variable columns in sync."""
+        self.begin()
+        columns = INDEXED_COLUMNS + VALUE_COLUMNS
+        self.conn.execute(
+            "UPDATE protocol SET data = ?, "
+            + ", ".join(f"{col} = ?" for col in columns)
+            + " WHERE key = ?",
+            (
+                json.dumps(data),
+                *[index_value(col, data.get(col)) for col in columns],
+                name,
+            ),
+        )
+        self.release()
+        return True
+
+    def dincr(self, name: str, key: Union[str, List[str]], increment=1):
+        """Increment a numeric value in an entry within the database.
+
+        `key` may be a list of keys into nested objects.
+        """
+        self.begin()
+        keys = key if isinstance(key, (list, tuple)) else [key]
+        path = "$" + "".join(f'."{k}"' for k in keys)
+        # Value columns (e.g. completed jobs) are incremented alongside
+        column = ""
+        if keys == [key] and key in VALUE_COLUMNS:
+            column = f", {key} = COALESCE(json_extract(data, ?), 0) + ?"
+        self.conn.execute(
+            "UPDATE protocol SET data = json_set(data, ?,"
+            f" COALESCE(json_extract(data, ?), 0) + ?){column} WHERE key = ?",
+            (path, path, increment, *((path, increment) if column else ()), name),
+        )
+        self.release()
+        return True
+
+    def dget(self, name: str, key: str):
+        return self.dgetall(name)[key]
+
+    def dgetall(self, name: str) -> dict:
+        data = self.get(name)
+        if data is False:
+            raise KeyError(name)
+        return data
+
+    def drem(self, name: str):
+        """Remove an entry and all of its pairs."""
+        self.begin()
+        self.conn.execute("DELETE FROM protocol WHERE key = ?", (name,))
+        self.release()
+        return True
+
+    def begin(self):
+        """Start write transaction (blocks other writers) if none is open."""
+        if not self.conn.in_transaction:
+            self.conn.execute("BEGIN IMMEDIATE")
+
+    def release(self):
+        """Commit the write transaction unless it is held by a `with` block."""
+        if self.hold_depth == 0 and self.conn.in_transaction:
+            self.conn.commit()
+
+    def __enter__(self):
+        self.hold_depth += 1
+        return self
+
+    def __exit__(self, *args):
+        self.hold_depth -= 1
+        self.release()
+
+    def merge(self):
+        """Start write transaction - within a `with` block reads then see the
+        latest committed state, which stays locked against other writers."""
+        self.begin()
+        self.release()
+        return True
+
+    def rollback(self):
+        """Discard all uncommitted changes."""
+        self.conn.rollback()
+        return True
+
+    def dump(self):
+        """Commit all pending changes."""
+        self.conn.commit()
+        return True
+
+    def compact(self):
+        """SQLite file always holds the complete state - simply commit."""
+        return self.dump()
+
+    @staticmethod
+    def discard_local_changes(location: str):
+        """Nothing to discard - uncommitted changes live in the transaction."""
+        return
+
+    def count_by(self, column: str) -> dict:
+        """Number of experiments per value of an indexed column."""
+        assert column in INDEXED_COLUMNS
+        rows = self.conn.execute(
+            f"SELECT {column}, COUNT(*) FROM protocol"
+            f" WHERE e_id IS NOT NULL GROUP BY {column}"
+        )
+        return {r[0]: r[1] for r in rows}
+
+    def tail_columns(
+        self, variables: List[str], num_rows: Union[int, None] = None
+    ) -> List[tuple]:
+        """Id & selected variables of the last `num_rows` experiments (id order).
+
+        Variables stored as table columns are read directly (start times as
+        ISO strings), all others are extracted from the JSON data.
+        """
+        if num_rows is None:
+            num_rows = -1
+        select, paths = select_variables(variables)
+        rows = self.conn.execute(
+            f"SELECT key, {select} FROM protocol WHERE e_id IS NOT NULL"
+            " ORDER BY e_id DESC LIMIT ?",
+            (*paths, num_rows),
+        ).fetchall()
+        rows.reverse()
+        return rows
+
+    def find(self, column: str, value, variables: List[str]) -> dict:
+        """Selected variables of all experiments with an indexed column value
+        (id -> variable dict)."""
+        assert column in INDEXED_COLUMNS
+        select, paths = select_variables(variables)
+        rows = self.conn.execute(
+            f"SELECT key, {select} FROM protocol"
+            f" WHERE {column} = ? AND e_id IS NOT NULL ORDER BY e_id",
+            (*paths, value),
+        )
+        return {r[0]: dict(zip(variables, r[1:])) for r in rows}
+
+
+def select_variables(variables: List[str]):
+    """SELECT expressions (& their JSON paths) of experiment variables."""
+    select, paths = [], []
+    for v in variables:
+        if v in INDEXED_COLUMNS + VALUE_COLUMNS:
+            select.append(v)
+        else:
+            select.append("json_extract(data, ?)")
+            paths.append(f'$."{v}"')
+    return ", ".join(select), paths
+
+
+def index_value(column: str, value):
+    """Store start times as ISO strings so that the index sorts by time.
+
+    Lists & dicts are stored as JSON text (as returned by `json_extract`).
+    """
+    if column == "start_time":
+        try:
+            return datetime.strptime(value, "%m/%d/%y %H:%M").strftime(
+                "%Y-%m-%d %H:%M"
+            )
+        except (TypeError, ValueError):
+            return None
+    if isinstance(value, (list, dict)):
+        return json.dumps(value, separators=(",", ":"))
+    return value
+
+
+def is_sqlite_file(fname: str) -> bool:
+    """Check for the SQLite file header (vs. pickledb JSON file)."""
+    with open(fname, "rb") as f:
+        return f.read(16) == b"SQLite format 3\x00"
+
+
+def migrate_pickledb_to_sqlite(pickledb_fname: str, sqlite_fname: str):
+    """Copy a pickledb (+ journal) protocol into a SQLite protocol file.
+
+    If both paths are identical the pickledb file is moved to
+    `<pickledb_fname>.pickledb.bak` before the SQLite file is created.
+    """
+    # Fold a potential journal into the snapshot so that the backup is complete
+    old_db = JournalStorage(pickledb_fname)
+    old_db.compact()
+    pickledb_fname = os.path.expanduser(pickledb_fname)
+    sqlite_fname = os.path.expanduser(sqlite_fname)
+    if pickledb_fname == sqlite_fname:
+        os.replace(pickledb_fname, pickledb_fname + ".pickledb.bak")
+    new_db = SQLiteStorage(sqlite_fname)
+    # Single commit for all experiments
+    with new_db:
+        for key, data in old_db.db.items():
+            new_db.dcreate(key)
+            new_db.dput(key, data)
+    return new_db
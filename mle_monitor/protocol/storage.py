@@ -0,0 +1,268 @@
+import os
+import json
+import pickledb
+from typing import List, Union
+from ..utils.file_lock import file_state
+
+
+class PickleStorage(pickledb.PickleDB):
+    def __init__(self, location: str, multi_writer: bool = False):
+        """Default protocol storage - rewrites full pickledb JSON on dump.
+
+        All mutations since the last dump are recorded in `pending`. With
+        `multi_writer` the file is reloaded before each dump and the pending
+        mutations are re-applied on top (merge-on-save). The caller has to
+        hold the protocol `FileLock` while dumping.
+        """
+        self.multi_writer = multi_writer
+        super().__init__(location, False, sig=False)
+
+    def load(self, location: str, auto_dump: bool):
+        # Stat before reading - a concurrent write then triggers a new reload
+        self.state = file_state(os.path.expanduser(location))
+        super().load(location, auto_dump)
+        self.pending = []
+        return True
+
+    def refresh(self) -> bool:
+        """Reload db only if the file changed (or local changes are pending).
+
+        Returns whether the in-memory db was modified.
+        """
+        if len(self.pending) == 0 and file_state(self.loco) == self.state:
+            return False
+        self.load(self.loco, self.auto_dump)
+        return True
+
+    def replay(self, op: list):
+        """Apply a single recorded mutation to the in-memory db."""
+        try:
+            if op[0] == "dcreate":
+                self.db[op[1]] = {}
+            elif op[0] == "dadd":
+                self.db[op[1]][op[2]] = op[3]
+            elif op[0] == "dincr":
+                # Key can be a path into nested dicts (created if missing)
+                *path, key = op[2] if isinstance(op[2], list) else [op[2]]
+                entry = self.db[op[1]]
+                for k in path:
+                    entry = entry.setdefault(k, {})
+                entry[key] = entry.get(key, 0) + op[3]
+            elif op[0] == "set":
+                self.db[op[1]] = op[2]
+            elif op[0] == "drem":
+                del self.db[op[1]]
+        except KeyError:
+            # Entry was removed in the meantime - skip
+            pass
+
+    def set(self, key, value):
+        super().set(key, value)
+        self.pending.append(["set", key, value])
+        return True
+
+    def rem(self, key):
+        super().rem(key)
+        self.pending.append(["drem", key])
+        return True
+
+    def dcreate(self, name):
+        super().dcreate(name)
+        self.pending.append(["dcreate", name])
+        return True
+
+    def dadd(self, name, pair):
+        super().dadd(name, pair)
+        self.pending.append(["dadd", name, pair[0], pair[1]])
+        return True
+
+    def dincr(self, name: str, key: Union[str, List[str]], increment=1):
+        """Increment a numeric value in a dict - recorded as delta.
+
+        `key` may be a list of keys into nested dicts. Subsequent increments
+        of the same value are coalesced into a single pending mutation.
+        """
+        if isinstance(key, tuple):
+            key = list(key)
+        self.replay(["dincr", name, key, increment])
+        last_op = self.pending[-1] if len(self.pending) > 0 else None
+        if last_op is not None and last_op[:3] == ["dincr", name, key]:
+            last_op[3] += increment
+        else:
+            self.pending.append(["dincr", name, key, increment])
+        return True
+
+    def drem(self, name):
+        super().drem(name)
+        self.pending.append(["drem", name])
+        return True
+
+    def merge(self):
+        """Reload db from disk and re-apply the pending local mutations."""
+        pending = self.pending
+        self.load(self.loco, self.auto_dump)
+        for op in pending:
+            self.replay(op)
+        self.pending = pending
+        return True
+
+    def rollback(self):
+        """Discard all pending mutations by reloading the db from disk."""
+        self.load(self.loco, self.auto_dump)
+        return True
+
+    def dump(self):
+        """Write the full db - merged with other writers' changes."""
+        # Deltas (increments) always have to be applied to the on-disk state
+        if self.multi_writer or any(op[0] == "dincr" for op in self.pending):
+            self.merge()
+        return self.write_snapshot()
+
+    def write_snapshot(self):
+        """Write the full db to a temporary file and swap it in atomically."""
+        tmp_fname = f"{self.loco}.{os.getpid()}.tmp"
+        with open(tmp_fname, "wt") as f:
+            json.dump(self.db, f)
+        os.replace(tmp_fname, self.loco)
+        self.state = file_state(self.loco)
+        self.pending = []
+        return True
+
+    def compact(self):
+        """Full JSON file always holds the complete state - dump if pending."""
+        if len(self.pending) == 0:
+            return True
+        return self.dump()
+
+    @staticmethod
+    def discard_local_changes(location: str):
+        """Nothing to discard - local changes are part of the JSON file."""
+        return
+
+
+class JournalStorage(PickleStorage):
+    def __init__(
+        self,
+        location: str,
+        multi_writer: bool = False,
+        compact_every: int = 1000,
+    ):
+        """Protocol storage appending mutations to a write-ahead journal.
+
+        The pickledb JSON file serves as snapshot. All `dcreate`/`dadd`/`drem`
+        mutations are appended to `<location>.journal` on `dump` and are only
+        folded into the snapshot once `compact_every` ops have accumulated.
+        Appends are deltas, so concurrent writers only need to merge when
+        compacting - this is the recommended backend for many writers.
+        """
+        self.compact_every = compact_every
+        super().__init__(location, multi_writer)
+
+    @staticmethod
+    def journal_fname(location: str) -> str:
+        return os.path.expanduser(location) + ".journal"
+
+    def load(self, location: str, auto_dump: bool):
+        """Load pickledb snapshot and replay the journal on top of it."""
+        super().load(location, auto_dump)
+        self.journal = self.journal_fname(location)
+        self.journal_ops, self.journal_offset = 0, 0
+        self.read_journal()
+        return True
+
+    def read_journal(self):
+        """Replay all complete journal entries after the current offset."""
+        if not os.path.exists(self.journal):
+            return
+        with open(self.journal, "rb") as f:
+            f.seek(self.journal_offset)
+            for line in f:
+                # Incomplete last line (e.g. append in progress or crash)
+                if not line.endswith(b"\n"):
+                    break
+                try:
+                    op = json.loads(line)
+                except ValueError:
+                    break
+                self.replay(op)
+                self.journal_ops += 1
+                self.journal_offset += len(line)
+
+    def refresh(self) -> bool:
+        """Only replay new tail of journal if the snapshot is unchanged.
+
+        Returns whether the in-memory db was modified.
+        """
+        journal_size = 0
+        if os.path.exists(self.journal):
+            journal_size = os.path.getsize(self.journal)
+        # Snapshot replaced (e.g. compaction) or journal rewritten - reload
+        if (
+            len(self.pending) > 0
+            or self.journal_offset is None
+            or file_state(self.loco) != self.state
+            or journal_size < self.journal_offset
+        ):
+            self.load(self.loco, self.auto_dump)
+            return True
+        if journal_size == self.journal_offset:
+            return False
+        self.read_journal()
+        return True
+
+    def merge(self):
+        """Replay only the new journal tail and re-apply the pending mutations.
+
+        The snapshot is only re-parsed if it was replaced (e.g. compaction).
+        """
+        pending = self.pending
+        # Pending increments are applied in memory - revert them before replay
+        for op in reversed(pending):
+            if op[0] == "dincr":
+                self.replay(op[:3] + [-op[3]])
+        self.pending = []
+        self.refresh()
+        for op in pending:
+            self.replay(op)
+        self.pending = pending
+        return True
+
+    def dump(self):
+        """Append pending mutations to journal - compact if it grew too long."""
+        if len(self.pending) == 0:
+            return True
+        if self.journal_ops + len(self.pending) >= self.compact_every:
+            return self.compact()
+        with open(self.journal, "ab") as f:
+            start = f.tell()
+            f.write(
+                "".join(json.dumps(op) + "\n" for op in self.pending).encode()
+            )
+            end = f.tell()
+        # Others appended since we last read the journal - reload on refresh
+        if start == self.journal_offset:
+            self.journal_offset = end
+        else:
+            self.journal_offset = None
+        self.journal_ops += len(self.pending)
+        self.pending = []
+        return True
+
+    def compact(self):
+        """Fold journal into the pickledb snapshot and truncate journal."""
+        if self.multi_writer:
+            self.merge()
+        self.write_snapshot()
+        if os.path.exists(self.journal):
+            os.remove(self.journal)
+        self.journal_ops, self.journal_offset = 0, 0
+        self.pending = []
+        return True
+
+    @staticmethod
+    def discard_local_changes(location: str):
+        """Drop journal e.g. after pulling an up-to-date snapshot from GCS."""
+        journal = JournalStorage.journal_fname(location)
+        if os.path.exists(journal):
+            os.remove(journal)
+
@@ -1,3 +1,30 @@
+from typing import Union
+from .sqlite_storage import SQLiteStorage
+
+
+# Counters shown in 'total_experiments' panel & variables they depend on
+TOTALS_KEYS = [
+    "total",
+    "run",
+    "done",
+    "aborted",
+    "sge",
+    "slurm",
+    "gcp",
+    "local",
+    "report_gen",
+    "gcs_stored",
+    "retrieved",
+]
+TOTALS_VARS = [
+    "job_status",
+    "exec_resource",
+    "report_generated",
+    "stored_in_gcloud",
+    "retrieved_results",
+]
+
+
 def get_monitor_db_data(db):
     """Helper to get all data from pickledb database."""
     if len(db.experiment_ids) > 0:
@@ -45,6 +72,12 @@ def get_monitor_db_data(db):
 
 def get_total_experiments(db, all_experiment_ids):
     """Get data from db to show in 'total_experiments' panel."""
+    # Incrementally maintained counters - independent of protocol size
+    totals = get_totals(db)
+    if totals:
+        return {k: str(totals[k]) for k in TOTALS_KEYS}
+    if isinstance(db.db, SQLiteStorage):
+        return get_total_experiments_sqlite(db.db)
     run, done, aborted, sge, slurm, gcp, local = 0, 0, 0, 0, 0, 0, 0
     report_gen, gcs_stored, retrieved = 0, 0, 0
     for e_id in all_experiment_ids:
@@ -83,6 +116,82 @@ def get_total_experiments(db, all_experiment_ids):
     return results
 
 
+def get_total_experiments_sqlite(db: SQLiteStorage):
+    """Get 'total_experiments' panel data via indexed SQLite group counts."""
+    status = db.count_by("job_status")
+    resource = db.count_by("exec_resource")
+    total = sum(status.values())
+    run, done = status.get("running", 0), status.get("completed", 0)
+    sge = resource.get("sge-cluster", 0)
+    slurm = resource.get("slurm-cluster", 0)
+    gcp = resource.get("gcp-cloud", 0)
+    report_gen, gcs_stored, retrieved = db.conn.execute(
+        "SELECT"
+        " SUM(json_extract(data, '$.report_generated')),"
+        " SUM(json_extract(data, '$.stored_in_gcloud')),"
+        " SUM(json_extract(data, '$.retrieved_results'))"
+        " FROM protocol WHERE e_id IS NOT NULL"
+    ).fetchone()
+    results = {
+        "total": str(total),
+        "run": str(run),
+        "done": str(done),
+        "aborted": str(total - run - done),
+        "sge": str(sge),
+        "slurm": str(slurm),
+        "gcp": str(gcp),
+        "local": str(total - sge - slurm - gcp),
+        "report_gen": str(report_gen or 0),
+        "gcs_stored": str(gcs_stored or 0),
+        "retrieved": str(retrieved or 0),
+    }
+    return results
+
+
+def get_totals(db) -> Union[dict, None]:
+    """Maintained totals - kept in the `summary` entry, which older versions
+    skip when listing experiment ids."""
+    summary_data = db.get("summary")
+    if not summary_data:
+        return None
+    return summary_data.get("totals")
+
+
+def totals_key(var_name: str, value) -> Union[str, None]:
+    """Get the totals counter to which an experiment variable value counts."""
+    if var_name == "job_status":
+        return {"running": "run", "completed": "done"}.get(value, "aborted")
+    elif var_name == "exec_resource":
+        return {
+            "sge-cluster": "sge",
+            "slurm-cluster": "slurm",
+            "gcp-cloud": "gcp",
+        }.get(value, "local")
+    elif value:
+        return {
+            "report_generated": "report_gen",
+            "stored_in_gcloud": "gcs_stored",
+            "retrieved_results": "retrieved",
+        }.get(var_name)
+    return None
+
+
+def count_experiment_totals(db, all_experiment_ids) -> dict:
+    """Count the totals from scratch, e.g. to rebuild them for legacy DBs."""
+    totals = {k: 0 for k in TOTALS_KEYS}
+    for e_id in all_experiment_ids:
+        data = db.get(str(e_id))
+        # Deleted experiment (e.g. by another writer)
+        if not data:
+            continue
+        totals["total"] += 1
+        for var_name in TOTALS_VARS:
+            key = totals_key(var_name, data.get(var_name))
+            if key is not None:
+                totals[key] += 1
+    return totals
+
+
 def get_time_experiment(db, last_experiment_id):
     """Get data from db to show in 'time_experiment' panel."""
     last_experiment = db.get(last_experiment_id)
@@ -1,5 +1,8 @@
 import pandas as pd
 from datetime import datetime
+from operator import itemgetter
+from typing import List, Union
+from .sqlite_storage import SQLiteStorage
 
 from rich import box
 from rich.table import Table
@@ -13,54 +16,72 @@ from rich.progress import (
 )
 
 
+# Summary dataframe columns & the protocol variables they are extracted from
+SUMMARY_COLUMNS = {
+    "Date": "start_time",
+    "Project": "project_name",
+    "Purpose": "purpose",
+    "Experiment Dir": "experiment_dir",
+    "Status": "job_status",
+    "Seeds": "num_seeds",
+    "Resource": "exec_resource",
+    "CPUs": "num_cpus",
+    "GPUs": "num_gpus",
+    "Type": "experiment_type",
+    "Jobs": "num_total_jobs",
+    "Completed Jobs": "completed_jobs",
+}
+
+
 def protocol_summary(
-    db, all_experiment_ids, tail: int = 5, verbose: bool = True, full: bool = False
+    db,
+    all_experiment_ids,
+    tail: int = 5,
+    verbose: bool = True,
+    full: bool = False,
+    columns: Union[List[str], None] = None,
 ):
-    """Construct a summary dataframe of previous experiments."""
+    """Construct a summary dataframe of previous experiments.
+
+    Data is extracted column-wise in a single pass over the requested tail.
+    `columns` selects a subset of `SUMMARY_COLUMNS` (default: all), missing
+    ones are shown as "-" in the printed table.
+    """
     # Set pandas df format option to print
     pd.set_option("display.max_columns", 5)
     pd.set_option("max_colwidth", 30)
     if len(all_experiment_ids) > 0:
-        purposes, project_names, exp_paths = [], [], []
-        num_seeds, statuses, start_times, experiment_types = [], [], [], []
-        resource, num_cpus, num_gpus, total_jobs, completed_jobs = [], [], [], [], []
         if tail is None:
             tail = len(all_experiment_ids)
-
-        # Loop over experiment ids and extract data to retrieve
-        for int_e_id in all_experiment_ids[-tail:]:
-            e_id = str(int_e_id)
-            purposes.append(db.dget(e_id, "purpose"))
-            project_names.append(db.dget(e_id, "project_name"))
-            exp_paths.append(db.dget(e_id, "experiment_dir"))
-            statuses.append(db.dget(e_id, "job_status"))
-            start_times.append(db.dget(e_id, "start_time"))
-            resource.append(db.dget(e_id, "exec_resource"))
-            num_seeds.append(db.dget(e_id, "num_seeds"))
-            num_cpus.append(db.dget(e_id, "num_cpus"))
-            num_gpus.append(db.dget(e_id, "num_gpus"))
-            experiment_types.append(db.dget(e_id, "experiment_type"))
-            total_jobs.append(db.dget(e_id, "num_total_jobs"))
-            completed_jobs.append(db.dget(e_id, "completed_jobs"))
-
-        d = {
-            "ID": [str(e_id) for e_id in all_experiment_ids[-tail:]],
-            "Date": start_times,
-            "Project": project_names,
-            "Purpose": purposes,
-            "Experiment Dir": exp_paths,
-            "Status": statuses,
-            "Seeds": num_seeds,
-            "Resource": resource,
-            "CPUs": num_cpus,
-            "GPUs": num_gpus,
-            "Type": experiment_types,
-            "Jobs": total_jobs,
-            "Completed Jobs": completed_jobs,
-        }
-        df = pd.DataFrame(d)
-        df["Date"] = df["Date"].map("{:.5}".format)
-        df["Purpose"] = df["Purpose"].map("{:.30}".format)
+        if columns is None:
+            columns = list(SUMMARY_COLUMNS.keys())
+        variables = [SUMMARY_COLUMNS[c] for c in columns]
+        tail_ids = [str(e_id) for e_id in all_experiment_ids[-tail:]]
+
+        # Retrieve data of the last experiments - single indexed SQLite query
+        if isinstance(db, SQLiteStorage):
+            # Ids of the returned rows - others may have added experiments
+            rows = db.tail_columns(variables, tail)
+            tail_ids = [r[0] for r in rows]
+            data = {c: [r[i] for r in rows] for i, c in enumerate(columns, 1)}
+            # ISO start times ("%Y-%m-%d %H:%M") to the displayed "%m/%d"
+            if "Date" in data:
+                data["Date"] = [
+                    f"{t[5:7]}/{t[8:10]}" if t else "-" for t in data["Date"]
+                ]
+        else:
+            tail_data = list(map(db.dgetall, tail_ids))
+            data = {
+                c: list(map(itemgetter(v), tail_data))
+                for c, v in zip(columns, variables)
+            }
+
+        # Truncate strings before (not after) constructing the dataframe
+        if "Date" in data:
+            data["Date"] = [str(t)[:5] for t in data["Date"]]
+        if "Purpose" in data:
+            data["Purpose"] = [str(p)[:30] for p in data["Purpose"]]
+        df = pd.DataFrame({"ID": tail_ids, **data}, columns=["ID"] + columns)
 
         # Print a nice table overview (no job resources)
         if verbose:
@@ -88,8 +109,12 @@ def get_progress_bar(total_jobs: int, completed_jobs: int):
     return progress
 
 
-def protocol_table(df, full: bool = True):
-    """Generate pretty table of experiment protocol db - preselected db."""
+def protocol_table(df, full: bool = True, row_cache: Union[dict, None] = None):
+    """Generate pretty table of experiment protocol db - preselected db.
+
+    Rendered cells (incl. progress bars) of rows whose content is unchanged
+    are reused from `row_cache`, which is updated in place.
+    """
     table = Table(show_header=True, show_footer=False, header_style="bold blue")
     table.add_column(":bookmark:", justify="center")
     table.add_column(":id:", justify="center")
@@ -110,62 +135,78 @@ def protocol_table(df, full: bool = True):
 
     # Add rows of info if dataframe exists (previously recorded experiments)
     if df is not None:
-        for index in reversed(df.index):
-            row = df.iloc[index]
-            if row["Resource"] == "sge-cluster":
-                resource = "SGE"
-            elif row["Resource"] == "slurm-cluster":
-                resource = "Slurm"
-            elif row["Resource"] == "gcp-cloud":
-                resource = "GCP"
-            else:
-                resource = "Local"
-
-            if row["Type"] == "hyperparameter-search":
-                exp_type = "search"
-            elif row["Type"] == "multiple-configs":
-                exp_type = "config"
-            elif row["Type"] == "single-config":
-                exp_type = "single"
-            else:
-                exp_type = row["Type"]
-
-            if row["Status"] == "running":
-                status = Spinner("dots", style="magenta")
-            elif row["Status"] == "completed":
-                status = "[green]:heavy_check_mark:"
-            else:
-                status = "[red]:heavy_multiplication_x:"
-
-            if full:
-                bar = get_progress_bar(int(row["Jobs"]), int(row["Completed Jobs"]))
-                table.add_row(
-                    status,
-                    row["ID"],
-                    row["Date"],
-                    row["Project"][:10],
-                    row["Purpose"][:15],
-                    exp_type,
-                    resource,
-                    str(row["Seeds"]),
-                    str(row["CPUs"]),
-                    str(row["GPUs"]),
-                    bar,
-                )
-            else:
-                table.add_row(
-                    status,
-                    row["ID"],
-                    row["Date"],
-                    row["Project"][:10],
-                    row["Purpose"][:25],
-                    exp_type,
-                    resource,
-                    str(row["Seeds"]),
-                    str(row["CPUs"]),
-                    str(row["GPUs"]),
-                )
+        rows = {}
+        for record in reversed(df.to_dict("records")):
+            # Row content identifies the experiment version - reuse its cells
+            key = (full, *record.values())
+            cells = rows.get(key)
+            if cells is None and row_cache is not None:
+                cells = row_cache.get(key)
+            if cells is None:
+                cells = protocol_row(record, full)
+            rows[key] = cells
+            table.add_row(*cells)
+        # Only keep the rows of the latest table - drops outdated versions
+        if row_cache is not None:
+            row_cache.clear()
+            row_cache.update(rows)
 
     table.border_style = "blue"
     table.box = box.SIMPLE_HEAD
     return table
+
+
+def protocol_row(row: dict, full: bool = True) -> tuple:
+    """Render the table cells of a single experiment summary row.
+
+    Columns not selected in the summary are rendered as "-".
+    """
+    row = {**{c: "-" for c in SUMMARY_COLUMNS}, **row}
+    if row["Resource"] == "sge-cluster":
+        resource = "SGE"
+    elif row["Resource"] == "slurm-cluster":
+        resource = "Slurm"
+    elif row["Resource"] == "gcp-cloud":
+        resource = "GCP"
+    elif row["Resource"] == "-":
+        resource = "-"
+    else:
+        resource = "Local"
+
+    if row["Type"] == "hyperparameter-search":
+        exp_type = "search"
+    elif row["Type"] == "multiple-configs":
+        exp_type = "config"
+    elif row["Type"] == "single-config":
+        exp_type = "single"
+    else:
+        exp_type = row["Type"]
+
+    if row["Status"] == "running":
+        status = Spinner("dots", style="magenta")
+    elif row["Status"] == "completed":
+        status = "[green]:heavy_check_mark:"
+    elif row["Status"] == "-":
+        status = "-"
+    else:
+        status = "[red]:heavy_multiplication_x:"
+
+    cells = (
+        status,
+        row["ID"],
+        row["Date"],
+        row["Project"][:10],
+        row["Purpose"][:15] if full else row["Purpose"][:25],
+        exp_type,
+        resource,
+        str(row["Seeds"]),
+        str(row["CPUs"]),
+        str(row["GPUs"]),
+    )
+    if full:
+        if "-" in (row["Jobs"], row["Completed Jobs"]):
+            cells += ("-",)
+        else:
+            bar = get_progress_bar(int(row["Jobs"]), int(row["Completed Jobs"]))
+            cells += (bar,)
+    return cells
@@ -0,0 +1,156 @@
+import os
+import json
+import time
+import logging
+import tempfile
+import threading
+from typing import Any, Callable, Tuple, Union
+from ..utils.file_lock import O_NOFOLLOW, FileLock, file_state
+
+
+class SnapshotCache(object):
+    def __init__(
+        self, ttl: float, fname: Union[str, None] = None, mode: int = 0o660
+    ):
+        """Reuse the latest resource snapshot for `ttl` seconds.
+
+        Expired snapshots are still returned while a single background
+        refresh is in flight (stale-while-revalidate). With a cache `fname`
+        the snapshot is shared as JSON file, e.g. by several dashboards on
+        one login node. Only the process holding `<fname>.lock` refreshes -
+        all others read the file instead of polling the scheduler. Cache &
+        lock file are created with permissions `mode` - the users of a group
+        share them by default (0o666 shares them with all users). If the
+        files cannot be used (e.g. permissions), the cache is kept in memory.
+        """
+        self.ttl = ttl
+        self.fname = None if fname is None else os.path.expanduser(fname)
+        self.mode = mode
+        self.snapshot, self.file_state = None, None
+        self.refreshing = threading.Lock()
+        # Error of the last background refresh (stale data is returned)
+        self.error = None
+
+    def get(self, fetch: Callable[[], Any]) -> Any:
+        """Cached data - `fetch` new data if missing or in the background."""
+        snapshot = self.load()
+        if snapshot is None:
+            # Nothing cached yet - wait for a running (or our own) first poll
+            with self.refreshing:
+                snapshot = self.load() or self.refresh(fetch)
+            return snapshot[1]
+        fetched, data = snapshot
+        if time.time() - fetched >= self.ttl and self.refreshing.acquire(False):
+            threading.Thread(
+                target=self.revalidate,
+                args=(fetch,),
+                name="mle-cache-refresh",
+                daemon=True,
+            ).start()
+        return data
+
+    def revalidate(self, fetch: Callable[[], Any]):
+        """Background refresh - skipped if another process is refreshing."""
+        try:
+            self.refresh(fetch, blocking=False)
+            self.error = None
+        except Exception as e:
+            self.error = e
+        finally:
+            self.refreshing.release()
+
+    def refresh(
+        self, fetch: Callable[[], Any], blocking: bool = True
+    ) -> Union[Tuple[float, Any], None]:
+        """Fetch & store a new snapshot unless another process just did."""
+        if self.fname is not None:
+            lock = FileLock(self.fname + ".lock", mode=self.mode)
+            try:
+                locked = lock.acquire(blocking)
+            except OSError as e:
+                self.unshare(e)
+        if self.fname is None:
+            data = fetch()
+            return self.store((time.time(), data))
+        if not locked:
+            return None
+        try:
+            snapshot = self.load()
+            if snapshot is None or time.time() - snapshot[0] >= self.ttl:
+                # TTL starts once the (possibly slow) poll completed
+                data = fetch()
+                snapshot = self.store((time.time(), data))
+            return snapshot
+        finally:
+            lock.release()
+
+    def load(self) -> Union[Tuple[float, Any], None]:
+        """Latest snapshot - re-read from the cache file if it changed."""
+        if self.fname is not None:
+            state = file_state(self.fname)
+            if state is not None and state != self.file_state:
+                try:
+                    fd = os.open(self.fname, os.O_RDONLY | O_NOFOLLOW)
+                    with os.fdopen(fd, "r") as f:
+                        cached = json.load(f)
+                    self.snapshot = (cached["time"], cached["data"])
+                    self.file_state = state
+                except (OSError, ValueError, KeyError):
+                    pass
+        return self.snapshot
+
+    def store(self, snapshot: Tuple[float, Any]) -> Tuple[float, Any]:
+        """Keep snapshot & atomically replace the cache file (if any)."""
+        if self.fname is not None:
+            content = json.dumps(
+                {"time": snapshot[0], "data": snapshot[1]}, default=to_json
+            )
+            # Keep data as read by other processes (e.g. NumPy -> lists)
+            snapshot = (snapshot[0], json.loads(content)["data"])
+            try:
+                self.write(content)
+                self.file_state = file_state(self.fname)
+            except OSError as e:
+                self.unshare(e)
+        self.snapshot = snapshot
+        return snapshot
+
+    def write(self, content: str):
+        """Atomically replace the cache file - in place if owned by others."""
+        try:
+            self.replace(content)
+        except OSError:
+            # E.g. no rename of another user's file in a sticky dir like /tmp.
+            # No O_CREAT & no symlinks - readers skip incomplete JSON (load)
+            fd = os.open(self.fname, os.O_WRONLY | os.O_TRUNC | O_NOFOLLOW)
+            with os.fdopen(fd, "w") as f:
+                f.write(content)
+
+    def replace(self, content: str):
+        """Write an exclusively created temporary file & rename it."""
+        dirname, basename = os.path.split(self.fname)
+        fd, tmp_fname = tempfile.mkstemp(
+            prefix=basename + ".", suffix=".tmp", dir=dirname or None
+        )
+        try:
+            with os.fdopen(fd, "w") as f:
+                os.fchmod(f.fileno(), self.mode)
+                f.write(content)
+            os.replace(tmp_fname, self.fname)
+        except OSError:
+            os.remove(tmp_fname)
+            raise
+
+    def unshare(self, error: OSError):
+        """Fall back to the in-memory snapshot if the cache file is unusable."""
+        logging.getLogger(__name__).warning(
+            "Resource cache %s is not shared: %s", self.fname, error
+        )
+        self.fname = None
+
+
+def to_json(value: Any) -> Any:
+    """Serialize NumPy values (e.g. job counts) as plain numbers/lists."""
+    if hasattr(value, "tolist"):
+        return value.tolist()
+    raise TypeError(f"{type(value).__name__} is not JSON serializable")
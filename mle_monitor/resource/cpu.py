@@ -0,0 +1,56 @@
+import time
+import numpy as np
+
+
+class CPUSampler(object):
+    def __init__(self, min_interval: float = 0.1):
+        """Non-blocking CPU utilisation from deltas of `psutil.cpu_times`.
+
+        Each `sample` compares the per-core CPU times with the previous
+        snapshot, so it returns instantly. Only the very first sample waits
+        until `min_interval` seconds passed since construction.
+        """
+        try:
+            import psutil
+
+        except ImportError:
+            raise ImportError(
+                "You need to install `psutil` to monitor CPU processes."
+            )
+        self.psutil = psutil
+        self.min_interval = min_interval
+        self.last_time = time.time()
+        self.last_times = psutil.cpu_times(percpu=True)
+        self.percent = None
+
+    def sample(self) -> np.ndarray:
+        """Utilisation (%) per core since the previous sample."""
+        if self.percent is None:
+            time.sleep(max(0, self.min_interval - (time.time() - self.last_time)))
+        times = self.psutil.cpu_times(percpu=True)
+        percent = np.array(
+            [busy_percent(t0, t1) for t0, t1 in zip(self.last_times, times)]
+        )
+        # No time passed (e.g. two panels sampling at once) - keep last values
+        if self.percent is None or not np.all(np.isnan(percent)):
+            self.percent = np.nan_to_num(percent)
+        self.last_time, self.last_times = time.time(), times
+        return self.percent
+
+    def latest(self) -> np.ndarray:
+        """Utilisation (%) per core of the last sample (sampled if none)."""
+        if self.percent is None:
+            return self.sample()
+        return self.percent
+
+
+def busy_percent(t0, t1) -> float:
+    """Busy share (%) of a core between two `cpu_times` snapshots."""
+    total = sum(t1) - sum(t0)
+    # Guest time is already contained in user time (Linux)
+    total -= getattr(t1, "guest", 0) - getattr(t0, "guest", 0)
+    total -= getattr(t1, "guest_nice", 0) - getattr(t0, "guest_nice", 0)
+    idle = t1.idle - t0.idle + getattr(t1, "iowait", 0) - getattr(t0, "iowait", 0)
+    if total <= 0:
+        return np.nan
+    return float(np.clip(100 * (total - idle) / total, 0, 100))
@@ -1,13 +1,43 @@
 import time
+import json
 import subprocess as sp
-import pandas as pd
-from typing import Union
+from collections import Counter
+from typing import Callable, List, Union
+
+
+# Fields of `gcloud compute instances list` needed for the machine summary
+GCLOUD_FORMAT = "json(id,name,zone.basename(),machineType.basename(),status)"
+# Retry delays (seconds) of failed listings - doubled up to the maximum
+BACKOFF_START, BACKOFF_MAX = 0.25, 8
+
+
+def run_command(command: List[str], timeout: float) -> str:
+    """Default command runner - output of a (killed if too slow) command."""
+    return sp.check_output(command, timeout=timeout).decode()
 
 
 class GCPResource(object):
-    def __init__(self, monitor_config: Union[dict, None]):
+    def __init__(
+        self,
+        monitor_config: Union[dict, None],
+        runner: Callable[[List[str], float], str] = run_command,
+    ):
+        """GCP VM instance monitoring via `gcloud compute instances list`.
+
+        Failed listings are retried with exponential backoff for at most
+        `monitor_config["deadline"]` seconds (default 60). The `gcloud`
+        executable can be set via `monitor_config["gcloud"]` and the command
+        `runner` replaced (e.g. for testing). The instance inventory is kept
+        and only changed instances update the machine type counts.
+        """
         self.resource_name = "gcp-cloud"
         self.monitor_config = monitor_config
+        config = monitor_config or {}
+        self.gcloud = config.get("gcloud", "gcloud")
+        self.deadline = config.get("deadline", 60)
+        self.runner = runner
+        # Instance id -> (machine type, status) & status counts per type
+        self.instances, self.counts = {}, {}
 
     def monitor(self):
         """Helper to get all utilisation data for resource."""
@@ -15,39 +45,65 @@ class GCPResource(object):
 
     def get_data(self):
         """Helper to get all utilisation data for GCP resource."""
-        while True:
-            try:
-                check_cmd = [
-                    "gcloud",
-                    "compute",
-                    "instances",
-                    "list",
-                    "--verbosity",
-                    "error",
-                ]
-                out = sp.check_output(check_cmd)
-                break
-            except sp.CalledProcessError:
-                time.sleep(1)
-
-        # Clean up and check if vm_name is in list of all jobs
-        job_info = out.split(b"\n")[1:-1]
-        df_gcp = {"experiment_type": [], "status": []}
-        for i in range(len(job_info)):
-            decoded_job_info = job_info[i].decode("utf-8").split()
-            df_gcp["experiment_type"].append(decoded_job_info[2])
-            df_gcp["status"].append(decoded_job_info[-1])
-        df_gcp = pd.DataFrame(df_gcp)
-
+        self.update_inventory(self.list_instances())
         gcp_data = {"experiment_type": [], "run": [], "stop": [], "stage": []}
-        for jt in df_gcp.experiment_type.unique():
-            sub_df = df_gcp[df_gcp.experiment_type == jt]
-            run = (sub_df["status"] == "RUNNING").sum()
-            stop = (sub_df["status"] == "STOPPING").sum()
-            stage = (sub_df["status"] == "STAGING").sum()
+        for jt, counts in self.counts.items():
             gcp_data["experiment_type"].append(jt)
-            gcp_data["run"].append(run)
-            gcp_data["stop"].append(stop)
-            gcp_data["stage"].append(stage)
+            gcp_data["run"].append(counts["RUNNING"])
+            gcp_data["stop"].append(counts["STOPPING"])
+            gcp_data["stage"].append(counts["STAGING"])
         # Return list of different machine types and their status
         return gcp_data
+
+    def list_instances(self) -> List[dict]:
+        """List all VM instances - retry with exponential backoff on failure."""
+        check_cmd = [
+            self.gcloud,
+            "compute",
+            "instances",
+            "list",
+            "--verbosity",
+            "error",
+            f"--format={GCLOUD_FORMAT}",
+        ]
+        deadline = time.time() + self.deadline
+        delay = BACKOFF_START
+        while True:
+            try:
+                remaining = max(deadline - time.time(), BACKOFF_START)
+                return json.loads(self.runner(check_cmd, remaining))
+            except (sp.CalledProcessError, sp.TimeoutExpired, ValueError):
+                remaining = deadline - time.time()
+                if remaining <= 0:
+                    raise
+                time.sleep(min(delay, remaining))
+                delay = min(2 * delay, BACKOFF_MAX)
+
+    def update_inventory(self, instances: List[dict]) -> int:
+        """Apply new, changed & deleted instances to the machine type counts.
+
+        Returns the number of instances that changed since the last listing.
+        """
+        listed, num_changed = {}, 0
+        for instance in instances:
+            i_id = instance.get("id", instance["name"])
+            listed[i_id] = (instance["machineType"], instance["status"])
+            if self.instances.get(i_id) != listed[i_id]:
+                self.move(self.instances.get(i_id), listed[i_id])
+                num_changed += 1
+        for i_id in self.instances.keys() - listed.keys():
+            self.move(self.instances[i_id], None)
+            num_changed += 1
+        self.instances = listed
+        return num_changed
+
+    def move(self, old: Union[tuple, None], new: Union[tuple, None]):
+        """Move an instance between (machine type, status) counts."""
+        if new is not None:
+            self.counts.setdefault(new[0], Counter())[new[1]] += 1
+        if old is not None:
+            counts = self.counts[old[0]]
+            counts[old[1]] -= 1
+            # Drop machine types without any instances
+            if not +counts:
+                del self.counts[old[0]]
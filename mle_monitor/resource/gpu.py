@@ -0,0 +1,109 @@
+from typing import Any, List, Union
+
+
+class GPUCollector(object):
+    def __init__(self, nvml: Union[Any, None] = None):
+        """Collect NVIDIA GPU utilisation via NVML (GPUtil as fallback).
+
+        NVML is initialised once and the device handles & names are kept, so
+        a sample only queries utilisation, memory and processes instead of
+        spawning & parsing `nvidia-smi` (GPUtil). `nvml` can be any object
+        with the `pynvml` API (e.g. a fake provider for testing). Without
+        NVML and GPUtil no GPUs are reported.
+        """
+        self.nvml, self.gputil, self.backend = None, None, None
+        self.handles, self.names = [], []
+        try:
+            if nvml is None:
+                import pynvml as nvml
+            nvml.nvmlInit()
+            self.handles = [
+                nvml.nvmlDeviceGetHandleByIndex(i)
+                for i in range(nvml.nvmlDeviceGetCount())
+            ]
+            self.names = [decode(nvml.nvmlDeviceGetName(h)) for h in self.handles]
+            self.nvml, self.backend = nvml, "nvml"
+        except Exception:
+            # No NVML bindings/driver - fall back to GPUtil (`nvidia-smi`)
+            try:
+                import GPUtil
+
+                self.gputil, self.backend = GPUtil, "gputil"
+            except ImportError:
+                pass
+
+    def sample(self) -> dict:
+        """Load, memory (GB) & per-process memory (GB) of all GPUs."""
+        gpu_data = {
+            "gpu_id": [],
+            "gpu_name": [],
+            "gpu_load": [],
+            "gpu_mem_util": [],
+            "gpu_mem_total": [],
+            "gpu_mem_used": [],
+            "gpu_processes": [],
+        }
+        if self.backend == "nvml":
+            for gpu_id, (handle, name) in enumerate(zip(self.handles, self.names)):
+                util = self.nvml.nvmlDeviceGetUtilizationRates(handle)
+                memory = self.nvml.nvmlDeviceGetMemoryInfo(handle)
+                add_gpu(gpu_data, gpu_id, name, util.gpu, memory.used, memory.total)
+                for proc in self.get_processes(handle):
+                    # Memory is None if not available (e.g. Windows WDDM)
+                    used = (proc.usedGpuMemory or 0) / 1024**2 / 1000
+                    gpu_data["gpu_processes"].append(
+                        {"gpu_id": gpu_id, "pid": proc.pid, "gpu_mem": round(used, 2)}
+                    )
+        elif self.backend == "gputil":
+            for gp in self.gputil.getGPUs():
+                add_gpu(
+                    gpu_data,
+                    gp.id,
+                    gp.name,
+                    gp.load * 100,
+                    gp.memoryUsed * 1024**2,
+                    gp.memoryTotal * 1024**2,
+                )
+        return gpu_data
+
+    def get_processes(self, handle) -> List[Any]:
+        """Compute & graphics processes running on a GPU (unique PIDs)."""
+        processes = {}
+        for query in [
+            "nvmlDeviceGetComputeRunningProcesses",
+            "nvmlDeviceGetGraphicsRunningProcesses",
+        ]:
+            try:
+                for proc in getattr(self.nvml, query)(handle):
+                    processes.setdefault(proc.pid, proc)
+            except Exception:
+                # Not supported by all devices/drivers
+                continue
+        return list(processes.values())
+
+    def close(self):
+        """Release NVML."""
+        if self.backend == "nvml":
+            self.nvml.nvmlShutdown()
+            self.backend = None
+
+
+def add_gpu(
+    gpu_data: dict, gpu_id: int, name: str, load: float, used: float, total: float
+):
+    """Append a GPU's load (%) & memory (bytes -> % and GB) to `gpu_data`."""
+    gpu_data["gpu_id"].append(gpu_id)
+    gpu_data["gpu_name"].append(name)
+    # Load and memory usage in %
+    gpu_data["gpu_load"].append(round(float(load), 1))
+    gpu_data["gpu_mem_util"].append(round(100 * used / max(total, 1), 1))
+    # Memory in GB (as reported by `nvidia-smi`)
+    gpu_data["gpu_mem_total"].append(round(total / 1024**2 / 1000, 1))
+    gpu_data["gpu_mem_used"].append(round(used / 1024**2 / 1000, 1))
+
+
+def decode(name: Union[str, bytes]) -> str:
+    """Device names are bytes in older `pynvml` versions."""
+    if isinstance(name, bytes):
+        return name.decode()
+    return name
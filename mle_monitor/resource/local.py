@@ -1,20 +1,54 @@
 from datetime import datetime
+import time
 import numpy as np
 from typing import Union
+from .cpu import CPUSampler
+from .gpu import GPUCollector
+from .processes import ProcessScanner, ResourceAttribution
 
 
 class LocalResource(object):
     def __init__(self, monitor_config: Union[dict, None]):
         self.resource_name = "local"
         self.monitor_config = monitor_config
-
-    def monitor(self):
-        """Helper to get all utilisation data for local resource."""
+        # Stateful CPU sampler shared by all panels (created on first use)
+        self.cpu_sampler = None
+        self.process_scanner = None
+        # Persistent NVML handles (GPUtil fallback) - replaceable for testing
+        self.gpu_collector = None
+        # Cumulative resource usage per user & protocol experiment
+        self.attribution = ResourceAttribution()
+
+    def monitor(self, experiments: Union[dict, None] = None):
+        """Helper to get all utilisation data for local resource.
+
+        Process usage is also aggregated per user and per running protocol
+        experiment (`experiments`: id -> protocol data).
+        """
+        # Single CPU sample - consistent utilisation across all panels
+        self.sample_cpu()
         proc_data = self.get_process_data()
+        groups = self.attribution.update(
+            list(self.process_scanner.infos.values()), experiments
+        )
+        proc_data["user_attribution"] = groups["user"]
+        proc_data["experiment_attribution"] = groups["experiment"]
         device_data = self.get_device_data()
         util_data = self.get_util_data()
         return proc_data, device_data, util_data
 
+    def sample_cpu(self) -> np.ndarray:
+        """Take a new (non-blocking) CPU utilisation sample per core."""
+        if self.cpu_sampler is None:
+            self.cpu_sampler = CPUSampler()
+        return self.cpu_sampler.sample()
+
+    def cpu_percent(self) -> np.ndarray:
+        """Utilisation (%) per core of the latest CPU sample."""
+        if self.cpu_sampler is None:
+            return self.sample_cpu()
+        return self.cpu_sampler.latest()
+
     def get_process_data(self):
         """Get process info running on local machine."""
         proc_data = {
@@ -56,43 +90,14 @@ class LocalResource(object):
                 "You need to install `psutil` to monitor CPU processes."
             )
 
-        listOfProcObjects = []
-        # Iterate over the list
-        for proc in psutil.process_iter():
-            try:
-                # Fetch process details as dict
-                pinfo = proc.as_dict(
-                    attrs=["pid", "name", "username", "cmdline"]
-                )
-                pinfo["vms"] = proc.memory_info().vms / (1024 * 1024 * 1000)
-                pinfo["cpu_percent"] = proc.cpu_percent()
-                # Append dict to list
-                listOfProcObjects.append(pinfo)
-            except (
-                psutil.NoSuchProcess,
-                psutil.AccessDenied,
-                psutil.ZombieProcess,
-            ):
-                pass
-
-        # Sort list of dict by key vms i.e. memory usage
-        sorted_by_memory = sorted(
-            listOfProcObjects, key=lambda procObj: procObj["vms"], reverse=True
-        )
-        sorted_by_cpu = sorted(
-            listOfProcObjects,
-            key=lambda procObj: procObj["cpu_percent"],
-            reverse=True,
-        )
+        # Persistent scanner - per-process CPU% relative to the last scan
+        if self.process_scanner is None:
+            self.process_scanner = ProcessScanner()
+        sorted_by_memory, sorted_by_cpu = self.process_scanner.top_k(top_k)
 
-        total_cpu = psutil.cpu_count() * psutil.cpu_percent()
+        total_cpu = float(self.cpu_percent().sum())
         total_mem = psutil.virtual_memory()._asdict()["used"] / 1000000
-        return (
-            sorted_by_memory[:top_k],
-            sorted_by_cpu[:top_k],
-            total_cpu,
-            total_mem,
-        )
+        return sorted_by_memory, sorted_by_cpu, total_cpu, total_mem
 
     def get_device_data(self):
         """Get utilization per core."""
@@ -106,13 +111,11 @@ class LocalResource(object):
 
         device_data = {
             "core_id": np.arange(1, psutil.cpu_count() + 1),
-            "percent_util": [
-                round(e, 1) for e in psutil.cpu_percent(interval=1, percpu=True)
-            ],
+            "percent_util": [round(float(e), 1) for e in self.cpu_percent()],
             "cpu_count": psutil.cpu_count(logical=True),
             "logical_count": psutil.cpu_count(),
         }
-        # Add GPU usage data via GPUtil
+        # Add GPU usage data via NVML/GPUtil
         try:
             for k, v in self.get_nvidia_gpu_data().items():
                 device_data[k] = v
@@ -122,34 +125,9 @@ class LocalResource(object):
 
     def get_nvidia_gpu_data(self):
         """Helper function to get NVIDIA GPU utilisation."""
-        try:
-            import GPUtil
-
-        except ImportError:
-            raise ImportError(
-                "You need to install `gputil` to monitor GPU processes."
-            )
-        gpus = GPUtil.getGPUs()
-        gpu_data = {
-            "gpu_id": [],
-            "gpu_name": [],
-            "gpu_load": [],
-            "gpu_mem_util": [],
-            "gpu_mem_total": [],
-            "gpu_mem_used": [],
-        }
-
-        # Loop over experts and add data
-        for gp in gpus:
-            gpu_data["gpu_id"].append(gp.id),
-            gpu_data["gpu_name"].append(gp.name)
-            # Load and memory usage in %
-            gpu_data["gpu_load"].append(round(gp.load * 100, 1))
-            gpu_data["gpu_mem_util"].append(round(gp.memoryUtil * 100, 1))
-            # Memory in GB
-            gpu_data["gpu_mem_total"].append(round(gp.memoryTotal / 1000, 1))
-            gpu_data["gpu_mem_used"].append(round(gp.memoryUsed / 1000, 1))
-        return gpu_data
+        if self.gpu_collector is None:
+            self.gpu_collector = GPUCollector()
+        return self.gpu_collector.sample()
 
     def get_util_data(self):
         """Get memory and CPU utilisation for specific local machine."""
@@ -161,13 +139,16 @@ class LocalResource(object):
                 "You need to install `psutil` to monitor CPU processes."
             )
         num_cpus = psutil.cpu_count()
+        percent_util = self.cpu_percent()
         total_mem = psutil.virtual_memory()._asdict()["total"] / 1000000000
         used_mem = psutil.virtual_memory()._asdict()["used"] / 1000000000
         util_data = {
             "cores": num_cpus,
-            "cores_util": num_cpus * psutil.cpu_percent() / 100,
+            "cores_util": num_cpus * percent_util.mean() / 100,
             "mem": total_mem,
             "mem_util": used_mem,
+            # Epoch seconds (monotonic across DST) & local time for display
+            "time": time.time(),
             "time_date": datetime.now().strftime("%m/%d/%y"),
             "time_hour": datetime.now().strftime("%H:%M:%S"),
         }
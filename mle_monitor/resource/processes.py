@@ -0,0 +1,163 @@
+import os
+import heapq
+from typing import List, Union
+
+
+# Process attributes collected within a single `oneshot` context - static
+# ones are only retrieved once per process (identified by PID & create time)
+STATIC_ATTRS = ["name", "username", "cmdline", "ppid", "create_time"]
+DYNAMIC_ATTRS = ["memory_info", "cpu_percent", "cpu_times"]
+
+
+class ProcessScanner(object):
+    def __init__(self):
+        """Scan local processes - `psutil.Process` objects are kept per PID.
+
+        Reusing the objects across scans makes `cpu_percent` relative to the
+        previous scan (instead of always 0). Attributes are retrieved via
+        `as_dict`, i.e. within a single `oneshot` context. Name, user and
+        command line are only read when a process is first seen (or its PID
+        was reused, i.e. the create time changed).
+        """
+        try:
+            import psutil
+
+        except ImportError:
+            raise ImportError(
+                "You need to install `psutil` to monitor CPU processes."
+            )
+        self.psutil = psutil
+        self.processes, self.infos = {}, {}
+
+    def scan(self) -> List[dict]:
+        """Info dicts (incl. `vms`/`rss` in GB) of all accessible processes."""
+        psutil = self.psutil
+        processes, infos = {}, {}
+        for pid in psutil.pids():
+            proc, last_info = self.processes.get(pid), self.infos.get(pid)
+            try:
+                # Create time is cached by `proc` - look up the current one
+                new_proc = psutil.Process(pid)
+                if proc is None or new_proc.create_time() != last_info["create_time"]:
+                    proc = new_proc
+                    info = proc.as_dict(attrs=STATIC_ATTRS + DYNAMIC_ATTRS)
+                else:
+                    info = proc.as_dict(attrs=DYNAMIC_ATTRS)
+                    info.update({k: last_info[k] for k in STATIC_ATTRS})
+            except (psutil.NoSuchProcess, psutil.AccessDenied, psutil.ZombieProcess):
+                continue
+            # Processes of other users may hide some attributes
+            if info["memory_info"] is None or info["cpu_times"] is None:
+                continue
+            info["pid"] = pid
+            info["vms"] = info["memory_info"].vms / (1024 * 1024 * 1000)
+            info["rss"] = info["memory_info"].rss / (1024 * 1024 * 1000)
+            info["cpu_percent"] = info["cpu_percent"] or 0.0
+            processes[pid], infos[pid] = proc, info
+        # Exited processes are dropped from the cache
+        self.processes, self.infos = processes, infos
+        return list(infos.values())
+
+    def top_k(self, top_k: int = 6):
+        """Scan and select the top-k processes by memory & CPU usage."""
+        infos = self.scan()
+        by_memory = heapq.nlargest(top_k, infos, key=lambda p: p["vms"])
+        by_cpu = heapq.nlargest(top_k, infos, key=lambda p: p["cpu_percent"])
+        return by_memory, by_cpu
+
+
+def cpu_seconds(info: dict) -> float:
+    """Cumulative user + system CPU time of a process info dict."""
+    if info["cpu_times"] is None:
+        return 0.0
+    return info["cpu_times"].user + info["cpu_times"].system
+
+
+class ResourceAttribution(object):
+    def __init__(self):
+        """Attribute process resource usage to users & protocol experiments.
+
+        Cumulative CPU-seconds (incl. those of exited processes) and the peak
+        total RSS of each group are tracked across updates in `totals`.
+        """
+        self.cpu_seconds = {}
+        self.totals = {"user": {}, "experiment": {}}
+
+    def update(self, infos: List[dict], experiments: Union[dict, None] = None):
+        """Aggregate scanned processes by user & matched experiment.
+
+        `experiments` maps experiment ids to their protocol data (requires
+        `base_fname` & `experiment_dir`). Returns the active groups with
+        current #processes, CPU% & RSS plus cumulative CPU-s & peak RSS.
+        """
+        owners = match_experiments(infos, experiments or {})
+        groups = {"user": {}, "experiment": {}}
+        cpu_times = {}
+        for info in infos:
+            pid = info["pid"]
+            cpu_times[pid] = (info.get("create_time"), cpu_seconds(info))
+            # New (or reused) PID - count its full CPU time
+            last_time, last_seconds = self.cpu_seconds.get(pid, (None, 0.0))
+            delta = cpu_times[pid][1] - last_seconds
+            if last_time != cpu_times[pid][0] or delta < 0:
+                delta = cpu_times[pid][1]
+            keys = {"user": info["username"], "experiment": owners.get(pid)}
+            for kind, key in keys.items():
+                if key is None:
+                    continue
+                group = groups[kind].setdefault(
+                    key, {"num_procs": 0, "cpu_percent": 0.0, "rss": 0.0}
+                )
+                group["num_procs"] += 1
+                group["cpu_percent"] += info["cpu_percent"]
+                group["rss"] += info["rss"]
+                total = self.totals[kind].setdefault(
+                    key, {"cpu_seconds": 0.0, "peak_rss": 0.0}
+                )
+                total["cpu_seconds"] += delta
+        self.cpu_seconds = cpu_times
+
+        # Update peak memory & add cumulative stats to active groups
+        for kind in groups:
+            for key, group in groups[kind].items():
+                total = self.totals[kind][key]
+                total["peak_rss"] = max(total["peak_rss"], group["rss"])
+                group.update(total)
+        return groups
+
+
+def match_experiments(infos: List[dict], experiments: dict) -> dict:
+    """Map PIDs to the experiments they belong to.
+
+    A process matches if its command line contains the experiment directory
+    or the script name (`base_fname`) - ambiguous ones shared by several
+    experiments are skipped. Child processes inherit their parent's match.
+    """
+    dirs = [
+        os.path.normpath(e.get("experiment_dir") or ".") for e in experiments.values()
+    ]
+    scripts = [
+        os.path.basename(e.get("base_fname") or "") for e in experiments.values()
+    ]
+    owners = {}
+    for info in infos:
+        cmdline = info["cmdline"] or []
+        args = " ".join(cmdline)
+        names = [os.path.basename(arg) for arg in cmdline]
+        for e_id, e_dir, script in zip(experiments, dirs, scripts):
+            if (e_dir != "." and dirs.count(e_dir) == 1 and e_dir in args) or (
+                script != "" and scripts.count(script) == 1 and script in names
+            ):
+                owners[info["pid"]] = e_id
+                break
+
+    # Walk up process tree to the closest matched ancestor
+    parents = {info["pid"]: info.get("ppid") for info in infos}
+    for pid in parents:
+        ancestor, visited = parents[pid], set()
+        while pid not in owners and ancestor in parents and ancestor not in visited:
+            if ancestor in owners:
+                owners[pid] = owners[ancestor]
+            visited.add(ancestor)
+            ancestor = parents[ancestor]
+    return owners
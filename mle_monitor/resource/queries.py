@@ -0,0 +1,51 @@
+import time
+from concurrent.futures import ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict
+
+
+# Default seconds a scheduler command may take before its data becomes stale
+QUERY_TIMEOUT = 10
+
+
+class ParallelQueries(object):
+    def __init__(self, timeout: float = QUERY_TIMEOUT, max_workers: int = 4):
+        """Run scheduler queries concurrently on a persistent thread pool.
+
+        Each query gets up to `timeout` seconds. Slow or failing queries are
+        replaced by their last successful result and reported in `stale`
+        (seconds since that result). A slow query keeps running in the
+        background - it is not resubmitted until it finished.
+        """
+        self.timeout = timeout
+        self.executor = ThreadPoolExecutor(
+            max_workers, thread_name_prefix="mle-scheduler-query"
+        )
+        self.futures, self.results, self.stale = {}, {}, {}
+
+    def run(self, queries: Dict[str, Callable[[], Any]]) -> Dict[str, Any]:
+        """Results of all `queries` (name -> function) - stale if slow."""
+        for name, query in queries.items():
+            if name not in self.futures:
+                self.futures[name] = self.executor.submit(query)
+        wait([self.futures[name] for name in queries], timeout=self.timeout)
+
+        results, self.stale = {}, {}
+        for name in queries:
+            future = self.futures[name]
+            if future.done():
+                del self.futures[name]
+                try:
+                    self.results[name] = (time.time(), future.result())
+                except Exception:
+                    if name not in self.results:
+                        raise
+            elif name not in self.results:
+                raise TimeoutError(f"Scheduler query `{name}` timed out.")
+            fetched, results[name] = self.results[name]
+            if not future.done() or future.exception() is not None:
+                self.stale[name] = time.time() - fetched
+        return results
+
+    def close(self):
+        """Stop the thread pool - running queries are not waited for."""
+        self.executor.shutdown(wait=False)
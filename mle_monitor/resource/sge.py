@@ -1,149 +1,190 @@
 from datetime import datetime
 import subprocess as sp
-from typing import Union
-import numpy as np
-import pandas as pd
+import threading
+import time
+import xml.etree.ElementTree as ET
+from collections import Counter, defaultdict
+from contextlib import contextmanager
+from typing import IO, Dict, Iterator, List, Tuple, Union
 from ..utils import natural_keys
+from .queries import ParallelQueries, QUERY_TIMEOUT
+
+
+# Multipliers to convert `qhost` memory values (e.g. "251.8G") to GB
+MEMORY_UNITS = {"K": 1e-6, "M": 1e-3, "G": 1, "T": 1e3}
 
 
 class SGEResource(object):
     def __init__(self, monitor_config: Union[dict, None]):
         self.resource_name = "sge-cluster"
         self.monitor_config = monitor_config
+        # Commands exceeding the timeout are killed - last data is reused
+        self.queries = ParallelQueries(monitor_config.get("timeout", QUERY_TIMEOUT))
 
     def monitor(self):
-        """Helper to get all utilisation data for resource."""
-        user_data, job_df = self.get_user_data()
-        queue_data = self.get_queue_data(job_df)
-        node_data = self.get_node_data(job_df)
-        util_data = self.get_util_data()
-        return user_data, queue_data, util_data, node_data
-
-    def get_user_data(self):
-        """Get jobs scheduled by Slurm cluster users.
-        Return dictionary with `users`, `total`, `run`, `wait`, `login`.
+        """Helper to get all utilisation data for resource.
+
+        Jobs (`qstat`) and hosts (`qhost`) are queried concurrently. Slow
+        queries return their last data - listed in `stale`.
+        """
+        results = self.queries.run(
+            {"jobs": self.get_job_data, "nodes": self.get_util_data}
+        )
+        user_data, queue_data, node_data = results["jobs"]
+        return user_data, queue_data, results["nodes"], node_data
+
+    @property
+    def stale(self) -> dict:
+        """Seconds since the last update of queries that returned old data."""
+        return self.queries.stale
+
+    @contextmanager
+    def stream(self, command: List[str]) -> Iterator[IO[bytes]]:
+        """Stream the output of a scheduler command while it is running."""
+        with sp.Popen(command, stdout=sp.PIPE) as proc:
+            # Kill hanging commands - truncated output fails to parse
+            watchdog = threading.Timer(self.queries.timeout, proc.kill)
+            watchdog.start()
+            try:
+                yield proc.stdout
+            finally:
+                watchdog.cancel()
+        if proc.returncode:
+            raise sp.CalledProcessError(proc.returncode, command)
+
+    def get_job_data(self):
+        """Get jobs by user, queue & node."""
+        job_counts = self.get_job_counts()
+        user_data = self.get_user_data(job_counts)
+        queue_data = self.get_queue_data(job_counts)
+        node_data = self.get_node_data(job_counts)
+        return user_data, queue_data, node_data
+
+    def get_job_counts(self) -> Dict[str, Dict[str, Counter]]:
+        """Count jobs per status of all users, queues & nodes in one pass.
+
+        Pending jobs are only counted for users (not yet on a queue/node).
         """
-        user_data = {"user": [], "total": [], "run": [], "wait": [], "login": []}
-        all_users = sp.check_output(["qconf", "-suserl"]).split(b"\n")[:-1]
-        all_users = [u.decode() for u in all_users]
-        user_cmd = [["-u", u] for u in all_users]
-        user_cmd = [item for sublist in user_cmd for item in sublist]
         queue_cmd = [["-q", q] for q in self.monitor_config["queues"]]
         queue_cmd = [item for sublist in queue_cmd for item in sublist]
-
-        # Check all users and queues in one go
-        all_job_infos = sp.check_output(["qstat", *user_cmd, *queue_cmd]).split(b"\n")[
-            2:-1
-        ]
-
-        job_df = {
-            "user": [],
-            "queue": [],
-            "status": [],
-            "node": [],
+        counts = {
+            "user": defaultdict(Counter),
+            "queue": defaultdict(Counter),
+            "node": defaultdict(Counter),
         }
-
-        # Clean all jobs (qlogin, qsub, etc.) + get unique users/hosts
-        for job in all_job_infos:
-            job_clean = job.decode().split(" ")
-            job_clean = list(filter(None, job_clean))
-            host_ip = job_clean[7].split("@")
-            job_df["user"].append(job_clean[3])
-            if len(host_ip) > 1:
-                job_df["queue"].append(host_ip[0])
-                job_df["node"].append(host_ip[1][:-1])
-            else:
-                job_df["queue"].append(None)
-                job_df["node"].append(None)
-
-            if "QLOGIN" in job_clean and job_clean[4] == "r":
-                job_df["status"].append("LOGIN")
-            elif "QLOGIN" not in job_clean and job_clean[4] == "r":
-                job_df["status"].append("R")
-            else:
-                job_df["status"].append("PD")
-        job_df = pd.DataFrame(job_df)
-
-        # Loop over unique users and construct data to show
-        unique_users = job_df.user.unique().tolist()
-        for u_id in unique_users:
-            sub_df = job_df.loc[job_df["user"] == u_id]
+        # Check all users and queues in one go
+        with self.stream(["qstat", "-u", "*", *queue_cmd, "-xml"]) as output:
+            for user, queue, node, status in parse_qstat_xml(output):
+                counts["user"][user][status] += 1
+                if status != "PD" and queue is not None:
+                    counts["queue"][queue][status] += 1
+                    counts["node"][node][status] += 1
+        return counts
+
+    def get_user_data(self, job_counts: Dict[str, Dict[str, Counter]]):
+        """Get jobs scheduled by SGE cluster users.
+        Return dictionary with `users`, `total`, `run`, `wait`, `login`.
+        """
+        user_data = {"user": [], "total": [], "run": [], "wait": [], "login": []}
+        # Sort users based on total jobs in decreasing order
+        users = sorted(
+            job_counts["user"].items(),
+            key=lambda u: sum(u[1].values()),
+            reverse=True,
+        )
+        for u_id, counts in users:
             user_data["user"].append(u_id)
-            user_data["total"].append(sub_df.shape[0])
-            sub_run = sub_df.loc[sub_df["status"] == "R"]
-            user_data["run"].append(sub_run.shape[0])
-            sub_wait = sub_df.loc[sub_df["status"] == "PD"]
-            user_data["wait"].append(sub_wait.shape[0])
-            sub_login = sub_df.loc[sub_df["status"] == "LOGIN"]
-            user_data["login"].append(sub_login.shape[0])
+            user_data["total"].append(sum(counts.values()))
+            user_data["run"].append(counts["R"])
+            user_data["wait"].append(counts["PD"])
+            user_data["login"].append(counts["LOGIN"])
+        return user_data
 
-        # Sort users based on total jobs in decreasing order
-        sort_ids = np.argsort(-np.array(user_data["total"]))
-        user_data["user"] = [user_data["user"][i] for i in sort_ids]
-        user_data["total"] = [user_data["total"][i] for i in sort_ids]
-        user_data["run"] = [user_data["run"][i] for i in sort_ids]
-        user_data["wait"] = [user_data["wait"][i] for i in sort_ids]
-        user_data["login"] = [user_data["login"][i] for i in sort_ids]
-        return user_data, job_df
-
-    def get_queue_data(self, job_df: pd.DataFrame):
+    def get_queue_data(self, job_counts: Dict[str, Dict[str, Counter]]):
         """Get jobs running on different SGE queues."""
-        host_data = {"host_id": [], "total": [], "run": [], "login": []}
-        job_df = job_df[job_df.status != "PD"]
-        unique_queues = job_df.queue.unique().tolist()
-        unique_queues.sort(key=natural_keys)
-
-        for h_id in unique_queues:
-            sub_df = job_df.loc[job_df["queue"] == h_id]
-            host_data["host_id"].append(h_id)
-            host_data["total"].append(sub_df.shape[0])
-            sub_run = sub_df.loc[sub_df["status"] == "R"]
-            host_data["run"].append(sub_run.shape[0])
-            sub_login = sub_df.loc[sub_df["status"] == "LOGIN"]
-            host_data["login"].append(sub_login.shape[0])
-        return host_data
+        return host_table(job_counts["queue"])
 
     def get_util_data(self):
         """Get memory and CPU utilisation for specific SGE queue."""
-        processes = sp.check_output(["qhost"])
-        all_node_infos = processes.split(b"\n")[1:-1]
-        all_node_infos = [j.decode() for j in all_node_infos]
-
         total_cores, used_cores, total_mem, used_mem = 0, 0, 0, 0
-        for n_info in all_node_infos:
-            node_clean = n_info.split()
-            try:
-                # Cores in threads and memory in GB
-                total_cores += int(node_clean[2])
-                used_cores += float(node_clean[2]) * float(node_clean[6])
-                total_mem += float(node_clean[-4][:-1])
-                # Total memory - free memory
-                used_mem += float(node_clean[-2][:-1])
-            except Exception:
-                pass
+        with self.stream(["qhost", "-xml"]) as output:
+            for host in parse_qhost_xml(output):
+                try:
+                    # Cores in threads and memory in GB
+                    num_proc = int(host["num_proc"])
+                    used_cores += num_proc * float(host["np_load_avg"])
+                    total_cores += num_proc
+                    total_mem += memory_gb(host["mem_total"])
+                    used_mem += memory_gb(host["mem_used"])
+                except (KeyError, ValueError):
+                    # Global host & unavailable nodes report "-"
+                    pass
         util_data = {
             "cores": total_cores,
             "cores_util": used_cores,
             "mem": total_mem,
             "mem_util": used_mem,
+            # Epoch seconds (monotonic across DST) & local time for display
+            "time": time.time(),
             "time_date": datetime.now().strftime("%m/%d/%y"),
             "time_hour": datetime.now().strftime("%H:%M:%S"),
         }
         return util_data
 
-    def get_node_data(self, job_df: pd.DataFrame):
+    def get_node_data(self, job_counts: Dict[str, Dict[str, Counter]]):
         """Get jobs running on different SGE cluster nodes."""
-        host_data = {"host_id": [], "total": [], "run": [], "login": []}
-        job_df = job_df[job_df.status != "PD"]
-        unique_nodes = job_df.node.unique().tolist()
-        unique_nodes.sort(key=natural_keys)
-
-        for h_id in unique_nodes:
-            sub_df = job_df.loc[job_df["node"] == h_id]
-            host_data["host_id"].append(h_id)
-            host_data["total"].append(sub_df.shape[0])
-            sub_run = sub_df.loc[sub_df["status"] == "R"]
-            host_data["run"].append(sub_run.shape[0])
-            sub_login = sub_df.loc[sub_df["status"] == "LOGIN"]
-            host_data["login"].append(sub_login.shape[0])
-        return host_data
+        return host_table(job_counts["node"])
+
+
+def host_table(counts: Dict[str, Counter]) -> dict:
+    """Total, running & login jobs per queue/node (natural order)."""
+    host_data = {"host_id": [], "total": [], "run": [], "login": []}
+    for h_id in sorted(counts, key=natural_keys):
+        host_data["host_id"].append(h_id)
+        host_data["total"].append(sum(counts[h_id].values()))
+        host_data["run"].append(counts[h_id]["R"])
+        host_data["login"].append(counts[h_id]["LOGIN"])
+    return host_data
+
+
+def parse_qstat_xml(
+    source: IO[bytes],
+) -> Iterator[Tuple[str, Union[str, None], Union[str, None], str]]:
+    """Incrementally parse `qstat -xml` - yields user, queue, node & status.
+
+    Running interactive jobs have status "LOGIN", other running ones "R" and
+    all others (pending, held, errors, ...) "PD".
+    """
+    for _, elem in ET.iterparse(source, events=("end",)):
+        if elem.tag != "job_list":
+            continue
+        host_ip = (elem.findtext("queue_name") or "").split("@")
+        queue, node = (host_ip[0], host_ip[1]) if len(host_ip) > 1 else (None, None)
+        state = elem.findtext("state")
+        if state == "r":
+            status = "LOGIN" if elem.findtext("JB_name") == "QLOGIN" else "R"
+        else:
+            status = "PD"
+        yield elem.findtext("JB_owner"), queue, node, status
+        # Free parsed jobs - memory stays constant with many jobs
+        elem.clear()
+
+
+def parse_qhost_xml(source: IO[bytes]) -> Iterator[Dict[str, str]]:
+    """Incrementally parse `qhost -xml` - yields the values of each host."""
+    for _, elem in ET.iterparse(source, events=("end",)):
+        if elem.tag != "host":
+            continue
+        host = {"name": elem.get("name")}
+        for value in elem.iterfind("hostvalue"):
+            host[value.get("name")] = value.text
+        yield host
+        elem.clear()
+
+
+def memory_gb(value: str) -> float:
+    """Convert a `qhost` memory value (e.g. "251.8G") to GB."""
+    if value[-1] in MEMORY_UNITS:
+        return float(value[:-1]) * MEMORY_UNITS[value[-1]]
+    # Plain values are bytes
+    return float(value) / 1e9
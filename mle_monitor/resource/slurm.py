@@ -1,126 +1,145 @@
 from datetime import datetime
+import json
+import time
 import subprocess as sp
 import pandas as pd
-import numpy as np
-from typing import Union
+from typing import Callable, List, Union
 from ..utils import natural_keys
+from .queries import ParallelQueries, QUERY_TIMEOUT
+
+
+# Columns of the job table & short codes of the `squeue --json` job states
+JOB_COLUMNS = ["user", "partition", "status", "node"]
+NODE_COLUMNS = ["node", "cores", "load", "mem", "free_mem"]
+JOB_STATES = {
+    "RUNNING": "R",
+    "PENDING": "PD",
+    "COMPLETING": "CG",
+    "CONFIGURING": "CF",
+    "SUSPENDED": "S",
+}
+# Text fallback formats for older Slurm versions without `--json`
+SQUEUE_FORMAT = "%u|%P|%t|%N"
+SINFO_FORMAT = "%N|%c|%O|%m|%e"
+# Seconds until `--json` is tried again after it failed
+JSON_RETRY = 600
 
 
 class SlurmResource(object):
     def __init__(self, monitor_config: Union[dict, None]):
         self.resource_name = "slurm-cluster"
         self.monitor_config = monitor_config
+        # Whether `squeue`/`sinfo` support `--json` (None - not yet tried)
+        self.json_support = {"squeue": None, "sinfo": None}
+        # Time after which `--json` is tried again (if unsupported so far)
+        self.json_retry = {"squeue": 0.0, "sinfo": 0.0}
+        # Commands exceeding the timeout are killed - last data is reused
+        self.queries = ParallelQueries(monitor_config.get("timeout", QUERY_TIMEOUT))
 
     def monitor(self):
-        """Helper to get all utilisation data for resource."""
-        user_data, job_df = self.get_user_data()
+        """Helper to get all utilisation data for resource.
+
+        Jobs (`squeue`) and nodes (`sinfo`) are queried concurrently. Slow
+        queries return their last data - listed in `stale`.
+        """
+        results = self.queries.run(
+            {"jobs": self.get_job_data, "nodes": self.get_util_data}
+        )
+        user_data, host_data, node_data = results["jobs"]
+        return user_data, host_data, results["nodes"], node_data
+
+    @property
+    def stale(self) -> dict:
+        """Seconds since the last update of queries that returned old data."""
+        return self.queries.stale
+
+    def query(self, command: List[str]) -> str:
+        """Run a scheduler command and return its output."""
+        return sp.check_output(command, timeout=self.queries.timeout).decode()
+
+    def query_table(
+        self,
+        command: List[str],
+        text_format: str,
+        parse_json: Callable[[str], pd.DataFrame],
+        parse_text: Callable[[str], pd.DataFrame],
+    ) -> pd.DataFrame:
+        """Query Slurm with `--json` - fall back to delimited text output.
+
+        A failed `--json` query is retried after `JSON_RETRY` seconds, since
+        it may also fail temporarily (e.g. slurmctld timeout).
+        """
+        name = command[0]
+        if self.json_support[name] is not False or time.time() >= self.json_retry[name]:
+            try:
+                table = parse_json(self.query(command + ["--json"]))
+                self.json_support[name] = True
+                return table
+            except (sp.CalledProcessError, ValueError, KeyError):
+                if self.json_support[name]:
+                    raise
+                # Unknown option, unexpected JSON layout or failed query
+                self.json_support[name] = False
+                self.json_retry[name] = time.time() + JSON_RETRY
+        return parse_text(self.query(command + ["-h", "-o", text_format]))
+
+    def get_jobs(self) -> pd.DataFrame:
+        """Get user, partition, state & nodes of all jobs in the partitions."""
+        partitions = self.monitor_config["partitions"]
+        job_df = self.query_table(
+            ["squeue", "-p", ",".join(partitions)],
+            SQUEUE_FORMAT,
+            parse_squeue_json,
+            parse_squeue_text,
+        )
+        # Slurm 21.08/22.05 ignore filter options like `-p` with `--json`
+        return in_partitions(job_df, partitions)
+
+    def get_job_data(self):
+        """Get jobs by user, partition & node."""
+        job_df = self.get_jobs()
+        user_data = self.get_user_data(job_df)
         host_data = self.get_partition_data(job_df)
         node_data = self.get_node_data(job_df)
-        util_data = self.get_util_data()
-        return user_data, host_data, util_data, node_data
-
-    def get_user_data(self):
-        """Get jobs scheduled by Slurm cluster users."""
-        user_data = {"user": [], "total": [], "run": [], "wait": [], "login": []}
-
-        # Get squeue output in detailed form
-        processes = sp.check_output(
-            [
-                "squeue",
-                "-o",
-                '"%.20P %.20u %.2t %.10M %.6D %C %m %N"',
-                "-p",
-                (",").join(self.monitor_config["partitions"]),
-            ]
-        )
-        all_job_infos = processes.split(b"\n")[1:-1]
-        all_job_infos = [j.decode() for j in all_job_infos]
-
-        job_df = {
-            "user": [],
-            "partition": [],
-            "status": [],
-            "node": [],
-            "run_time": [],
-            "num_cores": [],
-            "min_memory": [],
+        return user_data, host_data, node_data
+
+    def get_user_data(self, job_df: pd.DataFrame):
+        """Get jobs scheduled by Slurm cluster users (most jobs first)."""
+        counts = count_jobs(job_df, "user", by_total=True)
+        return {
+            "user": counts["id"],
+            "total": counts["total"],
+            "run": counts["run"],
+            "wait": counts["wait"],
+            "login": [0] * len(counts["id"]),
         }
-        # Loop over jobs and extract relevant data into dataframe
-        for job in all_job_infos:
-            job_clean = job.split()[1:]
-            job_df["user"].append(job_clean[1])
-            job_df["partition"].append(job_clean[0])
-            job_df["status"].append(job_clean[2])
-            job_df["run_time"].append(job_clean[3])
-            job_df["node"].append(job_clean[7][:-1])
-            job_df["num_cores"].append(job_clean[5])
-            job_df["min_memory"].append(job_clean[6])
-        job_df = pd.DataFrame(job_df)
-
-        # Loop over unique users and construct data to show
-        unique_users = job_df.user.unique().tolist()
-        for u_id in unique_users:
-            sub_df = job_df.loc[job_df["user"] == u_id]
-            user_data["user"].append(u_id)
-            user_data["total"].append(sub_df.shape[0])
-            sub_run = sub_df.loc[sub_df["status"] == "R"]
-            user_data["run"].append(sub_run.shape[0])
-            sub_wait = sub_df.loc[sub_df["status"] == "PD"]
-            # "CG" is completing status
-            user_data["wait"].append(sub_wait.shape[0])
-            user_data["login"].append(0)
-
-        # Sort users based on total jobs in decreasing order
-        sort_ids = np.argsort(-np.array(user_data["total"]))
-        user_data["user"] = [user_data["user"][i] for i in sort_ids]
-        user_data["total"] = [user_data["total"][i] for i in sort_ids]
-        user_data["run"] = [user_data["run"][i] for i in sort_ids]
-        user_data["wait"] = [user_data["wait"][i] for i in sort_ids]
-        user_data["login"] = [user_data["login"][i] for i in sort_ids]
-        return user_data, job_df
 
     def get_partition_data(self, job_df: pd.DataFrame):
         """Get jobs running on different Slurm cluster partitions."""
-        host_data = {"host_id": [], "total": [], "run": [], "login": []}
-
-        unique_partitions = job_df.partition.unique().tolist()
-        unique_partitions.sort(key=natural_keys)
-        for h_id in unique_partitions:
-            sub_df = job_df.loc[job_df["partition"] == h_id]
-            host_data["host_id"].append(h_id)
-            host_data["total"].append(sub_df.shape[0])
-            sub_run = sub_df.loc[sub_df["status"] == "R"]
-            host_data["run"].append(sub_run.shape[0])
-            host_data["login"].append(0)
-        return host_data
+        counts = count_jobs(job_df, "partition")
+        return {
+            "host_id": counts["id"],
+            "total": counts["total"],
+            "run": counts["run"],
+            "login": [0] * len(counts["id"]),
+        }
 
     def get_util_data(self):
         """Get memory and CPU utilisation for specific slurm partition."""
-        # Get squeue output in detailed form
-        processes = sp.check_output(["sinfo", "--Node", "-o", '"%.20P %N %c %O %m %e"'])
-        all_node_infos = processes.split(b"\n")[1:-1]
-        all_node_infos = [j.decode() for j in all_node_infos]
-
-        total_cores, used_cores, total_mem, used_mem = 0, 0, 0, 0
-        for n_info in all_node_infos:
-            node_clean = n_info.split()[1:]
-            try:
-                # Cores in threads and memory in GB
-                total_cores += int(node_clean[2])
-                used_cores += float(node_clean[2]) * float(node_clean[3]) / 100
-                total_mem += float(node_clean[4]) / 1000
-                # Total memory - free memory
-                used_mem += (
-                    float(node_clean[4]) / 1000 - float(node_clean[5][:-1]) / 1000
-                )
-            except Exception:
-                pass
-
+        node_df = self.query_table(
+            ["sinfo", "--Node"], SINFO_FORMAT, parse_sinfo_json, parse_sinfo_text
+        )
+        # Nodes are listed once per partition they belong to
+        node_df = node_df.drop_duplicates("node")
+        # Cores in threads (load average ~ busy cores) and memory in GB
         util_data = {
-            "cores": total_cores,
-            "cores_util": used_cores,
-            "mem": total_mem,
-            "mem_util": used_mem,
+            "cores": int(node_df.cores.sum()),
+            "cores_util": float(node_df.load.clip(upper=node_df.cores).sum()),
+            "mem": float(node_df.mem.sum()) / 1000,
+            # Total memory - free memory
+            "mem_util": float((node_df.mem - node_df.free_mem).sum()) / 1000,
+            # Epoch seconds (monotonic across DST) & local time for display
+            "time": time.time(),
             "time_date": datetime.now().strftime("%m/%d/%y"),
             "time_hour": datetime.now().strftime("%H:%M:%S"),
         }
@@ -128,19 +147,103 @@ class SlurmResource(object):
 
     def get_node_data(self, job_df: pd.DataFrame):
         """Get jobs running on different Slurm cluster nodes."""
-        host_data = {"host_id": [], "total": [], "run": [], "login": []}
-
-        unique_nodes = job_df.node.unique().tolist()
-        unique_nodes.sort(key=natural_keys)
-        for h_id in unique_nodes:
-            sub_df = job_df.loc[job_df["node"] == h_id]
-            host_data["host_id"].append(h_id)
-            host_data["total"].append(sub_df.shape[0])
-            sub_run = sub_df.loc[sub_df["status"] == "R"]
-            host_data["run"].append(sub_run.shape[0])
-            host_data["login"].append(0)
-        return host_data
-
-
-# squeue -p partition_name
-# sacct -j job_id (get resource!)
+        counts = count_jobs(job_df[job_df.node != ""], "node")
+        return {
+            "host_id": counts["id"],
+            "total": counts["total"],
+            "run": counts["run"],
+            "login": [0] * len(counts["id"]),
+        }
+
+
+def count_jobs(job_df: pd.DataFrame, column: str, by_total: bool = False) -> dict:
+    """Total, running & pending jobs per value of `column` (single groupby).
+
+    Sorted by total number of jobs or naturally by the column's values.
+    """
+    if job_df.empty:
+        return {"id": [], "total": [], "run": [], "wait": []}
+    counts = job_df.value_counts([column, "status"]).unstack(fill_value=0)
+    total = counts.sum(axis=1)
+    counts = counts.reindex(columns=["R", "PD"], fill_value=0)
+    if by_total:
+        order = total.sort_values(ascending=False, kind="stable").index
+    else:
+        order = sorted(total.index, key=natural_keys)
+    return {
+        "id": list(order),
+        "total": total[order].tolist(),
+        "run": counts.loc[order, "R"].tolist(),
+        "wait": counts.loc[order, "PD"].tolist(),
+    }
+
+
+def in_partitions(job_df: pd.DataFrame, partitions: List[str]) -> pd.DataFrame:
+    """Jobs in any of the `partitions` (pending jobs may list several)."""
+    listed = job_df["partition"].str.split(",").explode()
+    keep = listed.isin(partitions).groupby(level=0).any()
+    return job_df[keep.reindex(job_df.index, fill_value=False)]
+
+
+def parse_squeue_json(output: str) -> pd.DataFrame:
+    """Job table from `squeue --json` output."""
+    jobs = json.loads(output)["jobs"]
+    rows = [
+        (
+            job["user_name"],
+            job["partition"],
+            job_state(job["job_state"]),
+            job.get("nodes") or "",
+        )
+        for job in jobs
+    ]
+    return pd.DataFrame(rows, columns=JOB_COLUMNS)
+
+
+def parse_squeue_text(output: str) -> pd.DataFrame:
+    """Job table from `squeue -h -o SQUEUE_FORMAT` output."""
+    rows = [line.split("|") for line in output.splitlines() if line]
+    return pd.DataFrame(rows, columns=JOB_COLUMNS)
+
+
+def parse_sinfo_json(output: str) -> pd.DataFrame:
+    """Node table (cores, load, memory & free memory in MB) from JSON."""
+    nodes = json.loads(output)["nodes"]
+    rows = [
+        (
+            node["name"],
+            number(node["cpus"]),
+            # Load average x 100
+            number(node["cpu_load"]) / 100,
+            number(node["real_memory"]),
+            number(node["free_memory"]),
+        )
+        for node in nodes
+    ]
+    return pd.DataFrame(rows, columns=NODE_COLUMNS)
+
+
+def parse_sinfo_text(output: str) -> pd.DataFrame:
+    """Node table from `sinfo --Node -h -o SINFO_FORMAT` output."""
+    rows = [line.split("|") for line in output.splitlines() if line]
+    node_df = pd.DataFrame(rows, columns=NODE_COLUMNS)
+    # Unavailable values are reported as "N/A"
+    for column in NODE_COLUMNS[1:]:
+        node_df[column] = pd.to_numeric(node_df[column], errors="coerce")
+    return node_df
+
+
+def job_state(state: Union[str, List[str]]) -> str:
+    """Short code of a job state (a list of states in newer Slurm versions)."""
+    if isinstance(state, list):
+        state = state[0] if state else ""
+    return JOB_STATES.get(state, state)
+
+
+def number(value) -> float:
+    """Plain number of a JSON value - newer Slurm versions wrap it in a dict."""
+    if isinstance(value, dict):
+        if not value.get("set", True) or value.get("infinite", False):
+            return float("nan")
+        value = value.get("number")
+    return float("nan") if value is None else value
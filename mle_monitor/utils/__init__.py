@@ -1,6 +1,13 @@
 from .tracker import Tracker
-from .helpers import load_json_config, load_yaml_config, natural_keys, setup_logger
+from .helpers import (
+    load_json_config,
+    load_yaml_config,
+    natural_keys,
+    setup_logger,
+    fingerprint,
+)
 from .gcs_zip import send_gcloud_zip, get_gcloud_zip
+from .file_lock import FileLock, file_state
 
 
 __all__ = [
@@ -9,6 +16,9 @@ __all__ = [
     "load_yaml_config",
     "natural_keys",
     "setup_logger",
+    "fingerprint",
     "send_gcloud_zip",
     "get_gcloud_zip",
+    "FileLock",
+    "file_state",
 ]
@@ -0,0 +1,82 @@
+import os
+from typing import Union
+
+try:
+    import fcntl
+except ImportError:
+    # Advisory locking is only supported on POSIX systems
+    fcntl = None
+
+# Not available on all platforms (e.g. Windows)
+O_NOFOLLOW = getattr(os, "O_NOFOLLOW", 0)
+
+
+def file_state(fname: str):
+    """Identify file version by inode, size & modification time."""
+    try:
+        st = os.stat(fname)
+    except OSError:
+        return None
+    return st.st_ino, st.st_size, st.st_mtime_ns
+
+
+class FileLock(object):
+    def __init__(
+        self, fname: str, enabled: bool = True, mode: Union[int, None] = None
+    ):
+        """Reentrant advisory (flock) lock, e.g. shared by all protocol writers.
+
+        A new lock file gets the permissions `mode` regardless of the umask,
+        e.g. 0o660 for a lock shared by the users of a group.
+        """
+        self.fname = os.path.expanduser(fname)
+        self.enabled = enabled and fcntl is not None
+        self.mode = mode
+        self.depth = 0
+        self.fd = None
+
+    def open(self):
+        """Open the lock file read-only (sufficient for flock) or create it.
+
+        Symlinks (e.g. planted in a shared dir like /tmp) are not followed.
+        """
+        flags = os.O_RDONLY | O_NOFOLLOW
+        try:
+            # No O_CREAT - denied for others' files in sticky dirs like /tmp
+            fd = os.open(self.fname, flags)
+        except FileNotFoundError:
+            try:
+                fd = os.open(self.fname, flags | os.O_CREAT | os.O_EXCL, 0o666)
+            except FileExistsError:
+                # Created concurrently by another process
+                return self.open()
+            if self.mode is not None:
+                os.fchmod(fd, self.mode)
+        return os.fdopen(fd, "r")
+
+    def acquire(self, blocking: bool = True) -> bool:
+        """Acquire the lock - False if not `blocking` and held elsewhere."""
+        if self.enabled and self.depth == 0:
+            fd = self.open()
+            try:
+                fcntl.flock(fd, fcntl.LOCK_EX | (0 if blocking else fcntl.LOCK_NB))
+            except BlockingIOError:
+                fd.close()
+                return False
+            self.fd = fd
+        self.depth += 1
+        return True
+
+    def release(self):
+        self.depth -= 1
+        if self.enabled and self.depth == 0:
+            fcntl.flock(self.fd, fcntl.LOCK_UN)
+            self.fd.close()
+            self.fd = None
+
+    def __enter__(self):
+        self.acquire()
+        return self
+
+    def __exit__(self, *args):
+        self.release()
@@ -2,7 +2,9 @@ import yaml
 import commentjson
 from dotmap import DotMap
 import re
+import hashlib
 import logging
+import numpy as np
 from rich.logging import RichHandler
 
 
@@ -48,3 +50,30 @@ def setup_logger(logging_level: int = logging.INFO):
     logger = logging.getLogger()
     logger.setLevel(logging_level)
     return logger
+
+
+def fingerprint(data) -> str:
+    """Content hash of (nested) dicts, lists, NumPy arrays & scalars."""
+    digest = hashlib.blake2b(digest_size=16)
+    hash_content(digest, data)
+    return digest.hexdigest()
+
+
+def hash_content(digest, data):
+    if isinstance(data, dict):
+        digest.update(b"{")
+        for k, v in data.items():
+            hash_content(digest, k)
+            hash_content(digest, v)
+        digest.update(b"}")
+    elif isinstance(data, (list, tuple)):
+        digest.update(b"[")
+        for v in data:
+            hash_content(digest, v)
+        digest.update(b"]")
+    elif isinstance(data, np.ndarray):
+        digest.update(f"{data.dtype}{data.shape}".encode())
+        digest.update(np.ascontiguousarray(data).tobytes())
+    else:
+        digest.update(repr(data).encode())
+        digest.update(b",")
@@ -1,55 +1,405 @@
 import os
 import numpy as np
+from datetime import datetime
+from typing import Union
+
+
+# Single utilisation sample - epoch seconds & relative memory/CPU utilisation
+TRACKER_DTYPE = np.dtype([("time", "<i8"), ("mem_util", "<f4"), ("cpu_util", "<f4")])
+
+# Aggregated samples of a time bucket (bucket start in epoch seconds)
+ROLLUP_DTYPE = np.dtype(
+    [
+        ("time", "<i8"),
+        ("count", "<i8"),
+        ("mem_min", "<f4"),
+        ("mem_mean", "<f4"),
+        ("mem_max", "<f4"),
+        ("cpu_min", "<f4"),
+        ("cpu_mean", "<f4"),
+        ("cpu_max", "<f4"),
+    ]
+)
+
+# Rollup resolutions - bucket length in seconds & number of buckets kept
+ROLLUPS = {"minute": (60, 10080), "hour": (3600, 8760)}
+
+
+class RingBuffer(object):
+    def __init__(self, fname: str, dtype: np.dtype, limit: int, convert=None):
+        """Memory-mapped fixed-size ring buffer of records ordered by time.
+
+        Each append writes a single slot in place - the file size stays
+        constant. Files of another size are resized on load, files with a
+        different layout are passed to `convert` (returns initial samples).
+        """
+        self.fname = fname
+        self.dtype = dtype
+        self.limit = limit
+        self.load(convert)
+
+    def load(self, convert=None):
+        """Open (or create) the memory-mapped ring buffer file."""
+        try:
+            buffer = np.load(self.fname, mmap_mode="r+")
+        except Exception:
+            buffer = None
+        if buffer is not None and buffer.dtype == self.dtype:
+            if buffer.shape == (self.limit,):
+                self.buffer = buffer
+            else:
+                samples = np.array(buffer[buffer["time"] > 0])
+                self.create(samples[np.argsort(samples["time"], kind="stable")])
+        elif convert is not None:
+            self.create(convert(buffer))
+        else:
+            self.create(np.zeros(0, dtype=self.dtype))
+        # Slots are filled in order - empty ones have timestamp 0. Once full,
+        # the oldest sample (next slot to write) follows the newest one.
+        times = self.buffer["time"]
+        self.count = int(np.count_nonzero(times))
+        if self.count < self.limit:
+            self.head = self.count
+        else:
+            drops = np.flatnonzero(np.diff(times) < 0)
+            self.head = int(drops[0]) + 1 if len(drops) > 0 else 0
+
+    def create(self, samples: np.ndarray):
+        """Create ring buffer file holding the last `limit` given samples."""
+        samples = samples[-self.limit :]
+        tmp_fname = f"{self.fname}.{os.getpid()}.tmp"
+        buffer = np.lib.format.open_memmap(
+            tmp_fname, mode="w+", dtype=self.dtype, shape=(self.limit,)
+        )
+        buffer[: len(samples)] = samples
+        buffer.flush()
+        del buffer
+        os.replace(tmp_fname, self.fname)
+        self.buffer = np.load(self.fname, mmap_mode="r+")
+
+    def append(self, record: tuple):
+        """Overwrite the oldest slot with a new record."""
+        self.buffer[self.head] = record
+        self.head = (self.head + 1) % self.limit
+        self.count = min(self.count + 1, self.limit)
+
+    def last(self):
+        """Newest record (None if empty)."""
+        if self.count == 0:
+            return None
+        return self.buffer[(self.head - 1) % self.limit]
+
+    def replace_last(self, record: tuple):
+        """Overwrite the newest record in place."""
+        self.buffer[(self.head - 1) % self.limit] = record
+
+    def time_range(self):
+        """Timestamps of the oldest & newest record."""
+        oldest = 0 if self.count < self.limit else self.head
+        return self.buffer["time"][oldest], self.last()["time"]
+
+    def samples(self) -> np.ndarray:
+        """Copy of all stored records in chronological order."""
+        if self.count < self.limit:
+            return np.array(self.buffer[: self.count])
+        return np.concatenate([self.buffer[self.head :], self.buffer[: self.head]])
+
+    def between(self, start: int, end: int) -> np.ndarray:
+        """Copy of the records with `start <= time <= end` (chronological).
+
+        Only the matching slices of the two sorted ring segments are copied.
+        """
+        if self.count < self.limit:
+            segments = [self.buffer[: self.count]]
+        else:
+            segments = [self.buffer[self.head :], self.buffer[: self.head]]
+        sliced = []
+        for segment in segments:
+            first = np.searchsorted(segment["time"], start, "left")
+            last = np.searchsorted(segment["time"], end, "right")
+            sliced.append(segment[first:last])
+        return np.concatenate(sliced)
+
+    def flush(self):
+        self.buffer.flush()
 
 
 class Tracker(object):
-    def __init__(self, fname=".mle_tracker.npy"):
-        """MLE Tracker for Resource Utilization & Running Experiments."""
+    def __init__(self, fname=".mle_tracker.npy", limit: int = 100000):
+        """MLE Tracker for Resource Utilization & Running Experiments.
+
+        The raw history is stored in a memory-mapped ring buffer of `limit`
+        samples (approx. last 27 hours at one sample per second). Per-minute
+        (1 week) and per-hour (1 year) min/mean/max rollups are updated
+        incrementally in `<fname>_minute.npy` & `<fname>_hour.npy`.
+        """
         self.fname = os.path.join(os.path.expanduser("~"), fname)
         # Storage limit & reload previous stored data
-        self.limit = 100000
+        self.limit = limit
         self.load()
 
     def update(self, util_data: dict, save: bool = True):
-        # Add utilisation data to storage dictionaries
-        self.times_date.append(util_data["time_date"])
-        self.times_hour.append(util_data["time_hour"])
-        self.mem_util.append(util_data["mem_util"] / util_data["mem"])
-        self.cpu_util.append(util_data["cores_util"] / util_data["cores"])
-        self.moving_window()
-        self.save()
+        # Overwrite the oldest slot with the new utilisation sample
+        time_t = sample_time(util_data)
+        # Keep samples ordered if the clock was set back (e.g. NTP step)
+        last = self.raw.last()
+        if last is not None and time_t < last["time"]:
+            time_t = int(last["time"])
+        mem_util = util_data["mem_util"] / util_data["mem"]
+        cpu_util = util_data["cores_util"] / util_data["cores"]
+        self.raw.append((time_t, mem_util, cpu_util))
+        # Fold sample into the current bucket of each rollup
+        for name, (seconds, _) in ROLLUPS.items():
+            update_rollup(
+                self.rollups[name], time_t - time_t % seconds, mem_util, cpu_util
+            )
+        if save:
+            self.save()
+
+    def samples(self) -> np.ndarray:
+        """Copy of all stored raw samples in chronological order."""
+        return self.raw.samples()
+
+    def history(self) -> dict:
+        """Utilisation time series - epoch timestamps & relative utilisation."""
+        samples = self.samples()
         return {
-            "times_date": self.times_date,
-            "times_hour": self.times_hour,
-            "rel_mem_util": self.mem_util,
-            "rel_cpu_util": self.cpu_util,
+            "time": samples["time"],
+            "rel_mem_util": samples["mem_util"],
+            "rel_cpu_util": samples["cpu_util"],
         }
 
-    def moving_window(self):
-        """Truncate/Limit memory to approx. last 27 hours."""
-        self.times_date = self.times_date[: self.limit]
-        self.times_hour = self.times_hour[: self.limit]
-        self.mem_util = self.mem_util[: self.limit]
-        self.cpu_util = self.cpu_util[: self.limit]
+    def view(self, num_points: int = 42, duration: Union[int, None] = None) -> dict:
+        """History of the last `duration` seconds (default: all raw samples)
+        downsampled to at most `num_points` min/mean/max points.
+
+        Reads the coarsest resolution (raw, per-minute or per-hour) that still
+        provides at least `num_points` buckets for the requested period. Bins
+        are aligned to multiples of their length, so consecutive views only
+        differ in their newest point (or by appending a new one).
+        """
+        if self.raw.count == 0:
+            return rollup_view(np.zeros(0, dtype=ROLLUP_DTYPE))
+        start, end = self.raw.time_range()
+        if duration is not None:
+            start = end - duration
+        seconds = max(-(-(end - start + 1) // num_points), 1)
+        ring = self.raw
+        for name, (bucket, _) in reversed(ROLLUPS.items()):
+            if bucket <= seconds:
+                seconds = -(-seconds // bucket) * bucket
+                ring = self.rollups[name]
+                break
+        start = (end // seconds - num_points + 1) * seconds
+        samples = ring.between(start, end)
+        if ring is self.raw:
+            samples = raw_to_rollup(samples)
+        return rollup_view(resample(samples, seconds))
 
     def load(self):
-        """Creates a hidden file storing usage time series data."""
-        try:
-            data = np.load(self.fname)
-            self.mem_util = data[:, 0].astype(float).tolist()
-            self.cpu_util = data[:, 1].astype(float).tolist()
-            self.times_date = data[:, 2].tolist()
-            self.times_hour = data[:, 3].tolist()
-        except Exception:
-            # Start storing utilisation history
-            self.mem_util = []
-            self.cpu_util = []
-            self.times_date = []
-            self.times_hour = []
+        """Open (or create) the hidden files storing usage time series data."""
+        self.raw = RingBuffer(self.fname, TRACKER_DTYPE, self.limit, legacy_samples)
+        base, ext = os.path.splitext(self.fname)
+        self.rollups = {}
+        for name, (seconds, limit) in ROLLUPS.items():
+            # Missing rollups are computed once from the raw history
+            self.rollups[name] = RingBuffer(
+                f"{base}_{name}{ext}",
+                ROLLUP_DTYPE,
+                limit,
+                lambda _, s=seconds: resample(raw_to_rollup(self.samples()), s),
+            )
+
+    def query(
+        self,
+        start: Union[int, datetime, None] = None,
+        end: Union[int, datetime, None] = None,
+        resolution: str = "raw",
+    ) -> dict:
+        """Utilisation time series between `start` & `end` (epoch seconds or
+        datetimes, default: all) as NumPy arrays.
+
+        `resolution` selects the raw samples or the "minute"/"hour" rollups
+        (mean utilisation with additional min/max series).
+        """
+        start = 0 if start is None else to_epoch(start)
+        end = np.iinfo(np.int64).max if end is None else to_epoch(end)
+        if resolution == "raw":
+            return rollup_view(raw_to_rollup(self.raw.between(start, end)))
+        return rollup_view(self.rollups[resolution].between(start, end))
+
+    def percentiles(
+        self,
+        q=(50, 90, 99),
+        var: str = "cpu",
+        start: Union[int, datetime, None] = None,
+        end: Union[int, datetime, None] = None,
+        resolution: str = "raw",
+    ) -> np.ndarray:
+        """Percentiles of the relative utilisation within a time range."""
+        values = self.query(start, end, resolution)[f"rel_{var}_util"]
+        if len(values) == 0:
+            return np.full(np.shape(q), np.nan)
+        return np.percentile(values, q)
+
+    def moving_average(
+        self,
+        window: int,
+        var: str = "cpu",
+        start: Union[int, datetime, None] = None,
+        end: Union[int, datetime, None] = None,
+        resolution: str = "raw",
+    ) -> dict:
+        """Moving average over `window` samples - timestamped by window end."""
+        data = self.query(start, end, resolution)
+        return {
+            "time": data["time"][window - 1 :],
+            f"rel_{var}_util": moving_average(data[f"rel_{var}_util"], window),
+        }
+
+    def peaks(
+        self,
+        threshold: float = 0.0,
+        var: str = "cpu",
+        start: Union[int, datetime, None] = None,
+        end: Union[int, datetime, None] = None,
+        resolution: str = "raw",
+    ) -> dict:
+        """Local maxima of the relative utilisation above `threshold`."""
+        data = self.query(start, end, resolution)
+        idx = find_peaks(data[f"rel_{var}_util"], threshold)
+        return {"time": data["time"][idx], f"rel_{var}_util": data[f"rel_{var}_util"][idx]}
 
     def save(self):
-        """Save recent usage time series data."""
-        stacked = np.stack(
-            [self.mem_util, self.cpu_util, self.times_date, self.times_hour], axis=1
+        """Flush the recently written slots to disk."""
+        self.raw.flush()
+        for rollup in self.rollups.values():
+            rollup.flush()
+
+
+def update_rollup(rollup: RingBuffer, bucket: int, mem_util: float, cpu_util: float):
+    """Incrementally add a sample to the newest (or a new) rollup bucket."""
+    last = rollup.last()
+    if last is None or last["time"] != bucket:
+        rollup.append((bucket, 1, mem_util, mem_util, mem_util) + (cpu_util,) * 3)
+        return
+    count = int(last["count"]) + 1
+    rollup.replace_last(
+        (
+            bucket,
+            count,
+            min(last["mem_min"], mem_util),
+            last["mem_mean"] + (mem_util - last["mem_mean"]) / count,
+            max(last["mem_max"], mem_util),
+            min(last["cpu_min"], cpu_util),
+            last["cpu_mean"] + (cpu_util - last["cpu_mean"]) / count,
+            max(last["cpu_max"], cpu_util),
         )
-        np.save(self.fname, stacked)
+    )
+
+
+def raw_to_rollup(samples: np.ndarray) -> np.ndarray:
+    """Represent raw samples as rollup buckets holding a single sample."""
+    rollup = np.zeros(len(samples), dtype=ROLLUP_DTYPE)
+    rollup["time"], rollup["count"] = samples["time"], 1
+    for var in ["mem", "cpu"]:
+        for stat in ["min", "mean", "max"]:
+            rollup[f"{var}_{stat}"] = samples[f"{var}_util"]
+    return rollup
+
+
+def aggregate(samples: np.ndarray, starts: np.ndarray) -> np.ndarray:
+    """Merge consecutive rollup buckets - groups begin at indices `starts`."""
+    merged = np.zeros(len(starts), dtype=ROLLUP_DTYPE)
+    if len(starts) == 0:
+        return merged
+    merged["time"] = samples["time"][starts]
+    merged["count"] = np.add.reduceat(samples["count"], starts)
+    for var in ["mem", "cpu"]:
+        merged[f"{var}_min"] = np.minimum.reduceat(samples[f"{var}_min"], starts)
+        merged[f"{var}_max"] = np.maximum.reduceat(samples[f"{var}_max"], starts)
+        total = np.add.reduceat(samples[f"{var}_mean"] * samples["count"], starts)
+        merged[f"{var}_mean"] = total / merged["count"]
+    return merged
+
+
+def resample(samples: np.ndarray, seconds: int) -> np.ndarray:
+    """Aggregate chronological rollup buckets into buckets of `seconds`."""
+    buckets = samples["time"] - samples["time"] % seconds
+    starts = np.flatnonzero(np.diff(buckets, prepend=-1) != 0)
+    merged = aggregate(samples, starts)
+    merged["time"] = buckets[starts]
+    return merged
+
+
+def rollup_view(samples: np.ndarray) -> dict:
+    """Time series dict of (mean) relative utilisation & its min/max."""
+    return {
+        "time": samples["time"],
+        "rel_mem_util": samples["mem_mean"],
+        "rel_mem_util_min": samples["mem_min"],
+        "rel_mem_util_max": samples["mem_max"],
+        "rel_cpu_util": samples["cpu_mean"],
+        "rel_cpu_util_min": samples["cpu_min"],
+        "rel_cpu_util_max": samples["cpu_max"],
+    }
+
+
+def moving_average(values: np.ndarray, window: int) -> np.ndarray:
+    """Mean of each `window` consecutive values (cumulative sum trick)."""
+    if len(values) < window:
+        return np.zeros(0)
+    cumsum = np.cumsum(np.asarray(values, dtype=np.float64))
+    cumsum[window:] = cumsum[window:] - cumsum[:-window]
+    return cumsum[window - 1 :] / window
+
+
+def find_peaks(values: np.ndarray, threshold: float = 0.0) -> np.ndarray:
+    """Indices of local maxima above `threshold` - plateaus count once."""
+    values = np.asarray(values)
+    # Collapse repeated values so that plateaus become single points
+    keep = np.flatnonzero(np.diff(values, prepend=np.nan) != 0)
+    unique = values[keep]
+    is_peak = (unique[1:-1] > unique[:-2]) & (unique[1:-1] > unique[2:])
+    idx = keep[np.flatnonzero(is_peak) + 1]
+    return idx[values[idx] > threshold]
+
+
+def to_epoch(time_t: Union[int, datetime]) -> int:
+    """Convert datetimes to epoch seconds."""
+    if isinstance(time_t, datetime):
+        return int(time_t.timestamp())
+    return int(time_t)
+
+
+def sample_time(util_data: dict) -> int:
+    """Epoch timestamp of a resource utilisation sample.
+
+    Local time strings (e.g. of old tracker files) are only parsed if the
+    sample has no epoch `time` - they are ambiguous when DST ends.
+    """
+    if "time" in util_data:
+        return int(util_data["time"])
+    time_t = datetime.strptime(
+        util_data["time_date"] + " " + util_data["time_hour"], "%m/%d/%y %H:%M:%S"
+    )
+    return int(time_t.timestamp())
+
+
+def legacy_samples(buffer) -> np.ndarray:
+    """Chronological samples of a previous (v0.0.2) tracker file (if any)."""
+    if buffer is None:
+        return np.zeros(0, dtype=TRACKER_DTYPE)
+    # v0.0.2 stored [mem_util, cpu_util, date, hour] rows as strings
+    try:
+        samples = np.zeros(len(buffer), dtype=TRACKER_DTYPE)
+        samples["mem_util"] = buffer[:, 0].astype(float)
+        samples["cpu_util"] = buffer[:, 1].astype(float)
+        samples["time"] = [
+            sample_time({"time_date": d, "time_hour": h}) for d, h in buffer[:, 2:]
+        ]
+        # Local times repeat when DST ends - keep timestamps non-decreasing
+        samples["time"] = np.maximum.accumulate(samples["time"])
+        return samples
+    except Exception:
+        return np.zeros(0, dtype=TRACKER_DTYPE)
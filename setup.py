@@ -69,6 +69,12 @@ setup(
                 CURRENT_DIR, "requirements", "requirements-examples.txt"
             )
         ),
-        "full": ["psutil", "gputil", "google-cloud-storage", "GitPython"],
+        "full": [
+            "psutil",
+            "nvidia-ml-py",
+            "gputil",
+            "google-cloud-storage",
+            "GitPython",
+        ],
     },
 )
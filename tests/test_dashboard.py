@@ -1,4 +1,11 @@
+import os
+import time
+import threading
+import numpy as np
+from datetime import datetime
 from mle_monitor import MLEProtocol, MLEResource, MLEDashboard
+from mle_monitor.utils import Tracker
+from mle_monitor.dashboard import Collector, layout_dashboard, update_dashboard
 
 
 def test_dashboard():
@@ -7,3 +14,226 @@ def test_dashboard():
     protocol = MLEProtocol(protocol_fname="mle_protocol.db")
     dashboard = MLEDashboard(protocol, resource)
     dashboard.snapshot()
+
+
+def util_sample(t: int, cpu: float):
+    time_t = datetime.fromtimestamp(t)
+    return {
+        "time": t,
+        "time_date": time_t.strftime("%m/%d/%y"),
+        "time_hour": time_t.strftime("%H:%M:%S"),
+        "mem_util": 1,
+        "mem": 4,
+        "cores_util": cpu,
+        "cores": 1,
+    }
+
+
+def test_tracker_ring_buffer(tmp_path):
+    # Ring buffer keeps the last `limit` samples in a constant size file
+    fname = str(tmp_path / "tracker.npy")
+    tracker = Tracker(fname, limit=5)
+    file_size = os.path.getsize(fname)
+    start = 1640995200
+    for i in range(8):
+        tracker.update(util_sample(start + i, i / 10))
+    hist = tracker.history()
+    assert os.path.getsize(fname) == file_size
+    assert hist["time"].tolist() == list(range(start + 3, start + 8))
+    assert np.allclose(hist["rel_cpu_util"], [0.3, 0.4, 0.5, 0.6, 0.7])
+    assert np.allclose(hist["rel_mem_util"], 0.25)
+    # Reload continues writing after the newest sample
+    tracker = Tracker(fname, limit=5)
+    tracker.update(util_sample(start + 8, 0.8))
+    hist = tracker.history()
+    assert hist["time"].tolist() == list(range(start + 4, start + 9))
+
+
+def test_tracker_legacy_file(tmp_path):
+    # String array history of previous versions is converted on load
+    fname = str(tmp_path / "tracker.npy")
+    legacy = [
+        [0.5, 0.1, "01/01/22", "12:00:00"],
+        [0.5, 0.2, "01/01/22", "12:00:01"],
+    ]
+    np.save(fname, np.array(legacy))
+    tracker = Tracker(fname, limit=5)
+    hist = tracker.history()
+    assert np.allclose(hist["rel_cpu_util"], [0.1, 0.2])
+    assert hist["time"][1] - hist["time"][0] == 1
+
+
+def test_tracker_clock_change(tmp_path):
+    # Clock set back - samples stay ordered for range queries & reloads
+    fname = str(tmp_path / "tracker.npy")
+    tracker = Tracker(fname, limit=5)
+    start = 1640995200
+    for t in [start, start + 1, start + 2, start - 3600, start + 3]:
+        tracker.update(util_sample(t, 0.5))
+    hist = tracker.history()
+    assert (hist["time"] - start).tolist() == [0, 1, 2, 2, 3]
+    assert len(tracker.query(start + 2, start + 3)["time"]) == 3
+    # Ring wrapped after the backwards step - newest slot is recovered
+    tracker.update(util_sample(start + 1, 0.5))
+    tracker = Tracker(fname, limit=5)
+    tracker.update(util_sample(start + 4, 0.5))
+    hist = tracker.history()
+    assert (hist["time"] - start).tolist() == [2, 2, 3, 3, 4]
+
+
+def test_tracker_rollups(tmp_path):
+    # Minute & hour rollups are updated incrementally and survive reloads
+    fname = str(tmp_path / "tracker.npy")
+    tracker = Tracker(fname, limit=100)
+    start = 1640995200
+    for i in range(0, 7200, 10):
+        tracker.update(util_sample(start + i, (i % 60) / 100), save=False)
+    tracker.save()
+    tracker = Tracker(fname, limit=100)
+    minute = tracker.rollups["minute"].samples()
+    hour = tracker.rollups["hour"].samples()
+    assert len(minute) == 120 and len(hour) == 2
+    assert np.all(minute["count"] == 6) and np.all(hour["count"] == 360)
+    assert np.allclose(hour["cpu_min"], 0) and np.allclose(hour["cpu_max"], 0.5)
+    assert np.allclose(hour["cpu_mean"], 0.25)
+    # Raw history covers 1000s - view covering 2h is served from the rollups
+    view = tracker.view(num_points=42, duration=7200)
+    assert len(view["time"]) <= 42
+    assert np.allclose(view["rel_cpu_util"], 0.25)
+    assert np.allclose(view["rel_cpu_util_max"], 0.5)
+    assert np.allclose(view["rel_mem_util"], 0.25)
+    view = tracker.view(num_points=42)
+    assert len(view["time"]) <= 42 and np.all(view["time"] % 24 == 0)
+    assert view["time"][0] >= start + 6200 - 24
+    # Aligned bins - a new sample only changes the newest point (and the
+    # oldest one, whose first raw sample was overwritten in the ring buffer)
+    tracker.update(util_sample(start + 7191, 0.9), save=False)
+    new_view = tracker.view(num_points=42)
+    assert np.array_equal(new_view["time"], view["time"])
+    assert np.array_equal(new_view["rel_cpu_util"][1:-1], view["rel_cpu_util"][1:-1])
+    assert new_view["rel_cpu_util"][-1] != view["rel_cpu_util"][-1]
+    # Rollups are recomputed from the raw history if missing
+    os.remove(str(tmp_path / "tracker_minute.npy"))
+    tracker = Tracker(fname, limit=100)
+    assert len(tracker.rollups["minute"].samples()) == 17
+
+
+def test_tracker_query(tmp_path):
+    # Time range queries & statistics operate on wrapped ring buffer slices
+    tracker = Tracker(str(tmp_path / "tracker.npy"), limit=50)
+    start = 1640995200
+    cpu = [0.1, 0.5, 0.2, 0.2, 0.9, 0.9, 0.3] * 10
+    for i, c in enumerate(cpu):
+        tracker.update(util_sample(start + i, c), save=False)
+    data = tracker.query(start + 30, start + 39)
+    assert data["time"].tolist() == list(range(start + 30, start + 40))
+    assert np.allclose(data["rel_cpu_util"], cpu[30:40])
+    data = tracker.query(datetime.fromtimestamp(start + 60))
+    assert data["time"].tolist() == list(range(start + 60, start + 70))
+    assert len(tracker.query(end=start + 10)["time"]) == 0
+    assert len(tracker.query(resolution="minute")["time"]) == 2
+    percentiles = tracker.percentiles([0, 50, 100], start=start + 20)
+    assert np.allclose(percentiles, np.percentile(cpu[20:], [0, 50, 100]))
+    ma = tracker.moving_average(7, start=start + 20)
+    assert len(ma["time"]) == 44 and ma["time"][0] == start + 26
+    assert np.allclose(ma["rel_cpu_util"], np.mean(cpu[:7]))
+    peaks = tracker.peaks(threshold=0.6, start=start + 20)
+    assert peaks["time"].tolist() == [start + i for i in range(20, 70) if i % 7 == 4]
+    assert np.allclose(peaks["rel_cpu_util"], 0.9)
+
+
+def test_collector():
+    # Background collector publishes latest snapshot & survives exceptions
+    calls, new_data = [], threading.Event()
+
+    def collect():
+        calls.append(len(calls))
+        if len(calls) == 2:
+            raise ValueError("Scheduler not reachable")
+        return None if len(calls) == 3 else len(calls)
+
+    collector = Collector("test", collect, 0.01, new_data).start()
+    assert collector.wait_ready(timeout=5) and new_data.wait(timeout=5)
+    while len(calls) < 5:
+        time.sleep(0.01)
+    collector.stop(timeout=5)
+    assert not collector.thread.is_alive()
+    # Failed & empty collections do not publish a new snapshot
+    version, data = collector.latest()
+    assert version == len(calls) - 2 and data == len(calls)
+
+
+def test_status_panel():
+    # Placeholder lists sources without data & the error of failing ones
+    from rich.console import Console
+    from mle_monitor.dashboard.update import make_status_panel
+
+    def fail():
+        raise RuntimeError("squeue: [error] slurmctld down")
+
+    collectors = {
+        "resource": Collector("resource", fail, 0.01).start(),
+        "protocol": Collector("protocol", lambda: 1, 0.01).start(),
+    }
+    assert not collectors["resource"].wait_ready(timeout=0.1)
+    assert collectors["protocol"].wait_ready(timeout=5)
+    console = Console(width=100, record=True)
+    console.print(make_status_panel(collectors))
+    text = console.export_text()
+    assert "RuntimeError: squeue: [error] slurmctld down" in text
+    assert "ready" in text
+    for collector in collectors.values():
+        collector.stop(timeout=5)
+
+
+def test_dashboard_fingerprints(tmp_path):
+    # Panels are only regenerated if the content of their input data changed
+    resource = MLEResource(resource_name="local")
+    protocol = MLEProtocol(str(tmp_path / "mle_protocol.db"))
+    tracker = Tracker(str(tmp_path / "tracker.npy"))
+    resource_data, protocol_data = resource.monitor(), protocol.monitor()
+    tracker.update(resource_data["util_data"])
+    usage_data = tracker.view()
+    layout = layout_dashboard(resource, False, protocol.protocol_fname)
+    fingerprints = {}
+    update_dashboard(layout, resource_data, protocol_data, usage_data, fingerprints)
+    panels = {name: layout[name].renderable for name in fingerprints}
+    assert len(panels) == 8
+    protocol_data = protocol.monitor()
+    usage_data["rel_cpu_util"] = usage_data["rel_cpu_util"] + 0.1
+    update_dashboard(layout, resource_data, protocol_data, usage_data, fingerprints)
+    changed = [n for n, p in panels.items() if layout[n].renderable is not p]
+    assert changed == ["bottom-right-1"]
+
+
+def test_collector_backoff():
+    # Unchanged data is not republished & the interval backs off to its max
+    calls = []
+
+    def collect():
+        calls.append(time.time())
+        return {"queue": [1, 2, 3]}
+
+    collector = Collector("test", collect, 0.01, max_interval=0.08).start()
+    while len(calls) < 6:
+        time.sleep(0.01)
+    collector.stop(timeout=5)
+    assert collector.latest() == (1, {"queue": [1, 2, 3]})
+    assert collector.wait_time == 0.08
+    assert calls[-1] - calls[-2] >= 0.07
+    assert 0 <= collector.duty_cycle < 1
+
+
+def test_chart_cache():
+    # Rendered charts are reused for identical series
+    from mle_monitor.dashboard.components import make_util_plot
+
+    util_hist = {
+        "time": np.arange(1640995200, 1640995200 + 600, 60),
+        "rel_cpu_util": np.linspace(0, 1, 10, dtype=np.float32),
+        "rel_mem_util": np.full(10, 0.5, dtype=np.float32),
+    }
+    chart = make_util_plot(util_hist)
+    assert make_util_plot({k: v.copy() for k, v in util_hist.items()}) is chart
+    util_hist["rel_cpu_util"][-1] = 0.2
+    assert make_util_plot(util_hist) is not chart
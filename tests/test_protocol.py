@@ -1,3 +1,7 @@
+import os
+import shutil
+import multiprocessing
+import pytest
 from mle_monitor import MLEProtocol
 
 meta_data = {
@@ -54,6 +58,13 @@ def test_update_delete_abort_protocol():
     # Abort the experiment - changes status
     protocol.abort(e_id, save=False)
     assert protocol.status(e_id) == "aborted"
+    # Delete the experiment - totals can still be recounted
+    num_experiments = len(protocol)
+    protocol.delete(e_id, save=False)
+    assert str(e_id) not in protocol.experiment_ids
+    assert len(protocol) == num_experiments - 1
+    totals = protocol.rebuild_totals(save=False)
+    assert totals["total"] == num_experiments - 1
     return
 
 
@@ -93,3 +104,310 @@ def test_monitor_protocol():
     for k in time_keys:
         assert k in data["time_data"].keys()
     return
+
+
+@pytest.mark.parametrize("storage", ["pickledb", "sqlite"])
+def test_summary_columns_protocol(tmp_path, storage):
+    # Summary of selected columns only - identical to full summary subset
+    protocol = MLEProtocol(str(tmp_path / "mle_protocol.db"), storage=storage)
+    for _ in range(3):
+        protocol.add(meta_data, save=False)
+    full_df = protocol.summary(tail=2, verbose=False)
+    assert list(full_df["ID"]) == ["2", "3"]
+    assert full_df["Purpose"].iloc[-1] == meta_data["purpose"]
+    df = protocol.summary(tail=None, verbose=False, columns=["Status", "Seeds"])
+    assert list(df.columns) == ["ID", "Status", "Seeds"]
+    assert df.shape[0] == 3
+    assert df.tail(2).reset_index(drop=True).equals(
+        full_df[["ID", "Status", "Seeds"]]
+    )
+
+    # Printed & dashboard tables show unselected columns as "-"
+    df = protocol.summary(columns=["Status"])
+    assert list(df.columns) == ["ID", "Status"]
+    table = protocol.summary(columns=["Status", "Jobs"], return_table=True, full=True)
+    assert table.row_count == 3
+    assert table.columns[-1]._cells[0] == "-"
+
+    if storage == "sqlite":
+        # Ids match the queried rows also if another writer added experiments
+        other_protocol = MLEProtocol(protocol.protocol_fname, storage=storage)
+        other_protocol.add(dict(meta_data, purpose="Other writer"))
+        df = protocol.summary(tail=2, verbose=False, columns=["Purpose"])
+        assert list(df["ID"]) == ["3", "4"]
+        assert list(df["Purpose"]) == [meta_data["purpose"], "Other writer"]
+    return
+
+
+def test_journal_protocol(tmp_path):
+    # Load existing pickledb protocol with journal storage & append changes
+    protocol_fname = str(tmp_path / "mle_protocol.db")
+    shutil.copy("tests/fixtures/mle_protocol_test.db", protocol_fname)
+    protocol = MLEProtocol(protocol_fname=protocol_fname, storage="journal")
+    num_experiments = len(protocol)
+    e_id = protocol.add(meta_data)
+    protocol.update(e_id, "completed_jobs", 3)
+    assert os.path.exists(protocol_fname + ".journal")
+
+    # Reload - journal is replayed on top of the pickledb snapshot
+    protocol = MLEProtocol(protocol_fname=protocol_fname, storage="journal")
+    assert len(protocol) == num_experiments + 1
+    assert protocol.get(e_id, "completed_jobs") == 3
+
+    # Compaction folds journal into a plain pickledb file
+    protocol.db.compact()
+    assert not os.path.exists(protocol_fname + ".journal")
+    protocol = MLEProtocol(protocol_fname=protocol_fname)
+    assert protocol.get(e_id, "completed_jobs") == 3
+
+    # Compacting a saved pickledb protocol doesn't rewrite the file again
+    state = protocol.db.state
+    protocol.db.compact()
+    assert protocol.db.state == state
+    return
+
+
+def test_sqlite_protocol(tmp_path):
+    # Migrate existing pickledb protocol to SQLite in place
+    protocol_fname = str(tmp_path / "mle_protocol.db")
+    shutil.copy("tests/fixtures/mle_protocol_test.db", protocol_fname)
+    old_protocol = MLEProtocol(protocol_fname=protocol_fname)
+    protocol = MLEProtocol(protocol_fname=protocol_fname, storage="sqlite")
+    assert os.path.exists(protocol_fname + ".pickledb.bak")
+    assert protocol.experiment_ids == old_protocol.experiment_ids
+    assert protocol.get() == old_protocol.get()
+
+    # Add, update & abort - indexed counts and summary agree with pickledb
+    protocol = MLEProtocol(str(tmp_path / "sqlite.db"), storage="sqlite")
+    old_protocol = MLEProtocol(str(tmp_path / "pickle.db"))
+    for p in [protocol, old_protocol]:
+        p.add(meta_data)
+        e_id = p.add(meta_data)
+        p.update(e_id, "exec_resource", "slurm-cluster")
+        p.increment(e_id, "completed_jobs", 2)
+        p.abort(e_id)
+    assert protocol.monitor()["total_data"] == old_protocol.monitor()["total_data"]
+    assert protocol.summary(verbose=False).equals(
+        old_protocol.summary(verbose=False)
+    )
+
+    # Reload - data is committed to the SQLite file
+    protocol = MLEProtocol(str(tmp_path / "sqlite.db"), storage="sqlite")
+    assert protocol.status(e_id) == "aborted"
+
+    # Unsaved changes don't hold the write lock - only transactions do
+    protocol.update(e_id, "job_status", "running", save=False)
+    assert not protocol.db.conn.in_transaction
+    try:
+        with protocol.transaction():
+            protocol.update(e_id, "job_status", "completed", save=False)
+            assert protocol.db.conn.in_transaction
+            raise ValueError
+    except ValueError:
+        pass
+    assert not protocol.db.conn.in_transaction
+    protocol = MLEProtocol(str(tmp_path / "sqlite.db"), storage="sqlite")
+    assert protocol.status(e_id) == "running"
+    return
+
+
+def add_experiments_worker(protocol_fname: str, storage: str):
+    protocol = MLEProtocol(protocol_fname, storage=storage, multi_writer=True)
+    for _ in range(3):
+        e_id = protocol.add(dict(meta_data))
+        protocol.update(e_id, "completed_jobs", 1)
+
+
+@pytest.mark.parametrize("storage", ["pickledb", "journal", "sqlite"])
+def test_multi_writer_protocol(tmp_path, storage):
+    # Concurrent writers must neither clobber each other nor reuse ids
+    protocol_fname = str(tmp_path / "mle_protocol.db")
+    ctx = multiprocessing.get_context("fork")
+    workers = [
+        ctx.Process(target=add_experiments_worker, args=(protocol_fname, storage))
+        for _ in range(4)
+    ]
+    for w in workers:
+        w.start()
+    for w in workers:
+        w.join()
+    protocol = MLEProtocol(protocol_fname, storage=storage)
+    assert len(protocol) == 12
+    assert protocol.experiment_ids == [str(i) for i in range(1, 13)]
+    for e_id in protocol.experiment_ids:
+        assert protocol.get(e_id, "completed_jobs") == 1
+    assert protocol.get("summary")["total_exp"]["all"][-1] == 12
+    assert protocol.get("summary")["totals"]["total"] == 12
+    return
+
+
+@pytest.mark.parametrize("storage", ["pickledb", "journal", "sqlite"])
+def test_increment_protocol(tmp_path, storage):
+    # Increments from two independent instances are both applied
+    protocol_fname = str(tmp_path / "mle_protocol.db")
+    protocol = MLEProtocol(protocol_fname, storage=storage)
+    e_id = protocol.add(meta_data)
+    other_protocol = MLEProtocol(protocol_fname, storage=storage)
+    protocol.increment(e_id, "completed_jobs", 2)
+    other_protocol.increment(e_id, "completed_jobs", 3)
+    protocol.update_progress_bar(e_id)
+    assert protocol.completed_jobs_counter == 0
+    protocol.update_progress_bar()
+    assert protocol.completed_jobs_counter == 1
+
+    # Unsaved increments are coalesced into a single write
+    for _ in range(5):
+        other_protocol.increment(e_id, "completed_jobs", save=False)
+    if storage != "sqlite":
+        assert len(other_protocol.db.pending) == 1
+    other_protocol.save()
+    protocol = MLEProtocol(protocol_fname, storage=storage)
+    assert protocol.get(e_id, "completed_jobs") == 12
+    return
+
+
+def test_transaction_protocol(tmp_path):
+    # All updates within a transaction are written with a single dump
+    protocol_fname = str(tmp_path / "mle_protocol.db")
+    protocol = MLEProtocol(protocol_fname, storage="journal")
+    num_dumps = []
+    dump = protocol.db.dump
+    protocol.db.dump = lambda: num_dumps.append(1) or dump()
+    with protocol.transaction():
+        e_ids = [protocol.add(meta_data) for _ in range(5)]
+        for e_id in e_ids:
+            protocol.update(e_id, "job_status", "completed")
+        protocol.abort(e_ids[0])
+    assert len(num_dumps) == 1
+    protocol = MLEProtocol(protocol_fname, storage="journal")
+    assert len(protocol) == 5
+    assert protocol.status(e_ids[0]) == "aborted"
+    assert protocol.status(e_ids[-1]) == "completed"
+
+    # Failing transaction is rolled back
+    try:
+        with protocol.batch():
+            protocol.update(e_ids[-1], "job_status", "running")
+            protocol.add(meta_data)
+            raise ValueError
+    except ValueError:
+        pass
+    assert len(protocol) == 5
+    assert protocol.status(e_ids[-1]) == "completed"
+    return
+
+
+@pytest.mark.parametrize("storage", ["pickledb", "journal", "sqlite"])
+def test_incremental_load_protocol(tmp_path, storage):
+    # Reloading an unchanged protocol is skipped, changes are picked up
+    protocol_fname = str(tmp_path / "mle_protocol.db")
+    protocol = MLEProtocol(protocol_fname, storage=storage)
+    e_id = protocol.add(meta_data)
+    dashboard_protocol = MLEProtocol(protocol_fname, storage=storage)
+    db = dashboard_protocol.db
+    assert not db.refresh()
+    protocol.update(e_id, "completed_jobs", 4)
+    protocol.add(meta_data)
+    num_full_loads = []
+    if storage == "journal":
+        # Only the new tail of the journal is read
+        db.load = lambda *args: num_full_loads.append(1)
+    dashboard_protocol.load(pull_gcs=False)
+    assert dashboard_protocol.db is db
+    assert len(num_full_loads) == 0
+    assert dashboard_protocol.get(e_id, "completed_jobs") == 4
+    assert len(dashboard_protocol) == 2
+    assert not db.refresh()
+
+    if storage == "journal":
+        # Merging unsaved changes only replays the new journal tail
+        dashboard_protocol.increment(e_id, "completed_jobs", 2, save=False)
+        protocol.increment(e_id, "completed_jobs", 1)
+        protocol.add(meta_data)
+        dashboard_protocol.merge()
+        assert len(num_full_loads) == 0
+        assert dashboard_protocol.get(e_id, "completed_jobs") == 7
+        assert len(dashboard_protocol) == 3
+        dashboard_protocol.save()
+        protocol = MLEProtocol(protocol_fname, storage=storage)
+        assert protocol.get(e_id, "completed_jobs") == 7
+    return
+
+
+@pytest.mark.parametrize("storage", ["pickledb", "sqlite"])
+def test_totals_protocol(tmp_path, storage):
+    # Legacy protocol without totals - rebuilt on first add
+    protocol_fname = str(tmp_path / "mle_protocol.db")
+    shutil.copy("tests/fixtures/mle_protocol_test.db", protocol_fname)
+    protocol = MLEProtocol(protocol_fname, storage=storage)
+    assert not protocol.get("summary")
+    e_ids = [protocol.add(meta_data) for _ in range(4)]
+    protocol.update(e_ids[0], "exec_resource", "slurm-cluster")
+    protocol.abort(e_ids[1])
+    protocol.complete(e_ids[2], report=True)
+    protocol.update(e_ids[3], ["retrieved_results"], [True])
+    protocol.delete(e_ids[3])
+    # Older versions only skip the `summary` entry when listing experiments
+    assert all(k.isdigit() for k in protocol.db.getall() if k != "summary")
+
+    # Maintained totals agree with counting from scratch
+    protocol = MLEProtocol(protocol_fname, storage=storage)
+    totals = protocol.get("summary")["totals"]
+    assert totals == protocol.rebuild_totals(save=False)
+    assert totals["total"] == 5
+    assert totals["run"] == 2 and totals["done"] == 1 and totals["aborted"] == 2
+    assert totals["slurm"] == 2 and totals["local"] == 3
+    assert totals["report_gen"] == 1 and totals["retrieved"] == 0
+
+    # Replaced values are read after merging other writers' changes
+    protocol = MLEProtocol(protocol_fname, storage=storage, multi_writer=True)
+    other_protocol = MLEProtocol(protocol_fname, storage=storage, multi_writer=True)
+    other_protocol.update(e_ids[0], "job_status", "completed")
+    protocol.abort(e_ids[0])
+    totals = MLEProtocol(protocol_fname, storage=storage).get("summary")["totals"]
+    assert totals["run"] == 1 and totals["done"] == 1 and totals["aborted"] == 3
+
+    # Updates of other variables don't merge (reload) the protocol
+    num_merges = []
+    protocol.merge = lambda: num_merges.append(1)
+    protocol.update(e_ids[0], "completed_jobs", 2)
+    assert len(num_merges) == 0
+    protocol = MLEProtocol(protocol_fname, storage=storage)
+    assert protocol.get(e_ids[0], "completed_jobs") == 2
+    return
+
+
+@pytest.mark.parametrize("storage", ["pickledb", "sqlite"])
+def test_running_experiments_protocol(tmp_path, storage):
+    # Running experiments - tracked on changes & rebuilt after reloads
+    protocol_fname = str(tmp_path / "mle_protocol.db")
+    protocol = MLEProtocol(protocol_fname, storage=storage)
+    e_ids = [protocol.add(meta_data) for _ in range(4)]
+    assert list(protocol.running_experiments()) == ["1", "2", "3", "4"]
+    protocol.abort(e_ids[0])
+    protocol.complete(e_ids[1])
+    protocol.delete(e_ids[2])
+    running = protocol.running_experiments()
+    assert running == {"4": {"base_fname": "main.py", "experiment_dir": "log_dir"}}
+    other_protocol = MLEProtocol(protocol_fname, storage=storage)
+    other_protocol.update(e_ids[0], "job_status", "running")
+    protocol.load()
+    assert list(protocol.running_experiments()) == ["1", "4"]
+    return
+
+
+def test_table_row_cache_protocol(tmp_path):
+    # Unchanged rows reuse their rendered cells - updated rows are re-rendered
+    protocol = MLEProtocol(str(tmp_path / "mle_protocol.db"))
+    e_ids = [protocol.add(meta_data, save=False) for _ in range(3)]
+    table = protocol.monitor()["protocol_table"]
+    assert table.row_count == 3
+    assert len(protocol.table_row_cache) == 3
+    protocol.increment(e_ids[0], "completed_jobs", save=False)
+    new_table = protocol.monitor()["protocol_table"]
+    # Rows are ordered newest first & last column holds the progress bars
+    bars, new_bars = table.columns[-1]._cells, new_table.columns[-1]._cells
+    assert new_bars[0] is bars[0] and new_bars[1] is bars[1]
+    assert new_bars[2] is not bars[2]
+    assert len(protocol.table_row_cache) == 3
+    return
@@ -1,4 +1,22 @@
+import os
+import sys
+import json
+import time
+import subprocess
+import pytest
+import numpy as np
+import pandas as pd
+from collections import namedtuple
 from mle_monitor import MLEResource
+from mle_monitor.resource.cpu import busy_percent
+from mle_monitor.resource.gpu import GPUCollector
+from mle_monitor.resource.sge import SGEResource
+from mle_monitor.resource.slurm import JOB_COLUMNS, SlurmResource, in_partitions
+from mle_monitor.resource.queries import ParallelQueries
+from mle_monitor.resource.cache import SnapshotCache
+from mle_monitor.utils.file_lock import FileLock
+from mle_monitor.resource.gcp import GCPResource
+from mle_monitor.resource.processes import ProcessScanner, ResourceAttribution
 
 
 def test_resource():
@@ -10,3 +28,452 @@ def test_resource():
     assert "host_data" in resource_data.keys()
     assert "util_data" in resource_data.keys()
     return
+
+
+def test_local_cpu_sampling():
+    # Repeated monitoring is non-blocking & all panels share one CPU sample
+    resource = MLEResource(resource_name="local")
+    resource.monitor()
+    start_t = time.time()
+    resource_data = resource.monitor()
+    assert time.time() - start_t < 0.5
+    total_cpu = resource_data["user_data"]["total_cpu_util"]
+    assert np.isclose(resource_data["util_data"]["cores_util"] * 100, total_cpu)
+    assert np.isclose(sum(resource_data["host_data"]["percent_util"]), total_cpu, atol=1)
+
+
+def test_busy_percent():
+    # CPU utilisation from deltas of two cpu_times snapshots
+    cpu_times = namedtuple("scputimes", ["user", "system", "idle", "iowait"])
+    t0, t1 = cpu_times(10, 5, 80, 5), cpu_times(16, 7, 90, 7)
+    assert busy_percent(t0, t1) == 40.0
+    assert np.isnan(busy_percent(t0, t0))
+
+
+def test_process_scanner():
+    # Process objects are kept across scans - CPU% of a busy process is > 0
+    busy = subprocess.Popen([sys.executable, "-c", "while True: pass"])
+    try:
+        scanner = ProcessScanner()
+        scanner.scan()
+        time.sleep(0.3)
+        by_memory, by_cpu = scanner.top_k(3)
+        assert len(by_memory) == 3 and len(by_cpu) == 3
+        assert by_memory[0]["vms"] >= by_memory[-1]["vms"]
+        assert scanner.infos[busy.pid]["cpu_percent"] > 0
+        assert busy.pid in [p["pid"] for p in by_cpu]
+        # Reused PID (new create time) - static attributes are re-read
+        scanner.infos[busy.pid].update(create_time=0.0, username="mallory")
+        scanner.scan()
+        assert scanner.infos[busy.pid]["username"] != "mallory"
+    finally:
+        busy.kill()
+        busy.wait()
+    # Exited processes are dropped from the cache
+    scanner.scan()
+    assert busy.pid not in scanner.processes
+
+
+def test_resource_attribution():
+    # Processes are grouped by user & experiment (dir, script or parent)
+    cpu_times = namedtuple("pcputimes", ["user", "system"])
+
+    def proc(pid, ppid, cmdline, cpu, rss, user="alice"):
+        return {
+            "pid": pid,
+            "ppid": ppid,
+            "cmdline": cmdline,
+            "username": user,
+            "cpu_times": cpu_times(cpu, 0.0),
+            "cpu_percent": 10.0,
+            "rss": rss,
+        }
+
+    experiments = {
+        "1": {"base_fname": "train.py", "experiment_dir": "experiments/mnist"},
+        "2": {"base_fname": "main.py", "experiment_dir": "experiments/cifar"},
+    }
+    attribution = ResourceAttribution()
+    groups = attribution.update(
+        [
+            proc(10, 1, ["python", "train.py", "-exp_dir", "experiments/mnist"], 5, 1),
+            proc(11, 10, ["python", "-c", "worker"], 2, 2),
+            proc(12, 1, ["python", "main.py", "-exp_dir", "experiments/cifar/"], 1, 1),
+            proc(13, 1, ["bash"], 3, 1, user="bob"),
+        ],
+        experiments,
+    )
+    assert groups["experiment"]["1"]["num_procs"] == 2
+    assert groups["experiment"]["1"]["cpu_seconds"] == 7
+    assert groups["experiment"]["2"]["num_procs"] == 1
+    assert groups["user"]["alice"]["num_procs"] == 3
+    assert groups["user"]["bob"]["cpu_seconds"] == 3
+
+    # CPU-seconds accumulate (incl. exited processes), RSS keeps its peak
+    groups = attribution.update(
+        [proc(10, 1, ["python", "train.py"], 8, 0.5)], experiments
+    )
+    assert groups["experiment"]["1"]["cpu_seconds"] == 10
+    assert groups["experiment"]["1"]["rss"] == 0.5
+    assert groups["experiment"]["1"]["peak_rss"] == 3
+    assert "2" not in groups["experiment"]
+
+    # Reused PID (new create time) counts its full CPU time for the new user
+    reused = dict(proc(10, 1, ["bash"], 9, 1, user="carol"), create_time=1.0)
+    groups = attribution.update([reused], experiments)
+    assert groups["user"]["carol"]["cpu_seconds"] == 9
+
+    # Local monitoring reports the attribution of running experiments
+    resource = MLEResource(resource_name="local")
+    unused = {"base_fname": "", "experiment_dir": f"no_proc_{time.time()}"}
+    user_data = resource.monitor({"1": unused})["user_data"]
+    assert user_data["experiment_attribution"] == {}
+    assert len(user_data["user_attribution"]) > 0
+
+
+class FakeNVML(object):
+    """Minimal `pynvml` API with two GPUs - counts device handle lookups."""
+
+    Utilization = namedtuple("Utilization", ["gpu", "memory"])
+    Memory = namedtuple("Memory", ["total", "free", "used"])
+    Process = namedtuple("Process", ["pid", "usedGpuMemory"])
+
+    def __init__(self):
+        self.handle_calls = 0
+
+    def nvmlInit(self):
+        return
+
+    def nvmlShutdown(self):
+        return
+
+    def nvmlDeviceGetCount(self):
+        return 2
+
+    def nvmlDeviceGetHandleByIndex(self, index):
+        self.handle_calls += 1
+        return index
+
+    def nvmlDeviceGetName(self, handle):
+        return b"Tesla V100" if handle == 0 else "A100"
+
+    def nvmlDeviceGetUtilizationRates(self, handle):
+        return self.Utilization(50 * handle, 0)
+
+    def nvmlDeviceGetMemoryInfo(self, handle):
+        gb = 1000 * 1024**2
+        return self.Memory(16 * gb, 12 * gb, 4 * gb)
+
+    def nvmlDeviceGetComputeRunningProcesses(self, handle):
+        return [self.Process(100 + handle, 2 * 1000 * 1024**2)]
+
+    def nvmlDeviceGetGraphicsRunningProcesses(self, handle):
+        raise RuntimeError("Not Supported")
+
+
+def test_gpu_collector():
+    # NVML handles are retrieved once - samples only query usage
+    nvml = FakeNVML()
+    collector = GPUCollector(nvml=nvml)
+    assert collector.backend == "nvml"
+    collector.sample()
+    gpu_data = collector.sample()
+    assert nvml.handle_calls == 2
+    assert gpu_data["gpu_name"] == ["Tesla V100", "A100"]
+    assert gpu_data["gpu_load"] == [0.0, 50.0]
+    assert gpu_data["gpu_mem_util"] == [25.0, 25.0]
+    assert gpu_data["gpu_mem_total"] == [16.0, 16.0]
+    assert gpu_data["gpu_processes"][1] == {"gpu_id": 1, "pid": 101, "gpu_mem": 2.0}
+
+    # Local resource reports the (injected) GPU data
+    resource = MLEResource(resource_name="local")
+    resource.resource.gpu_collector = collector
+    assert resource.monitor()["host_data"]["gpu_mem_used"] == [4.0, 4.0]
+
+    # Without working NVML GPUtil (if installed) is used as fallback
+    class BrokenNVML(FakeNVML):
+        def nvmlInit(self):
+            raise RuntimeError("Driver Not Loaded")
+
+    assert GPUCollector(nvml=BrokenNVML()).backend in ["gputil", None]
+
+
+def slurm_fixture(command, json_commands=("squeue",)):
+    """Recorded `squeue`/`sinfo` output in JSON or (`-o`) text format."""
+    if "--json" in command and command[0] not in json_commands:
+        raise subprocess.CalledProcessError(1, command)
+    ext = "json" if "--json" in command else "txt"
+    with open(f"tests/fixtures/slurm/{command[0]}.{ext}") as f:
+        return f.read()
+
+
+def test_slurm_resource():
+    # Jobs & nodes from `squeue --json` - `sinfo` falls back to text
+    slurm = SlurmResource({"partitions": ["cpu", "gpu"]})
+    slurm.query = slurm_fixture
+    user_data, host_data, util_data, node_data = slurm.monitor()
+    assert slurm.json_support == {"squeue": True, "sinfo": False}
+    # JSON output ignores `-p` - jobs in the `debug` partition are dropped
+    assert "dave" not in user_data["user"]
+    assert user_data["user"] == ["alice", "bob", "carol"]
+    assert user_data["total"] == [4, 3, 1]
+    assert user_data["run"] == [2, 2, 0]
+    assert user_data["wait"] == [2, 1, 0]
+    assert host_data["host_id"] == ["cpu", "gpu"]
+    assert host_data["total"] == [5, 3] and host_data["run"] == [2, 2]
+    assert node_data["host_id"] == ["gpu01", "node01", "node02"]
+    assert node_data["total"] == [2, 2, 1] and node_data["run"] == [2, 1, 1]
+    # Nodes in several partitions are only counted once
+    assert util_data["cores"] == 80 and util_data["cores_util"] == 23.5
+    assert util_data["mem"] == 512 and util_data["mem_util"] == 148
+
+    # Text and JSON output result in the same data
+    slurm.json_support = {"squeue": False, "sinfo": None}
+    slurm.json_retry["squeue"] = time.time() + 60
+    text_data = slurm.monitor()
+    assert text_data[0] == user_data and text_data[3] == node_data
+    slurm.json_support["sinfo"] = None
+    slurm.query = lambda command: slurm_fixture(command, ["squeue", "sinfo"])
+    assert slurm.get_util_data()["mem_util"] == 148
+
+    # Pending jobs listing several partitions are kept if any is monitored
+    job_df = pd.DataFrame(
+        [("dave", "debug,gpu", "PD", ""), ("erin", "debug", "PD", "")],
+        columns=JOB_COLUMNS,
+    )
+    assert in_partitions(job_df, ["gpu"]).user.tolist() == ["dave"]
+
+    # Failed `--json` query (e.g. slurmctld timeout) is retried after a while
+    slurm = SlurmResource({"partitions": ["cpu", "gpu"]})
+    slurm.query = lambda command: slurm_fixture(command, [])
+    assert len(slurm.get_jobs()) == 8
+    assert slurm.json_support["squeue"] is False
+    slurm.query = slurm_fixture
+    slurm.get_jobs()
+    assert slurm.json_support["squeue"] is False
+    slurm.json_retry["squeue"] = time.time()
+    assert len(slurm.get_jobs()) == 8
+    assert slurm.json_support["squeue"] is True
+
+
+def test_sge_resource():
+    # Users, queues & nodes from streamed `qstat -xml`/`qhost -xml` output
+    sge = SGEResource({"queues": ["all.q", "gpu.q"]})
+    sge.stream = lambda command: open(f"tests/fixtures/sge/{command[0]}.xml", "rb")
+    user_data, queue_data, util_data, node_data = sge.monitor()
+    assert user_data == {
+        "user": ["alice", "bob", "carol"],
+        "total": [3, 2, 1],
+        "run": [1, 1, 1],
+        "wait": [1, 1, 0],
+        "login": [1, 0, 0],
+    }
+    assert queue_data["host_id"] == ["all.q", "gpu.q"]
+    assert queue_data["total"] == [3, 1] and queue_data["login"] == [1, 0]
+    assert node_data["host_id"] == ["gpu01", "node01", "node02"]
+    assert node_data["run"] == [1, 2, 0]
+    # Global host & unavailable nodes are skipped
+    assert util_data["cores"] == 72 and util_data["cores_util"] == 44
+    assert np.isclose(util_data["mem"], 881.3)
+    assert np.isclose(util_data["mem_util"], 142.2)
+
+
+def test_parallel_queries():
+    # Queries run concurrently - slow/failing ones return their last result
+    delays = {"jobs": 0.0, "nodes": 0.0}
+
+    def query(name):
+        time.sleep(delays[name])
+        if delays[name] < 0:
+            raise RuntimeError("Scheduler down")
+        return name
+
+    queries = ParallelQueries(timeout=0.3)
+    slow = {name: (lambda name=name: query(name)) for name in delays}
+    delays["jobs"] = delays["nodes"] = 0.2
+    start_t = time.time()
+    assert queries.run(slow) == {"jobs": "jobs", "nodes": "nodes"}
+    assert time.time() - start_t < 0.35 and queries.stale == {}
+
+    delays["nodes"] = 1.0
+    assert queries.run(slow) == {"jobs": "jobs", "nodes": "nodes"}
+    assert list(queries.stale) == ["nodes"] and queries.stale["nodes"] > 0.3
+    delays["jobs"] = -1
+    assert queries.run(slow)["jobs"] == "jobs"
+    assert sorted(queries.stale) == ["jobs", "nodes"]
+
+    # Without previous result the timeout is raised
+    with pytest.raises(TimeoutError):
+        ParallelQueries(timeout=0.1).run({"nodes": lambda: time.sleep(0.5)})
+    queries.close()
+
+    # Hanging scheduler commands are killed after the timeout
+    sge = SGEResource({"queues": [], "timeout": 0.2})
+    start_t = time.time()
+    with pytest.raises(subprocess.CalledProcessError):
+        with sge.stream(["sleep", "5"]) as output:
+            output.read()
+    assert time.time() - start_t < 1
+
+
+def test_snapshot_cache(tmp_path):
+    # Snapshots are reused within the TTL - expired ones while refreshing
+    polls = []
+
+    def fetch():
+        time.sleep(0.2)
+        polls.append(time.time())
+        return {"num_polls": len(polls)}
+
+    cache = SnapshotCache(ttl=0.3)
+    assert cache.get(fetch) == {"num_polls": 1}
+    assert cache.get(fetch) == {"num_polls": 1} and len(polls) == 1
+    time.sleep(0.3)
+    start_t = time.time()
+    assert cache.get(fetch) == {"num_polls": 1}
+    assert cache.get(fetch) == {"num_polls": 1}
+    assert time.time() - start_t < 0.1
+    time.sleep(0.5)
+    assert cache.get(fetch) == {"num_polls": 2}
+
+    # Processes sharing a cache file only poll once
+    fname = str(tmp_path / "slurm_cache.json")
+    dashboards = [SnapshotCache(ttl=60, fname=fname) for _ in range(3)]
+    shared_polls = []
+
+    def poll():
+        shared_polls.append(time.time())
+        return {"num_polls": len(shared_polls)}
+
+    assert [c.get(poll) for c in dashboards] == [{"num_polls": 1}] * 3
+    assert len(shared_polls) == 1
+
+    # Cached cluster data - scheduler commands are only run once
+    slurm_commands = []
+
+    def query(command):
+        slurm_commands.append(command[0])
+        return slurm_fixture(command)
+
+    resource = MLEResource(
+        resource_name="slurm-cluster",
+        monitor_config={"partitions": ["cpu", "gpu"]},
+        cache_ttl=60,
+        cache_fname=str(tmp_path / "resource_cache.json"),
+    )
+    resource.resource.query = query
+    resource_data = resource.monitor()
+    assert resource.monitor() == resource_data
+    assert resource_data["user_data"]["total"] == [4, 3, 1]
+    assert sorted(set(slurm_commands)) == ["sinfo", "squeue"]
+    assert len(slurm_commands) == 3
+
+
+def test_snapshot_cache_permissions(tmp_path, monkeypatch, caplog):
+    # Cache & lock files are shared with the group regardless of the umask
+    fname = str(tmp_path / "slurm_cache.json")
+    owner, other = [SnapshotCache(ttl=0, fname=fname) for _ in range(2)]
+    world_fname = str(tmp_path / "world" / "slurm_cache.json")
+    os.mkdir(os.path.dirname(world_fname))
+    old_umask = os.umask(0o077)
+    try:
+        assert owner.get(lambda: {"num_polls": 1}) == {"num_polls": 1}
+        SnapshotCache(ttl=0, fname=world_fname, mode=0o666).get(dict)
+    finally:
+        os.umask(old_umask)
+    assert os.stat(fname).st_mode & 0o777 == 0o660
+    assert os.stat(fname + ".lock").st_mode & 0o777 == 0o660
+    # Sharing with all users is opt-in
+    assert os.stat(world_fname).st_mode & 0o777 == 0o666
+
+    # Another user's file in a sticky dir can't be replaced - write in place
+    def replace(src, dst):
+        raise PermissionError(1, "Operation not permitted", dst)
+
+    monkeypatch.setattr(os, "replace", replace)
+    assert other.refresh(lambda: {"num_polls": 2})[1] == {"num_polls": 2}
+    assert owner.load()[1] == {"num_polls": 2}
+    assert sorted(os.listdir(tmp_path)) == [
+        "slurm_cache.json",
+        "slurm_cache.json.lock",
+        "world",
+    ]
+
+    # Symlinks (e.g. planted in /tmp) are not followed - in-memory fallback
+    target = tmp_path / "target.txt"
+    target.write_text("keep")
+    os.remove(fname)
+    os.symlink(target, fname)
+    assert other.refresh(lambda: {"num_polls": 3})[1] == {"num_polls": 3}
+    assert target.read_text() == "keep"
+    assert other.fname is None and "is not shared" in caplog.text
+    assert other.get(lambda: {"num_polls": 4}) == {"num_polls": 3}
+
+    # Unusable lock file - fall back to the in-memory snapshot as well
+    def open_lock(self):
+        raise PermissionError(13, "Permission denied", self.fname)
+
+    monkeypatch.setattr(FileLock, "open", open_lock)
+    assert owner.refresh(lambda: {"num_polls": 5})[1] == {"num_polls": 5}
+    assert owner.fname is None
+
+
+# Fake `gcloud` - lists the instances of a JSON file, fails `failures` times
+FAKE_GCLOUD = """#!{python}
+import json, sys
+with open("{state}") as f:
+    state = json.load(f)
+if state["failures"] > 0:
+    state["failures"] -= 1
+    with open("{state}", "w") as f:
+        json.dump(state, f)
+    sys.exit(1)
+print(json.dumps(state["instances"]))
+"""
+
+
+def test_gcp_resource(tmp_path):
+    # Instances listed via a local fake `gcloud` script
+    state_fname, gcloud = tmp_path / "instances.json", tmp_path / "gcloud"
+    gcloud.write_text(FAKE_GCLOUD.format(python=sys.executable, state=state_fname))
+    gcloud.chmod(0o755)
+
+    def set_instances(statuses, failures=0):
+        instances = [
+            {"id": str(i), "name": f"vm-{i}", "machineType": mt, "status": status}
+            for i, (mt, status) in enumerate(statuses)
+        ]
+        state_fname.write_text(
+            json.dumps({"instances": instances, "failures": failures})
+        )
+
+    gcp = GCPResource({"gcloud": str(gcloud), "deadline": 5})
+    set_instances([("n1-standard-4", "RUNNING"), ("n1-standard-4", "STAGING")])
+    assert gcp.monitor() == {
+        "experiment_type": ["n1-standard-4"],
+        "run": [1],
+        "stop": [0],
+        "stage": [1],
+    }
+
+    # Only changed instances update the inventory - failures are retried
+    set_instances(
+        [("n1-standard-4", "RUNNING"), ("n1-standard-4", "RUNNING")]
+        + [("e2-medium", "STOPPING")],
+        failures=2,
+    )
+    start_t = time.time()
+    gcp_data = gcp.monitor()
+    assert time.time() - start_t >= 3 * 0.25
+    assert gcp_data["experiment_type"] == ["n1-standard-4", "e2-medium"]
+    assert gcp_data["run"] == [2, 0] and gcp_data["stop"] == [0, 1]
+    assert gcp.update_inventory(gcp.list_instances()) == 0
+    set_instances([("e2-medium", "RUNNING")])
+    assert gcp.update_inventory(gcp.list_instances()) == 3
+    assert gcp.get_data()["experiment_type"] == ["e2-medium"]
+
+    # Listing fails once the retry deadline passed
+    gcp.deadline = 0.5
+    set_instances([], failures=100)
+    with pytest.raises(subprocess.CalledProcessError):
+        gcp.monitor()